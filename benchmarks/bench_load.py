@@ -0,0 +1,193 @@
+"""
+Compares the client-side cost of the JSON, pandas and Arrow load paths of BigQueryClient.
+
+Each path runs in its own process against a real ``google.cloud.bigquery.Client`` whose
+uploads are counted and discarded instead of sent, so the numbers cover exactly the
+serialization done before a load job starts: wall time, bytes uploaded and peak memory.
+
+    python benchmarks/bench_load.py --rows 100k,1m
+    python benchmarks/bench_load.py --rows 5m --paths json_stream,arrow_stream --json results.json
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_merge import parse_size
+
+
+PATHS = ["json_list", "json_stream", "pandas", "arrow", "arrow_stream"]
+BATCH_ROWS = 50_000
+
+
+class _DiscardedLoad:
+    _ids = itertools.count(1)
+
+    def __init__(self, rows):
+        self.job_id = f"discarded_{next(self._ids)}"
+        self.output_rows = rows
+        self.error_result = None
+        self.errors = None
+
+    def done(self, *args, **kwargs):
+        return True
+
+    def result(self, *args, **kwargs):
+        return self
+
+
+def _counting_client():
+    from google.api_core.exceptions import NotFound
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import bigquery
+
+    class CountingClient(bigquery.Client):
+        # Drains every upload instead of sending it; the library's own conversions still run
+        uploaded_bytes = 0
+
+        def load_table_from_file(self, file_obj, destination, rewind=False, *args, **kwargs):
+            if rewind:
+                file_obj.seek(0)
+            rows = 0
+            for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+                CountingClient.uploaded_bytes += len(chunk)
+                rows += chunk.count(b"\n")
+            return _DiscardedLoad(rows)
+
+        def get_table(self, table, *args, **kwargs):
+            raise NotFound(f"{table} is not looked up in benchmarks")
+
+    return CountingClient(project="bench", credentials=AnonymousCredentials())
+
+
+def _batches(rows):
+    # Synthetic columns of the usual staging types, generated batch by batch
+    import numpy as np
+    import pyarrow as pa
+
+    for start in range(0, rows, BATCH_ROWS):
+        ids = np.arange(start, min(rows, start + BATCH_ROWS), dtype=np.int64)
+        yield pa.RecordBatch.from_pydict({
+            "id": ids,
+            "name": pa.array([f"row-{i}" for i in ids]),
+            "value": (ids % 1000) / 10.0,
+            "ingested_at": pa.array(ids * 1_000_000 + 1_700_000_000_000_000, pa.timestamp("us", tz="UTC")),
+            "active": ids % 2 == 0,
+        })
+
+
+def _json_rows(rows):
+    # JSON feeds carry timestamps as strings
+    for batch in _batches(rows):
+        for row in batch.to_pylist():
+            row["ingested_at"] = row["ingested_at"].isoformat()
+            yield row
+
+
+def _schema():
+    from google.cloud import bigquery
+
+    return [
+        bigquery.SchemaField("id", "INTEGER"),
+        bigquery.SchemaField("name", "STRING"),
+        bigquery.SchemaField("value", "FLOAT"),
+        bigquery.SchemaField("ingested_at", "TIMESTAMP"),
+        bigquery.SchemaField("active", "BOOLEAN"),
+    ]
+
+
+def run_case(path, rows):
+    """
+    Builds the input in the path's native form, then times only the load call. The streaming
+    paths generate their rows lazily, so their time includes producing the input.
+    """
+    import pyarrow as pa
+    from gcputils.BigQueryClient import BigQueryClient
+
+    client = _counting_client()
+    bq_client = BigQueryClient("bench", client=client)
+
+    if path == "json_list":
+        data = list(_json_rows(rows))
+        load = lambda: client.load_table_from_json(data, "bench.t", job_config=_json_config())
+    elif path == "json_stream":
+        data = _json_rows(rows)
+        load = lambda: bq_client.load_json_stream("bench", "t", data, _schema())
+    elif path == "pandas":
+        data = pa.Table.from_batches(list(_batches(rows))).to_pandas()
+        load = lambda: bq_client.load_dataframe_to_table("bench", "t", data)
+    elif path == "arrow":
+        data = pa.Table.from_batches(list(_batches(rows)))
+        load = lambda: bq_client.load_arrow_table("bench", "t", data)
+    else:
+        data = _batches(rows)
+        load = lambda: bq_client.load_arrow_table("bench", "t", data)
+
+    before_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    started = time.perf_counter()
+    load()
+    wall_time = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "wall_time_s": round(wall_time, 3),
+        "uploaded_mb": round(type(client).uploaded_bytes / 1024 / 1024, 1),
+        "peak_memory_mb": round(peak_mb, 1),
+        "load_memory_mb": round(peak_mb - before_mb, 1),
+    }
+
+
+def _json_config():
+    from google.cloud import bigquery
+
+    job_config = bigquery.LoadJobConfig()
+    job_config.schema = _schema()
+    job_config.source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+    return job_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JSON, pandas and Arrow load paths.")
+    parser.add_argument("--rows", default="100k,1m", help="Comma-separated row counts, e.g. 100k,1m,10m.")
+    parser.add_argument("--paths", default=",".join(PATHS), help=f"Comma-separated subset of: {', '.join(PATHS)}.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        case = json.loads(args.case)
+        print(json.dumps(run_case(case["path"], case["rows"])))
+        return
+
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"Unknown paths: {', '.join(sorted(unknown))}")
+
+    results = []
+    print(f"{'rows':>10} {'path':<13} {'wall s':>8} {'upload MB':>10} {'peak MB':>8} {'load MB':>8}")
+    for rows in [parse_size(r) for r in args.rows.split(",")]:
+        for path in paths:
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--case", json.dumps({"path": path, "rows": rows})],
+                capture_output=True, text=True,
+            )
+            if child.returncode:
+                sys.exit(f"{path} with {rows} rows failed:\n{child.stderr}")
+            result = dict(json.loads(child.stdout.strip().splitlines()[-1]), rows=rows, path=path)
+            results.append(result)
+            print(f"{rows:>10} {path:<13} {result['wall_time_s']:>8} {result['uploaded_mb']:>10} "
+                  f"{result['peak_memory_mb']:>8} {result['load_memory_mb']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
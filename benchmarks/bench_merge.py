@@ -0,0 +1,166 @@
+"""
+Benchmarks merge strategies against the local SQLite stand-in for BigQuery.
+
+For every size and overlap ratio a staging and a production table are generated once; each
+strategy then merges a fresh copy of them in its own process, so peak memory is per strategy.
+
+    python benchmarks/bench_merge.py --sizes 10k,1m --overlaps 0,0.5,0.9
+    python benchmarks/bench_merge.py --sizes 10m --strategies full,hash_chunks --json results.json
+
+Timings on SQLite say nothing about BigQuery slot time; use them to compare strategies and to
+catch regressions in the code around the SQL (planning, scheduling, checkpoints).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import bigquery
+from gcputils.BigQueryClient import BigQueryClient
+from gcputils.LocalBigQuery import LocalBigQueryClient
+
+
+DATASET = "bench"
+SCHEMA = [
+    bigquery.SchemaField("id", "INTEGER", mode="REQUIRED"),
+    bigquery.SchemaField("name", "STRING"),
+    bigquery.SchemaField("value", "FLOAT"),
+    bigquery.SchemaField("ingested_at", "TIMESTAMP"),
+]
+
+# Pair options of each strategy, as accepted by loc_prodifier.prepare_merge
+STRATEGIES = {
+    "full": {},
+    "dedup_inline": {"dedup": "inline", "dedup_order_by": "ingested_at DESC"},
+    "dedup_materialize": {"dedup": "materialize", "dedup_order_by": "ingested_at DESC"},
+    "hash_chunks": {"chunks": 8, "chunk_by": "hash"},
+    "hash_chunks_parallel": {"chunks": 8, "chunk_by": "hash", "parallel_chunks": True},
+    "skip_unchanged": {"skip_unchanged": True},
+}
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def generate(path, rows, overlap, duplicates):
+    """
+    Writes ``bench.staging`` and ``bench.prod`` to a new SQLite database.
+
+    Staging holds ``rows`` distinct keys plus ``duplicates * rows`` repeated ones; production
+    holds ``rows`` keys of which ``overlap * rows`` are also in staging, so a merge inserts
+    ``rows * (1 - overlap)`` distinct keys.
+    """
+    local = LocalBigQueryClient("bench", path)
+    local.create_table(bigquery.Table(local.dataset(DATASET).table("staging"), schema=SCHEMA))
+    # Clustering on the key gives production an index, like BigQuery's block pruning
+    prod = bigquery.Table(local.dataset(DATASET).table("prod"), schema=SCHEMA)
+    prod.clustering_fields = ["id"]
+    local.create_table(prod)
+
+    offset = rows - int(rows * overlap)
+    insert = """
+    WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < {count})
+    INSERT INTO "{table}" (id, name, value, ingested_at)
+    SELECT i + {offset}, 'row-' || (i + {offset}), (i * 7919) % 1000 / 10.0, datetime('2024-01-01', '+' || (i % 365) || ' days')
+    FROM seq
+    """
+    connection = local.connection
+    connection.execute("BEGIN")
+    connection.execute(insert.format(count=rows, table=f"{DATASET}.staging", offset=0))
+    if duplicates:
+        connection.execute(insert.format(count=max(1, int(rows * duplicates)), table=f"{DATASET}.staging", offset=0))
+    connection.execute(insert.format(count=rows, table=f"{DATASET}.prod", offset=offset))
+    connection.execute("COMMIT")
+    connection.close()
+
+
+def run_case(case):
+    """
+    Merges one prepared database with one strategy; runs in a child process.
+    """
+    import loc_prodifier
+
+    bq_client = BigQueryClient("bench", client=LocalBigQueryClient("bench", case["db"]))
+    pair = dict(STRATEGIES[case["strategy"]], dataset_id=DATASET, staging_table_id="staging", prod_table_id="prod")
+    started = time.perf_counter()
+    (result,) = loc_prodifier.merge_many(bq_client, [pair], max_in_flight=case["max_in_flight"])
+    wall_time = time.perf_counter() - started
+    return {
+        "status": result["status"],
+        "rows_inserted": result["rows_affected"],
+        "wall_time_s": round(wall_time, 3),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_memory_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "message": result["message"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merge strategies on synthetic tables.")
+    parser.add_argument("--sizes", default="10k,1m", help="Comma-separated staging sizes, e.g. 10k,1m,10m.")
+    parser.add_argument("--overlaps", default="0,0.5,0.9", help="Comma-separated fractions of staging keys already in production.")
+    parser.add_argument("--duplicates", type=float, default=0.01, help="Fraction of staging keys repeated within staging.")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help=f"Comma-separated subset of: {', '.join(STRATEGIES)}.")
+    parser.add_argument("--max_in_flight", type=int, default=4, help="Scheduler concurrency passed to merge_many.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--workdir", help="Directory for the generated databases (a temporary one by default).")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"Unknown strategies: {', '.join(sorted(unknown))}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_merge_")
+    results = []
+    print(f"{'rows':>10} {'overlap':>7} {'strategy':<22} {'status':<7} {'inserted':>10} {'wall s':>8} {'peak MB':>8}")
+    try:
+        for size in [parse_size(s) for s in args.sizes.split(",")]:
+            for overlap in [float(o) for o in args.overlaps.split(",")]:
+                template = os.path.join(workdir, f"template_{size}_{overlap}.db")
+                generate(template, size, overlap, args.duplicates)
+                for strategy in strategies:
+                    db = os.path.join(workdir, "case.db")
+                    shutil.copyfile(template, db)
+                    case = {"db": db, "strategy": strategy, "max_in_flight": args.max_in_flight}
+                    child = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+                        capture_output=True, text=True,
+                    )
+                    if child.returncode:
+                        sys.exit(f"{strategy} on {size} rows failed:\n{child.stderr}")
+                    result = dict(json.loads(child.stdout.strip().splitlines()[-1]), rows=size, overlap=overlap, strategy=strategy)
+                    results.append(result)
+                    print(f"{size:>10} {overlap:>7} {strategy:<22} {result['status']:<7} {str(result['rows_inserted']):>10} "
+                          f"{result['wall_time_s']:>8} {result['peak_memory_mb']:>8}")
+                    os.remove(db)
+                os.remove(template)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
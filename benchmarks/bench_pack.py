@@ -0,0 +1,83 @@
+"""
+Measures what packing many tiny merges into script jobs saves.
+
+Every job, single MERGE or packed script, goes through
+``gcputils.FaultyBigQuery.FaultInjectingClient`` with ``--job_latency`` seconds of latency,
+standing in for BigQuery's fixed per-job cost (submission, queueing, polling), which is what
+dominates tiny merges. Each pack size merges a fresh copy of the tables:
+
+    python benchmarks/bench_pack.py --tables 200 --pack_sizes 1,5,10,25
+    python benchmarks/bench_pack.py --job_latency 2 --max_in_flight 10 --json pack.json
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_merge import DATASET
+from bench_retry import generate
+from gcputils.BigQueryClient import BigQueryClient
+from gcputils.FaultyBigQuery import FaultInjectingClient
+from gcputils.LocalBigQuery import LocalBigQueryClient
+
+
+def run(db, pack_size, args):
+    import loc_prodifier
+
+    # Scripts start with BEGIN TRANSACTION; give them the same job latency as a lone MERGE
+    timed = FaultInjectingClient(LocalBigQueryClient("bench", db), job_latency=args.job_latency, statements=("MERGE", "BEGIN"))
+    bq_client = BigQueryClient("bench", client=timed)
+    pairs = [{"dataset_id": DATASET, "staging_table_id": f"staging_{i}", "prod_table_id": f"prod_{i}"} for i in range(args.tables)]
+
+    started = time.perf_counter()
+    results = loc_prodifier.merge_many(bq_client, pairs, max_in_flight=args.max_in_flight, pack_size=pack_size)
+    wall_time = time.perf_counter() - started
+    return {
+        "pack_size": pack_size,
+        "done": sum(result["status"] == "DONE" for result in results),
+        "rows_inserted": sum(result["rows_affected"] or 0 for result in results),
+        "jobs": timed.stats()["submitted"],
+        "wall_time_s": round(wall_time, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark packed script jobs against one job per merge.")
+    parser.add_argument("--tables", type=int, default=200, help="Table pairs merged per run.")
+    parser.add_argument("--rows", type=int, default=100, help="Staging rows per table.")
+    parser.add_argument("--pack_sizes", default="1,5,10,25", help="Comma-separated pack sizes; 1 runs one job per merge.")
+    parser.add_argument("--max_in_flight", type=int, default=10, help="Jobs in flight.")
+    parser.add_argument("--job_latency", type=float, default=1.0, help="Seconds each job takes, whatever it runs.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    workdir = tempfile.mkdtemp(prefix="bench_pack_")
+    template = os.path.join(workdir, "template.db")
+    results = []
+    print(f"{'pack size':>9} {'done':>5} {'inserted':>9} {'jobs':>5} {'wall s':>8}")
+    try:
+        generate(template, args.tables, args.rows)
+        for pack_size in [int(size) for size in args.pack_sizes.split(",")]:
+            db = os.path.join(workdir, "case.db")
+            shutil.copyfile(template, db)
+            result = run(db, pack_size, args)
+            results.append(result)
+            print(f"{pack_size:>9} {result['done']:>5} {result['rows_inserted']:>9} {result['jobs']:>5} {result['wall_time_s']:>8}")
+            os.remove(db)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
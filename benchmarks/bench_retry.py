@@ -0,0 +1,135 @@
+"""
+Measures merge throughput under synthetic BigQuery throttling.
+
+Many small table pairs are merged through ``gcputils.FaultyBigQuery.FaultInjectingClient``,
+which makes every MERGE take ``--job_latency`` seconds, rate-limits statements beyond a
+concurrent-job quota and fails others at random with DML conflicts and backend errors. Each
+limiter then merges a fresh copy of the tables:
+
+    fixed      retries, but keeps --max_in_flight jobs in flight regardless of throttling
+    adaptive   retries and shrinks the in-flight limit on rate limits (AIMD), the default
+    no_retry   a single attempt per merge, as before retries existed
+
+    python benchmarks/bench_retry.py --tables 100 --max_in_flight 16 --quota 4
+    python benchmarks/bench_retry.py --conflict 0.05 --backend 0.05 --json retry.json
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import bigquery
+from bench_merge import DATASET, SCHEMA
+from gcputils.BigQueryClient import BigQueryClient
+from gcputils.FaultyBigQuery import FaultInjectingClient
+from gcputils.LocalBigQuery import LocalBigQueryClient
+from gcputils.retry import AdaptiveLimiter
+
+
+LIMITERS = ["fixed", "adaptive", "no_retry"]
+
+
+def generate(path, tables, rows):
+    """
+    Writes ``tables`` pairs ``bench.staging_<i>`` / ``bench.prod_<i>`` to a new SQLite database,
+    with half of each staging table already in production.
+    """
+    local = LocalBigQueryClient("bench", path)
+    insert = """
+    WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < {count})
+    INSERT INTO "{table}" (id, name, value, ingested_at)
+    SELECT i + {offset}, 'row-' || (i + {offset}), i / 10.0, '2024-01-01 00:00:00' FROM seq
+    """
+    for index in range(tables):
+        for name in (f"staging_{index}", f"prod_{index}"):
+            local.create_table(bigquery.Table(local.dataset(DATASET).table(name), schema=SCHEMA))
+    connection = local.connection
+    connection.execute("BEGIN")
+    for index in range(tables):
+        connection.execute(insert.format(count=rows, table=f"{DATASET}.staging_{index}", offset=0))
+        connection.execute(insert.format(count=rows, table=f"{DATASET}.prod_{index}", offset=rows // 2))
+    connection.execute("COMMIT")
+    connection.close()
+
+
+def run(db, limiter_name, args):
+    import loc_prodifier
+
+    faulty = FaultInjectingClient(LocalBigQueryClient("bench", db), job_latency=args.job_latency,
+                                  max_concurrent_jobs=args.quota, conflict=args.conflict, backend=args.backend,
+                                  seed=args.seed)
+    bq_client = BigQueryClient("bench", client=faulty)
+    pairs = [{"dataset_id": DATASET, "staging_table_id": f"staging_{i}", "prod_table_id": f"prod_{i}"} for i in range(args.tables)]
+    limiter = AdaptiveLimiter(args.max_in_flight, decrease=1.0 if limiter_name == "fixed" else 0.5)
+
+    started = time.perf_counter()
+    results = loc_prodifier.merge_many(bq_client, pairs, max_in_flight=args.max_in_flight, limiter=limiter,
+                                       attempts=1 if limiter_name == "no_retry" else args.attempts)
+    wall_time = time.perf_counter() - started
+    stats = faulty.stats()
+    done = sum(result["status"] == "DONE" for result in results)
+    return {
+        "limiter": limiter_name,
+        "done": done,
+        "failed": len(results) - done,
+        "wall_time_s": round(wall_time, 3),
+        "merges_per_s": round(done / wall_time, 2),
+        "jobs": stats["submitted"],
+        "throttled": stats["injected"]["quota"],
+        "retries": sum(result["retries"] for result in results),
+        "max_running": stats["max_running"],
+        "final_limit": limiter.limit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merge throughput under synthetic throttling.")
+    parser.add_argument("--tables", type=int, default=100, help="Table pairs merged per run.")
+    parser.add_argument("--rows", type=int, default=100, help="Staging rows per table.")
+    parser.add_argument("--max_in_flight", type=int, default=16, help="Configured (maximum) jobs in flight.")
+    parser.add_argument("--quota", type=int, default=4, help="Concurrent MERGE jobs before the fake rate-limits.")
+    parser.add_argument("--job_latency", type=float, default=0.5, help="Seconds each MERGE job runs.")
+    parser.add_argument("--conflict", type=float, default=0.02, help="Probability of a concurrent-update conflict per job.")
+    parser.add_argument("--backend", type=float, default=0.02, help="Probability of a backend error per job.")
+    parser.add_argument("--attempts", type=int, default=5, help="Submissions per MERGE for the retrying limiters.")
+    parser.add_argument("--limiters", default=",".join(LIMITERS), help=f"Comma-separated subset of: {', '.join(LIMITERS)}.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the injected failures.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    limiters = [name.strip() for name in args.limiters.split(",") if name.strip()]
+    unknown = set(limiters) - set(LIMITERS)
+    if unknown:
+        parser.error(f"Unknown limiters: {', '.join(sorted(unknown))}")
+    logging.disable(logging.CRITICAL)
+
+    workdir = tempfile.mkdtemp(prefix="bench_retry_")
+    template = os.path.join(workdir, "template.db")
+    results = []
+    print(f"{'limiter':<10} {'done':>5} {'failed':>6} {'wall s':>8} {'merges/s':>9} {'jobs':>6} {'throttled':>9} {'retries':>7} {'max run':>7} {'limit':>5}")
+    try:
+        generate(template, args.tables, args.rows)
+        for name in limiters:
+            db = os.path.join(workdir, "case.db")
+            shutil.copyfile(template, db)
+            result = run(db, name, args)
+            results.append(result)
+            print(f"{name:<10} {result['done']:>5} {result['failed']:>6} {result['wall_time_s']:>8} {result['merges_per_s']:>9} "
+                  f"{result['jobs']:>6} {result['throttled']:>9} {result['retries']:>7} {result['max_running']:>7} {result['final_limit']:>5}")
+            os.remove(db)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Tracks cold-start latency: how long the CLI and the gcputils modules take to import, and how
+long the first call through a freshly built client takes.
+
+Every case runs in a new interpreter, the way a Cloud Run instance starts, and is repeated;
+the median is reported. ``process s`` is the wall time of the whole child process as seen
+from here, ``step s`` the time the child spent in the step itself.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --json startup.json
+    python benchmarks/bench_startup.py --live --project my-project
+
+The live cases authenticate with the default credentials and make real (read-only) API calls.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Modules whose import time is tracked, ours first and then the libraries they defer
+MODULES = [
+    "loc_prodifier",
+    "gcputils.BigQueryClient",
+    "gcputils.gcpclient",
+    "gcputils.GoogleCloudLogging",
+    "gcputils.GoogleSecretManager",
+    "google.cloud.bigquery",
+    "google.cloud.storage",
+    "google.cloud.logging",
+    "google.cloud.secretmanager",
+]
+
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, round(time.perf_counter() - started, 4)
+
+
+def run_case(case):
+    """
+    Runs one case in this (fresh) process and returns the time of each of its steps.
+    """
+    import importlib
+
+    kind = case["kind"]
+    if kind == "import":
+        _, import_s = _timed(lambda: importlib.import_module(case["module"]))
+        return {"step_s": import_s}
+
+    loc_prodifier, import_s = _timed(lambda: importlib.import_module("loc_prodifier"))
+    if kind == "local_query":
+        bq_client, client_s = _timed(lambda: loc_prodifier.initialize_bq_client("bench", local_db=":memory:"))
+        _, call_s = _timed(lambda: list(bq_client.query("SELECT 1")))
+    elif kind == "live_bigquery":
+        bq_client, client_s = _timed(lambda: loc_prodifier.initialize_bq_client(case["project"]).client)
+        _, call_s = _timed(lambda: list(loc_prodifier.initialize_bq_client(case["project"]).query("SELECT 1")))
+    elif kind == "live_storage":
+        from gcputils.gcpclient import GCSClient
+
+        gcs_client = GCSClient(case["project"])
+        _, client_s = _timed(lambda: gcs_client.client)
+        _, call_s = _timed(lambda: list(gcs_client.client.list_buckets(max_results=1)))
+    else:
+        raise ValueError(f"Unknown case: {kind}")
+    return {"import_s": import_s, "client_s": client_s, "call_s": call_s,
+            "step_s": round(import_s + client_s + call_s, 4)}
+
+
+def _run_child(args):
+    started = time.perf_counter()
+    child = subprocess.run([sys.executable, *args], capture_output=True, text=True, cwd=ROOT)
+    return child, time.perf_counter() - started
+
+
+def measure(name, args, repeat):
+    """
+    Runs a child process ``repeat`` times and returns the medians of its timings.
+    """
+    process_times, step_times = [], []
+    result = {}
+    for _ in range(repeat):
+        child, wall_time = _run_child(args)
+        if child.returncode:
+            sys.exit(f"{name} failed:\n{child.stderr}")
+        process_times.append(wall_time)
+        if "--case" in args:
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            step_times.append(result["step_s"])
+    return dict(result, name=name,
+                process_s=round(statistics.median(process_times), 3),
+                step_s=round(statistics.median(step_times), 3) if step_times else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time and first-call latency.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case; the median is reported.")
+    parser.add_argument("--modules", default=",".join(MODULES), help="Comma-separated modules whose import is timed.")
+    parser.add_argument("--live", action="store_true", help="Also time real client creation and a first API call.")
+    parser.add_argument("--project", help="Project of the live cases.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+    if args.live and not args.project:
+        parser.error("--live requires --project")
+
+    script = os.path.abspath(__file__)
+    cases = [("python -c pass", ["-c", "pass"]), ("loc_prodifier --help", ["loc_prodifier.py", "--help"])]
+    for module in [m.strip() for m in args.modules.split(",") if m.strip()]:
+        cases.append((f"import {module}", [script, "--case", json.dumps({"kind": "import", "module": module})]))
+    cases.append(("first local query", [script, "--case", json.dumps({"kind": "local_query"})]))
+    if args.live:
+        for kind in ["live_bigquery", "live_storage"]:
+            cases.append((kind.replace("_", " "), [script, "--case", json.dumps({"kind": kind, "project": args.project})]))
+
+    results = []
+    print(f"{'case':<40} {'process s':>10} {'step s':>8}")
+    for name, case_args in cases:
+        result = measure(name, case_args, args.repeat)
+        results.append(result)
+        step = "" if result["step_s"] is None else result["step_s"]
+        print(f"{name:<40} {result['process_s']:>10} {step:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
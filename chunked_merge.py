@@ -0,0 +1,113 @@
+import logging
+import uuid
+from gcputils.lazy import lazy_import
+from merge_planner import key_expression
+
+bigquery = lazy_import("google.cloud.bigquery")
+
+
+def checkpoint_schema():
+    # Built on demand so importing this module does not load google.cloud.bigquery
+    return [
+        bigquery.SchemaField("run_id", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("staging_table", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("prod_table", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("chunk", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("rows_inserted", "INTEGER"),
+        bigquery.SchemaField("completed_at", "TIMESTAMP", mode="REQUIRED"),
+    ]
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
+def hash_chunk_filters(unique_column, chunks):
+    """
+    Splits the key space into ``chunks`` disjoint ranges by fingerprinting the key.
+
+    The same predicate is applied to staging and production: a production row can only match
+    a staging row of the same chunk, so each chunk is a complete merge of its own.
+
+    Args:
+        unique_column (str or list): The merge key.
+        chunks (int): Number of chunks.
+
+    Returns:
+        list: ``(label, source_filter, target_filter)`` tuples, one per chunk.
+    """
+    bucket = "ABS(MOD(FARM_FINGERPRINT({key}), {chunks}))"
+    return [
+        (
+            f"hash {i}/{chunks}",
+            f"{bucket.format(key=key_expression(unique_column), chunks=chunks)} = {i}",
+            f"{bucket.format(key=key_expression(unique_column, 'T.'), chunks=chunks)} = {i}",
+        )
+        for i in range(chunks)
+    ]
+
+
+class CheckpointStore:
+    def __init__(self, bq_client, checkpoint_table):
+        """
+        Records which chunks of a chunked merge have completed, so a failed run can resume.
+
+        Re-running a completed chunk is harmless (the MERGE only inserts missing keys), so a
+        checkpoint lost between a chunk's job and its checkpoint write only costs a redo.
+
+        Args:
+            bq_client (BigQueryClient): The client used to read and write the checkpoint table.
+            checkpoint_table (str): The checkpoint table as ``dataset.table``.
+        """
+        self.bq_client = bq_client
+        self.checkpoint_table = checkpoint_table
+        self._pending_jobs = []
+
+    def ensure_table(self):
+        dataset_id, table_id = self.checkpoint_table.split(".", 1)
+        if not self.bq_client.table_exists(dataset_id, table_id):
+            self.bq_client.create_table(dataset_id, table_id, checkpoint_schema())
+
+    def completed(self, run_id):
+        """
+        Returns the chunks already merged in a run.
+
+        Returns:
+            set: ``(staging_table, prod_table, chunk)`` tuples.
+        """
+        self.ensure_table()
+        query = f"""
+        SELECT DISTINCT staging_table, prod_table, chunk
+        FROM `{self.checkpoint_table}`
+        WHERE run_id = @run_id
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("run_id", "STRING", run_id)])
+        query_job = self.bq_client.run_query(query, job_config=job_config)
+        return {(row["staging_table"], row["prod_table"], row["chunk"]) for row in query_job.result()}
+
+    def mark_done(self, run_id, staging_table, prod_table, chunk, rows_inserted):
+        """
+        Appends a checkpoint without waiting for it; call :meth:`flush` before exiting.
+        """
+        query = f"""
+        INSERT INTO `{self.checkpoint_table}` (run_id, staging_table, prod_table, chunk, rows_inserted, completed_at)
+        VALUES (@run_id, @staging_table, @prod_table, @chunk, @rows_inserted, CURRENT_TIMESTAMP())
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("run_id", "STRING", run_id),
+            bigquery.ScalarQueryParameter("staging_table", "STRING", staging_table),
+            bigquery.ScalarQueryParameter("prod_table", "STRING", prod_table),
+            bigquery.ScalarQueryParameter("chunk", "STRING", chunk),
+            bigquery.ScalarQueryParameter("rows_inserted", "INT64", rows_inserted),
+        ])
+        self._pending_jobs.append(self.bq_client.submit_query(query, job_config=job_config))
+
+    def flush(self):
+        """
+        Waits for outstanding checkpoint writes and logs any that failed.
+        """
+        done, _ = self.bq_client.wait_for_jobs(self._pending_jobs)
+        for job in done:
+            if job.error_result:
+                logging.error(f"Checkpoint write {job.job_id} failed: {job.errors or job.error_result}")
+        self._pending_jobs = []
@@ -1,11 +1,48 @@
-from google.cloud import bigquery
-from google.api_core.exceptions import NotFound
+import asyncio
+import itertools
+import json
 import os
+import tempfile
 import logging
-from google.api_core.exceptions import GoogleAPIError
+import re
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED
+from gcputils.backoff import backoff_delays
+from gcputils.lazy import lazy_import
+from gcputils.retry import DEFAULT_ATTEMPTS, DEFAULT_INITIAL_DELAY, DEFAULT_MAX_DELAY, RETRYABLE, classify_error
+from gcputils.session import shared_credentials, shared_session
+from gcputils.ttl_cache import TTLCache
+
+bigquery = lazy_import("google.cloud.bigquery")
+exceptions = lazy_import("google.api_core.exceptions")
+
+
+# Bytes of newline-delimited JSON per load job, and kept in memory before spilling to disk
+DEFAULT_LOAD_CHUNK_BYTES = 100 * 1024 * 1024
+DEFAULT_SPOOL_BYTES = 8 * 1024 * 1024
+
+# Serialized rows joined in memory before each write to a load spool: one write per batch
+# instead of one per row
+DEFAULT_WRITE_BATCH_BYTES = 1024 * 1024
+
+# Rows per page when reading query results over REST
+DEFAULT_PAGE_SIZE = 10_000
+
+# Cache markers for tables known to be missing, and known to exist but not fetched yet
+_MISSING = object()
+_EXISTS = object()
+
+# Target table of statements that create, change or drop a table
+_WRITE_TARGET = re.compile(
+    r"^\s*(?:MERGE(?:\s+INTO)?|INSERT(?:\s+INTO)?|UPDATE|DELETE(?:\s+FROM)?|TRUNCATE\s+TABLE"
+    r"|CREATE(?:\s+OR\s+REPLACE)?(?:\s+TEMP|\s+TEMPORARY)?\s+TABLE(?:\s+IF\s+NOT\s+EXISTS)?"
+    r"|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)\s+`?([\w.-]+)`?",
+    re.IGNORECASE,
+)
 
 class BigQueryClient:
-    def __init__(self, project_id, credentials_path=None):
+    def __init__(self, project_id, credentials_path=None, client=None, metadata_ttl=300.0, metadata_cache_size=1024):
         """
         Initializes the Google BigQuery client.
 
@@ -13,23 +50,41 @@ class BigQueryClient:
             project_id (str): The Google Cloud project ID.
             credentials_path (str, optional): Path to the JSON file containing service account credentials.
                                               If not provided, it will use the default credentials from the environment.
+            client (optional): An object implementing the ``google.cloud.bigquery.Client`` methods used here,
+                               such as ``gcputils.LocalBigQuery.LocalBigQueryClient``. Created from the
+                               credentials on first use when not provided.
+            metadata_ttl (float): Seconds table metadata is cached; 0 disables the cache.
+            metadata_cache_size (int): Maximum number of tables whose metadata is cached.
         """
         self.project_id = project_id
         self.credentials_path = credentials_path
-        self.client = self._create_client()
+        self._client = client
+        self._client_lock = threading.Lock()
+        self.metadata_cache = TTLCache(ttl=metadata_ttl, max_entries=metadata_cache_size)
+
+    @property
+    def client(self):
+        # Created on first use, so constructing a BigQueryClient costs no import or auth round trip
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     def _create_client(self):
         """
-        Creates and returns the Google BigQuery client.
+        Creates and returns the Google BigQuery client on the process-wide shared session.
 
         Returns:
             google.cloud.bigquery.Client: The initialized Google BigQuery client.
         """
-        if self.credentials_path:
-            client = bigquery.Client.from_service_account_json(self.credentials_path, project=self.project_id)
-        else:
-            client = bigquery.Client(project=self.project_id)
-        return client
+        credentials, _ = shared_credentials(self.credentials_path)
+        return bigquery.Client(project=self.project_id, credentials=credentials,
+                               _http=shared_session(self.credentials_path))
 
     def create_dataset(self, dataset_id, location="US"):
         """
@@ -52,14 +107,91 @@ class BigQueryClient:
 
     # Function to check if a table exists
     def table_exists(self, dataset_id, table_id):
+        if self.metadata_cache.get(self._table_key(dataset_id, table_id)) is _EXISTS:
+            return True
         try:
-            self.client.get_table(f"{dataset_id}.{table_id}")
+            self.get_table(dataset_id, table_id)
             return True
         # except Exception as e
-        except NotFound :
+        except exceptions.NotFound:
             # raise e
             return False
         
+    def get_table(self, dataset_id, table_id):
+        """
+        Fetches a table's metadata, served from the metadata cache when possible.
+
+        The cached ``Table`` answers existence, schema, partitioning and row count lookups
+        until it expires or a create, load or DML statement issued through this client
+        touches the table.
+
+        Args:
+            dataset_id (str): The dataset ID containing the table.
+            table_id (str): The table ID.
+
+        Returns:
+            google.cloud.bigquery.Table: The table, including its schema and partitioning.
+
+        Raises:
+            NotFound: If the table does not exist.
+        """
+        key = self._table_key(dataset_id, table_id)
+        cached = self.metadata_cache.get(key)
+        if cached is _MISSING:
+            raise exceptions.NotFound(f"Not found: Table {key}")
+        if cached is not None and cached is not _EXISTS:
+            return cached
+        try:
+            table = self.client.get_table(f"{dataset_id}.{table_id}")
+        except exceptions.NotFound:
+            self.metadata_cache.put(key, _MISSING)
+            raise
+        self.metadata_cache.put(key, table)
+        return table
+
+    def prefetch_tables(self, dataset_id, table_ids):
+        """
+        Learns which of many tables exist with a single ``INFORMATION_SCHEMA.TABLES`` query.
+
+        Afterwards ``table_exists`` is answered from the cache for every listed table;
+        ``get_table`` still fetches a table's full metadata once, on first use.
+
+        Args:
+            dataset_id (str): The dataset containing the tables.
+            table_ids (iterable): The table IDs to look up.
+        """
+        query = f"SELECT table_name FROM `{dataset_id}.INFORMATION_SCHEMA.TABLES`"
+        query_job = self.wait_for_job(self.client.query(query))
+        existing = {row["table_name"] for row in query_job.result()}
+        for table_id in set(table_ids):
+            key = self._table_key(dataset_id, table_id)
+            if table_id not in existing:
+                self.metadata_cache.put(key, _MISSING)
+            elif self.metadata_cache.get(key) is None:
+                self.metadata_cache.put(key, _EXISTS)
+        logging.info(f"Prefetched metadata of {len(set(table_ids))} tables in {dataset_id}")
+
+    def invalidate_table(self, dataset_id, table_id):
+        """
+        Drops a table's cached metadata, e.g. after changing it outside this client.
+        """
+        self.metadata_cache.invalidate(self._table_key(dataset_id, table_id))
+
+    def _table_key(self, dataset_id, table_id):
+        return f"{self.project_id}.{dataset_id}.{table_id}"
+
+    def _invalidate_written(self, query):
+        # Forget the metadata of the tables a statement, or each statement of a script, writes to
+        for statement in (query or "").split(";"):
+            match = _WRITE_TARGET.match(statement)
+            if match is None:
+                continue
+            parts = match.group(1).split(".")
+            if len(parts) == 2:
+                self.invalidate_table(*parts)
+            elif len(parts) == 3:
+                self.metadata_cache.invalidate(".".join(parts))
+
     def create_table(self, dataset_id, table_id, schema):
         """
         Creates a new table in the specified dataset in Google BigQuery.
@@ -76,23 +208,186 @@ class BigQueryClient:
         table = bigquery.Table(table_ref, schema=schema)
 
         table = self.client.create_table(table, exists_ok=True)
+        self.invalidate_table(dataset_id, table_id)
         print(f"Table {table.table_id} created in dataset {dataset_id}.")
         return table
     
-    def wait_for_result(query_job):
+    def add_columns(self, dataset_id, table_id, schema):
+        """
+        Adds the fields of ``schema`` that a table lacks, as a metadata-only schema update.
+
+        Returns:
+            list: The names of the columns added.
+        """
+        self.invalidate_table(dataset_id, table_id)
+        table = self.get_table(dataset_id, table_id)
+        existing = {field.name for field in table.schema}
+        missing = [field for field in schema if field.name not in existing]
+        if not missing:
+            return []
+        table.schema = [*table.schema, *missing]
+        self.client.update_table(table, ["schema"])
+        self.invalidate_table(dataset_id, table_id)
+        logging.info(f"Added column(s) {', '.join(field.name for field in missing)} to {dataset_id}.{table_id}")
+        return [field.name for field in missing]
+
+    def delete_table(self, dataset_id, table_id):
+        """
+        Deletes a table if it exists.
+
+        Args:
+            dataset_id (str): The dataset ID containing the table.
+            table_id (str): The table ID to delete.
+        """
+        self.client.delete_table(f"{dataset_id}.{table_id}", not_found_ok=True)
+        self.metadata_cache.put(self._table_key(dataset_id, table_id), _MISSING)
+        logging.info(f"Table {table_id} deleted from dataset {dataset_id}.")
+
+    def wait_for_jobs(self, jobs, timeout=None, return_when=ALL_COMPLETED, initial_delay=0.5, max_delay=30.0):
+        """
+        Waits for several BigQuery jobs with a single polling loop.
+
+        Every pending job is polled once per round and the loop then sleeps for an
+        exponentially growing, jittered interval, so a long job costs a handful of API
+        calls instead of one per CPU cycle.
+
+        Args:
+            jobs (iterable): The jobs to wait for.
+            timeout (float, optional): Maximum number of seconds to wait. Waits indefinitely if not provided.
+            return_when (str): ``ALL_COMPLETED`` or ``FIRST_COMPLETED`` (from ``concurrent.futures``).
+            initial_delay (float): Seconds to sleep after the first poll.
+            max_delay (float): Upper bound for the sleep between polls.
+
+        Returns:
+            tuple: ``(done, pending)`` lists of jobs. ``pending`` is non-empty only when the
+                   timeout expired or ``return_when`` is ``FIRST_COMPLETED``.
+        """
+        pending = list(jobs)
+        done = []
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        delays = backoff_delays(initial=initial_delay, maximum=max_delay)
+
+        while pending:
+            still_pending = []
+            for job in pending:
+                if job.done():
+                    done.append(job)
+                    self._invalidate_written(getattr(job, "query", None))
+                else:
+                    still_pending.append(job)
+            pending = still_pending
+
+            if not pending or (return_when == FIRST_COMPLETED and done):
+                break
+
+            delay = next(delays)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                delay = min(delay, remaining)
+
+            logging.debug(f"Waiting {delay:.1f}s for {len(pending)} BigQuery job(s) to complete")
+            time.sleep(delay)
+
+        return done, pending
+
+    def wait_for_job(self, job, timeout=None, initial_delay=0.5, max_delay=30.0):
+        """
+        Waits for a single BigQuery job to finish.
+
+        Args:
+            job (google.cloud.bigquery.job.QueryJob): The job to wait for.
+            timeout (float, optional): Maximum number of seconds to wait.
+            initial_delay (float): Seconds to sleep after the first poll.
+            max_delay (float): Upper bound for the sleep between polls.
+
+        Returns:
+            google.cloud.bigquery.job.QueryJob: The finished job.
+
+        Raises:
+            TimeoutError: If the job is still running when the timeout expires.
+            GoogleAPIError: If the job finished with an error.
+        """
+        _, pending = self.wait_for_jobs([job], timeout=timeout, initial_delay=initial_delay, max_delay=max_delay)
+        if pending:
+            raise TimeoutError(f"Job {job.job_id} did not complete within {timeout} seconds")
+        if job.error_result:
+            raise exceptions.GoogleAPIError(job.errors or job.error_result)
+        return job
+
+    async def wait_all(self, jobs, timeout=None, return_when=ALL_COMPLETED, initial_delay=0.5, max_delay=30.0):
+        """
+        Asyncio variant of :meth:`wait_for_jobs`.
+
+        Polls run in worker threads so the event loop is never blocked by the HTTP calls.
+
+        Returns:
+            tuple: ``(done, pending)`` lists of jobs.
+        """
+        pending = list(jobs)
+        done = []
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        delays = backoff_delays(initial=initial_delay, maximum=max_delay)
+
+        while pending:
+            states = await asyncio.gather(*(asyncio.to_thread(job.done) for job in pending))
+            for job, finished in zip(pending, states):
+                if finished:
+                    self._invalidate_written(getattr(job, "query", None))
+            done.extend(job for job, finished in zip(pending, states) if finished)
+            pending = [job for job, finished in zip(pending, states) if not finished]
+
+            if not pending or (return_when == FIRST_COMPLETED and done):
+                break
+
+            delay = next(delays)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                delay = min(delay, remaining)
+
+            logging.debug(f"Waiting {delay:.1f}s for {len(pending)} BigQuery job(s) to complete")
+            await asyncio.sleep(delay)
+
+        return done, pending
+
+    async def wait(self, job, timeout=None, initial_delay=0.5, max_delay=30.0):
+        """
+        Asyncio variant of :meth:`wait_for_job`, e.g. ``await client.wait(job)``.
+
+        Raises:
+            TimeoutError: If the job is still running when the timeout expires.
+            GoogleAPIError: If the job finished with an error.
+        """
+        _, pending = await self.wait_all([job], timeout=timeout, initial_delay=initial_delay, max_delay=max_delay)
+        if pending:
+            raise TimeoutError(f"Job {job.job_id} did not complete within {timeout} seconds")
+        if job.error_result:
+            raise exceptions.GoogleAPIError(job.errors or job.error_result)
+        return job
+
+    def wait_for_result(self, query_job, timeout=None):
+        """
+        Waits for a query job, logging failures instead of raising them.
+
+        Args:
+            query_job (google.cloud.bigquery.job.QueryJob): The job to wait for.
+            timeout (float, optional): Maximum number of seconds to wait.
+
+        Returns:
+            google.cloud.bigquery.job.QueryJob: The finished job, or None if it failed or timed out.
+        """
         try:
-         # print(query_job.done())
-            while query_job.done() != True:
-                logging.info(f"Waiting for query job {query_job.job_id} to complete")
-
-            if query_job.errors:
-                raise GoogleAPIError(query_job.errors)
-            
-            return query_job
-        
-        except GoogleAPIError as e:
-            logging.error(f"An error occurred: {e}")    
-        
+            return self.wait_for_job(query_job, timeout=timeout)
+
+        except exceptions.GoogleAPIError as e:
+            logging.error(f"An error occurred: {e}")
+
+        except TimeoutError as e:
+            logging.error(f"Timed out: {e}")
+
         except Exception as e:
             logging.error(f"An unexpected error occurred: {e}")
 
@@ -105,59 +400,387 @@ class BigQueryClient:
             query (str): The SQL query to execute.
 
         Returns:
-            google.cloud.bigquery.job.QueryJob: The query job.
+            google.cloud.bigquery.table.RowIterator: The result rows, not yet fetched.
         """
+        self._invalidate_written(query)
         query_job = self.client.query(query)
         # return query_job
         results = query_job.result()
-        for row in results:
-            print(row)
+        logging.info(f"Query job {query_job.job_id} returned {results.total_rows} rows")
         return results
 
-    def query_and_wait(self,query):
+    def query_batches(self, query, page_size=DEFAULT_PAGE_SIZE, job_config=None, timeout=None, use_storage_api=True):
+        """
+        Runs a query and yields its result as Arrow record batches.
 
-        
+        Large results are read through the BigQuery Storage Read API when
+        ``google-cloud-bigquery-storage`` is installed, and page by page over REST otherwise;
+        either way only a few batches are held in memory at a time.
+
+        Args:
+            query (str): The SQL query to execute.
+            page_size (int): Rows per REST page, and so per batch on the REST path.
+            job_config (google.cloud.bigquery.QueryJobConfig, optional): Extra job configuration.
+            timeout (float, optional): Maximum number of seconds to wait for the query job.
+            use_storage_api (bool): Use the Storage Read API when it is available.
+
+        Yields:
+            pyarrow.RecordBatch: The result rows.
+        """
+        rows = self._result_rows(query, page_size, job_config, timeout)
+        yield from rows.to_arrow_iterable(bqstorage_client=self._storage_client() if use_storage_api else None)
+
+    def query_to_arrow(self, query, page_size=DEFAULT_PAGE_SIZE, job_config=None, timeout=None, use_storage_api=True):
+        """
+        Runs a query and returns its whole result as a ``pyarrow.Table``.
+
+        See :meth:`query_batches` for the arguments.
+        """
+        rows = self._result_rows(query, page_size, job_config, timeout)
+        return rows.to_arrow(bqstorage_client=self._storage_client() if use_storage_api else None, create_bqstorage_client=False)
+
+    def query_to_pandas(self, query, page_size=DEFAULT_PAGE_SIZE, job_config=None, timeout=None, use_storage_api=True):
+        """
+        Runs a query and returns its whole result as a ``pandas.DataFrame``, built from Arrow.
+
+        See :meth:`query_batches` for the arguments.
+        """
+        return self.query_to_arrow(query, page_size, job_config, timeout, use_storage_api).to_pandas()
+
+    def _result_rows(self, query, page_size, job_config, timeout):
+        query_job = self.run_query(query, job_config=job_config, timeout=timeout)
+        return query_job.result(page_size=page_size)
+
+    def _storage_client(self):
+        # Created on first use and shared; None when the Storage API client is not installed
+        if not hasattr(self, "_bqstorage_client"):
+            if not isinstance(self.client, bigquery.Client):
+                self._bqstorage_client = None
+                return None
+            try:
+                from google.cloud import bigquery_storage
+            except ImportError:
+                logging.debug("google-cloud-bigquery-storage is not installed; reading results over REST")
+                self._bqstorage_client = None
+            else:
+                self._bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=self.client._credentials)
+        return self._bqstorage_client
+
+    def submit_query(self, query, job_config=None):
+        """
+        Submits a query without waiting for it to finish.
+
+        Args:
+            query (str): The SQL query to execute.
+            job_config (google.cloud.bigquery.QueryJobConfig, optional): Extra job configuration.
+
+        Returns:
+            google.cloud.bigquery.job.QueryJob: The running query job.
+        """
+        self._invalidate_written(query)
+        query_job = self.client.query(query, job_config=job_config)
+        logging.info(f"Submitted query job {query_job.job_id}")
+        return query_job
+
+    def script_child_jobs(self, job):
+        """
+        Lists the jobs BigQuery ran for the statements of a finished script job.
+
+        Args:
+            job (google.cloud.bigquery.job.QueryJob): The script (parent) job.
+
+        Returns:
+            list: The child jobs in statement order, each with its own ``statement_type``,
+                  ``num_dml_affected_rows`` and byte statistics.
+        """
+        children = list(self.client.list_jobs(parent_job=job.job_id))
+        # Children are listed most recent first; IDs end in the statement number
+        return sorted(children, key=lambda child: (child.created, len(child.job_id), child.job_id))
+
+    def dry_run(self, query, job_config=None):
+        """
+        Validates a query and estimates how many bytes it would scan, without running it.
+
+        Args:
+            query (str): The SQL query to estimate.
+            job_config (google.cloud.bigquery.QueryJobConfig, optional): Extra job configuration.
+
+        Returns:
+            int: The estimated number of bytes processed.
+        """
+        job_config = job_config or bigquery.QueryJobConfig()
+        job_config.dry_run = True
+        job_config.use_query_cache = False
+        query_job = self.client.query(query, job_config=job_config)
+        return query_job.total_bytes_processed
+
+    def run_query(self, query, job_config=None, timeout=None, attempts=DEFAULT_ATTEMPTS):
+        """
+        Runs a query to completion, retrying rate limits, DML conflicts and backend errors.
+
+        A failed job is resubmitted after an exponentially growing, jittered delay; BigQuery
+        rolls back a failed statement, so this is safe for DML as well. Timeouts are not
+        retried, since the job may still be running.
+
+        Args:
+            query (str): The SQL query to execute.
+            job_config (google.cloud.bigquery.QueryJobConfig, optional): Extra job configuration.
+            timeout (float, optional): Maximum number of seconds to wait for each attempt.
+            attempts (int): Maximum number of jobs submitted.
+
+        Returns:
+            google.cloud.bigquery.job.QueryJob: The finished job.
+
+        Raises:
+            TimeoutError: If a job is still running when the timeout expires.
+            GoogleAPIError: If the last attempt failed, or the error is not worth retrying.
+        """
+        delays = backoff_delays(initial=DEFAULT_INITIAL_DELAY, maximum=DEFAULT_MAX_DELAY)
+        for attempt in range(1, attempts + 1):
+            try:
+                query_job = self.submit_query(query, job_config=job_config)
+                _, pending = self.wait_for_jobs([query_job], timeout=timeout)
+                if pending:
+                    raise TimeoutError(f"Job {query_job.job_id} did not complete within {timeout} seconds")
+                if not query_job.error_result:
+                    return query_job
+                error, kind = exceptions.GoogleAPIError(query_job.errors or query_job.error_result), classify_error(query_job.error_result)
+            except (exceptions.GoogleAPIError, ConnectionError) as e:
+                error, kind = e, classify_error(e)
+
+            if kind not in RETRYABLE or attempt == attempts:
+                raise error
+            delay = next(delays)
+            logging.warning(f"Query failed ({kind}), retrying in {delay:.1f}s (attempt {attempt} of {attempts}): {error}")
+            time.sleep(delay)
+
+    def query_and_wait(self, query, timeout=None, job_config=None, attempts=DEFAULT_ATTEMPTS):
+        """
+        Submits a query and waits for it with backoff polling, retrying transient failures
+        (see :meth:`run_query`).
+
+        Args:
+            query (str): The SQL query to execute.
+            timeout (float, optional): Maximum number of seconds to wait for the job.
+            job_config (google.cloud.bigquery.QueryJobConfig, optional): Extra job configuration.
+            attempts (int): Maximum number of jobs submitted.
+
+        Returns:
+            google.cloud.bigquery.job.QueryJob: The finished job, or None if it failed.
+        """
         try:
-            query_job = self.client.query(query)
-         # print(query_job.done())
-            while query_job.done() != True:
-                logging.info(f"Waiting for query job {query_job.job_id} to complete")
-
-            if query_job.errors:
-                raise GoogleAPIError(query_job.errors)
-            
-            return query_job
-        
-        except GoogleAPIError as e:
-            logging.error(f"An error occurred: {e}")    
-        
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-        
+            return self.run_query(query, job_config=job_config, timeout=timeout, attempts=attempts)
+        except (exceptions.GoogleAPIError, ConnectionError) as e:
+            logging.error(f"An error occurred: {e}")
+        except TimeoutError as e:
+            logging.error(f"Timed out: {e}")
 
-    def load_data_from_json(self, dataset_id, table_id, json_data, schema):
+    def load_data_from_json(self, dataset_id, table_id, json_data, schema, chunk_bytes=DEFAULT_LOAD_CHUNK_BYTES):
         """
         Loads data from a JSON object into a BigQuery table.
 
         Args:
             dataset_id (str): The dataset ID where the table exists.
             table_id (str): The table ID where data will be loaded.
-            json_data (list): The JSON data to load into the table.
+            json_data (iterable): The rows to load; any iterable or generator of dicts.
             schema (list): The schema of the table.
+            chunk_bytes (int, optional): See :meth:`load_json_stream`.
 
         Returns:
-            google.cloud.bigquery.job.LoadJob: The load job.
+            google.cloud.bigquery.job.LoadJob: The last load job.
+        """
+        load_jobs = self.load_json_stream(dataset_id, table_id, json_data, schema, chunk_bytes=chunk_bytes)
+        print(f"Loaded {sum(job.output_rows or 0 for job in load_jobs)} rows into {dataset_id}:{table_id}.")
+        return load_jobs[-1] if load_jobs else None
+
+    def load_json_stream(self, dataset_id, table_id, rows, schema, chunk_bytes=DEFAULT_LOAD_CHUNK_BYTES,
+                         spool_bytes=DEFAULT_SPOOL_BYTES, write_disposition="WRITE_APPEND", timeout=None):
+        """
+        Loads rows from an iterator with memory use independent of the input size.
+
+        Rows are serialized to newline-delimited JSON into a temporary file that stays in
+        memory up to ``spool_bytes`` and spills to disk beyond that. Every ``chunk_bytes``
+        the file is uploaded and submitted as its own load job; the upload blocks, but the
+        job then runs in BigQuery while the next chunk is serialized. Jobs are not ordered
+        against each other, so with a ``write_disposition`` other than ``WRITE_APPEND`` the
+        first job is waited for before any later chunk is submitted; otherwise a slow
+        ``WRITE_TRUNCATE`` could replace rows appended by a later chunk.
+
+        Serialized rows are joined into batches of about ``DEFAULT_WRITE_BATCH_BYTES`` and
+        written to the file once per batch, trading that much extra memory for far fewer
+        writes; a chunk may exceed ``chunk_bytes`` by up to one batch.
+
+        Each chunk is committed separately, so a failure part way through leaves the earlier
+        chunks loaded; pass ``chunk_bytes=None`` to upload everything in one (atomic) job.
+
+        Args:
+            dataset_id (str): The dataset ID where the table exists.
+            table_id (str): The table ID where data will be loaded.
+            rows (iterable): Dicts to load, e.g. a generator reading a feed.
+            schema (list): The schema of the table.
+            chunk_bytes (int, optional): Serialized bytes per load job, or None for a single job.
+            spool_bytes (int): Bytes of a chunk kept in memory before it is spooled to disk.
+            write_disposition (str): Applies to the first job, which must finish before later
+                                     chunks append unless it is ``WRITE_APPEND`` itself.
+            timeout (float, optional): Maximum number of seconds to wait for the load jobs.
+
+        Returns:
+            list: The finished load jobs, in order.
+
+        Raises:
+            TimeoutError: If the load jobs do not finish within ``timeout``.
+            GoogleAPIError: If a load job failed.
         """
         table_ref = self.client.dataset(dataset_id).table(table_id)
+        load_jobs = []
+
+        def check(jobs, pending):
+            if pending:
+                raise TimeoutError(f"{len(pending)} load job(s) into {dataset_id}.{table_id} did not complete within {timeout} seconds")
+            for load_job in jobs:
+                if load_job.error_result:
+                    raise exceptions.GoogleAPIError(load_job.errors or load_job.error_result)
+
+        def upload(buffer, last):
+            first = not load_jobs
+            job_config = bigquery.LoadJobConfig()
+            job_config.schema = schema
+            job_config.source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+            job_config.write_disposition = write_disposition if first else bigquery.WriteDisposition.WRITE_APPEND
+            load_jobs.append(self.client.load_table_from_file(buffer, table_ref, rewind=True, job_config=job_config))
+            logging.info(f"Submitted load job {load_jobs[-1].job_id} ({buffer.tell()} bytes) into {dataset_id}.{table_id}")
+            if first and not last and write_disposition != bigquery.WriteDisposition.WRITE_APPEND:
+                # Later chunks append; they must not land before the first job truncates or checks the table
+                _, pending = self.wait_for_jobs(load_jobs, timeout=timeout)
+                check(load_jobs, pending)
+
+        # One encoder for every row: json.dumps(default=...) builds a new one per call
+        encode = json.JSONEncoder(default=str).encode
+        buffer = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        try:
+            lines, batch_chars = [], 0
+            for row in rows:
+                line = encode(row)
+                lines.append(line)
+                batch_chars += len(line) + 1
+                if batch_chars < DEFAULT_WRITE_BATCH_BYTES:
+                    continue
+                buffer.write(("\n".join(lines) + "\n").encode("utf-8"))
+                lines, batch_chars = [], 0
+                if chunk_bytes is not None and buffer.tell() >= chunk_bytes:
+                    upload(buffer, last=False)
+                    buffer.close()
+                    buffer = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+            if lines:
+                buffer.write(("\n".join(lines) + "\n").encode("utf-8"))
+            if buffer.tell() or not load_jobs:
+                upload(buffer, last=True)
+        finally:
+            buffer.close()
+
+        _, pending = self.wait_for_jobs(load_jobs, timeout=timeout)
+        self.invalidate_table(dataset_id, table_id)
+        check(load_jobs, pending)
+        return load_jobs
+    
+    def load_arrow_table(self, dataset_id, table_id, data, compression="snappy", write_disposition="WRITE_APPEND",
+                         staging_uri=None, spool_bytes=DEFAULT_SPOOL_BYTES, timeout=None):
+        """
+        Loads Arrow data by writing it as compressed Parquet and submitting a PARQUET load job.
+
+        Batches are written one at a time, so a ``RecordBatchReader`` or generator is loaded
+        without holding more than one batch plus the spooled file (in memory up to
+        ``spool_bytes``, on disk beyond that). The column types come from the Arrow schema.
+
+        Args:
+            dataset_id (str): The dataset ID where the table exists.
+            table_id (str): The table ID where data will be loaded.
+            data: A ``pyarrow.Table``, ``pyarrow.RecordBatchReader`` or iterable of ``RecordBatch``.
+            compression (str): Parquet compression codec, e.g. ``snappy``, ``zstd`` or ``none``.
+            write_disposition (str): How to treat existing rows, appended to by default.
+            staging_uri (str, optional): Write the Parquet file to this ``gs://`` URI and load from
+                                         there instead of uploading it from this process.
+            spool_bytes (int): Bytes of Parquet kept in memory before it is spooled to disk.
+            timeout (float, optional): Maximum number of seconds to wait for the load job.
+
+        Returns:
+            google.cloud.bigquery.job.LoadJob: The finished load job.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if isinstance(data, (pa.Table, pa.RecordBatchReader)):
+            schema = data.schema
+            batches = data.to_batches() if isinstance(data, pa.Table) else data
+        else:
+            batches = iter(data)
+            first = next(batches, None)
+            if first is None:
+                raise ValueError("No record batches to load")
+            schema = first.schema
+            batches = itertools.chain([first], batches)
+
         job_config = bigquery.LoadJobConfig()
-        job_config.schema = schema
-        job_config.source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+        job_config.source_format = bigquery.SourceFormat.PARQUET
+        job_config.write_disposition = write_disposition
+        parquet_options = bigquery.ParquetOptions()
+        parquet_options.enable_list_inference = True
+        job_config.parquet_options = parquet_options
+
+        def write(sink):
+            writer = pq.ParquetWriter(sink, schema, compression=compression)
+            try:
+                for batch in batches:
+                    writer.write_batch(batch)
+            finally:
+                writer.close()
+
+        if staging_uri:
+            import pyarrow.fs
+
+            filesystem, path = pyarrow.fs.FileSystem.from_uri(staging_uri)
+            with filesystem.open_output_stream(path) as sink:
+                write(sink)
+            return self.load_parquet(dataset_id, table_id, staging_uri, write_disposition=write_disposition, timeout=timeout)
 
-        load_job = self.client.load_table_from_json(json_data, table_ref, job_config=job_config)
-        load_job.result()
+        table_ref = self.client.dataset(dataset_id).table(table_id)
+        with tempfile.SpooledTemporaryFile(max_size=spool_bytes) as buffer:
+            write(buffer)
+            logging.info(f"Uploading {buffer.tell()} bytes of Parquet into {dataset_id}.{table_id}")
+            load_job = self.client.load_table_from_file(buffer, table_ref, rewind=True, job_config=job_config)
+        return self._finish_load(load_job, dataset_id, table_id, timeout)
+
+    def load_parquet(self, dataset_id, table_id, source_uris, write_disposition="WRITE_APPEND", timeout=None):
+        """
+        Loads Parquet files already in Cloud Storage; no data passes through this process.
+
+        Args:
+            dataset_id (str): The dataset ID where the table exists.
+            table_id (str): The table ID where data will be loaded.
+            source_uris (str or list): ``gs://`` URIs, which may end in a wildcard such as
+                                       ``gs://bucket/export/*.parquet``.
+            write_disposition (str): How to treat existing rows, appended to by default.
+            timeout (float, optional): Maximum number of seconds to wait for the load job.
+
+        Returns:
+            google.cloud.bigquery.job.LoadJob: The finished load job.
+        """
+        job_config = bigquery.LoadJobConfig()
+        job_config.source_format = bigquery.SourceFormat.PARQUET
+        job_config.write_disposition = write_disposition
+        table_ref = self.client.dataset(dataset_id).table(table_id)
+        load_job = self.client.load_table_from_uri(source_uris, table_ref, job_config=job_config)
+        logging.info(f"Submitted load job {load_job.job_id} from {source_uris} into {dataset_id}.{table_id}")
+        return self._finish_load(load_job, dataset_id, table_id, timeout)
+
+    def _finish_load(self, load_job, dataset_id, table_id, timeout):
+        try:
+            self.wait_for_job(load_job, timeout=timeout)
+        finally:
+            self.invalidate_table(dataset_id, table_id)
         print(f"Loaded {load_job.output_rows} rows into {dataset_id}:{table_id}.")
         return load_job
-    
+
     def load_dataframe_to_table(self, dataset_id, table_id, dataframe):
         """
         Loads a Pandas DataFrame to a BigQuery table.
@@ -176,6 +799,7 @@ class BigQueryClient:
 
         load_job = self.client.load_table_from_dataframe(dataframe, table_ref, job_config=job_config)
         load_job.result()
+        self.invalidate_table(dataset_id, table_id)
         print(f"Loaded {load_job.output_rows} rows into {dataset_id}:{table_id}.")
         return load_job
 
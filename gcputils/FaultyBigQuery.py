@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from google.api_core.exceptions import ServiceUnavailable, TooManyRequests
+
+
+# Error results of injected job failures, as BigQuery reports them
+_FAULTS = {
+    "rate_limit": {"reason": "rateLimitExceeded", "message": "Exceeded rate limits: too many table dml insert operations for this table."},
+    "conflict": {"reason": "invalidQuery", "message": "Could not serialize access to table due to concurrent update"},
+    "backend": {"reason": "backendError", "message": "Error encountered during execution. Retrying may solve the problem."},
+    "quota": {"reason": "rateLimitExceeded", "message": "Exceeded rate limits: too many concurrent queries for this project."},
+}
+
+
+class FaultyQueryJob:
+    def __init__(self, job, ready_at, error=None):
+        """
+        Wraps a job of the underlying client so that it finishes at ``ready_at`` and, if
+        ``error`` is set, fails with that ``error_result`` instead of its own outcome.
+        """
+        self._job = job
+        self._ready_at = ready_at
+        if error is not None:
+            self.error_result = error
+            self.errors = [error]
+            self.num_dml_affected_rows = None
+
+    def done(self, *args, **kwargs):
+        return time.monotonic() >= self._ready_at
+
+    def result(self, *args, **kwargs):
+        while not self.done():
+            time.sleep(max(0.0, self._ready_at - time.monotonic()))
+        return self._job.result(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)
+
+
+class FaultInjectingClient:
+    def __init__(self, client, job_latency=0.0, max_concurrent_jobs=None, rate_limit=0.0, conflict=0.0,
+                 backend=0.0, submit_errors=0.0, statements=("MERGE", "INSERT", "UPDATE", "DELETE"), seed=None):
+        """
+        Wraps a BigQuery client (usually ``LocalBigQueryClient``) and injects the failures the
+        retry layer has to cope with, so throughput under throttling can be measured offline.
+
+        Jobs take ``job_latency`` seconds to finish. A statement submitted while
+        ``max_concurrent_jobs`` of them are still running fails with a rate-limit error, like
+        BigQuery's concurrent query quota; the others fail at random with the given
+        probabilities. Injected failures never reach the underlying client, so they have no
+        effect on the data. Only the ``statements`` kinds (by first keyword) are affected;
+        everything else passes straight through.
+
+        Args:
+            client: The client whose jobs are wrapped.
+            job_latency (float): Seconds each affected job runs.
+            max_concurrent_jobs (int, optional): Affected jobs running at once before new ones are throttled.
+            rate_limit (float): Probability that a job fails with ``rateLimitExceeded``.
+            conflict (float): Probability that a job fails with a concurrent-update conflict.
+            backend (float): Probability that a job fails with ``backendError``.
+            submit_errors (float): Probability that submitting raises ``TooManyRequests`` or ``ServiceUnavailable``.
+            statements (tuple): Statement kinds faults are injected into.
+            seed (int, optional): Seed of the random failures, for repeatable runs.
+        """
+        self.client = client
+        self.job_latency = job_latency
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.rates = {"rate_limit": rate_limit, "conflict": conflict, "backend": backend}
+        self.submit_errors = submit_errors
+        self.statements = tuple(statement.upper() for statement in statements)
+        self.submitted = 0
+        self.injected = dict.fromkeys(["quota", "submit", *self.rates], 0)
+        self.max_running = 0
+        self._random = random.Random(seed)
+        self._running = []
+        self._lock = threading.Lock()
+
+    def query(self, query, job_config=None, **kwargs):
+        if (query.split(None, 1) or [""])[0].upper() not in self.statements:
+            return self.client.query(query, job_config=job_config, **kwargs)
+
+        now = time.monotonic()
+        with self._lock:
+            self.submitted += 1
+            if self._random.random() < self.submit_errors:
+                self.injected["submit"] += 1
+                error = self._random.choice([TooManyRequests, ServiceUnavailable])
+                raise error("Injected error submitting the job")
+            self._running = [ready for ready in self._running if ready > now]
+            fault = None
+            if self.max_concurrent_jobs is not None and len(self._running) >= self.max_concurrent_jobs:
+                fault = "quota"
+            else:
+                draw = self._random.random()
+                for name, rate in self.rates.items():
+                    if draw < rate:
+                        fault = name
+                        break
+                    draw -= rate
+            if fault is not None:
+                self.injected[fault] += 1
+            else:
+                self._running.append(now + self.job_latency)
+                self.max_running = max(self.max_running, len(self._running))
+
+        if fault is not None:
+            # The statement never runs; the job fails shortly after it was created
+            job = self.client.query("SELECT 1")
+            return FaultyQueryJob(job, now + min(self.job_latency, 0.01), error=_FAULTS[fault])
+        return FaultyQueryJob(self.client.query(query, job_config=job_config, **kwargs), now + self.job_latency)
+
+    def stats(self):
+        with self._lock:
+            return {"submitted": self.submitted, "max_running": self.max_running, "injected": dict(self.injected)}
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -1,9 +1,14 @@
-from google.cloud import logging as cloud_logging
 import os
 import logging
+import threading
+from gcputils.lazy import lazy_import
+from gcputils.log_shipper import LogShipper
+from gcputils.session import shared_credentials, shared_session
+
+cloud_logging = lazy_import("google.cloud.logging")
 
 class GoogleCloudLogging:
-    def __init__(self, project_id, credentials_path=None):
+    def __init__(self, project_id, credentials_path=None, client=None, logger_name="default_logger", labels=None, **shipper_options):
         """
         Initializes the Google Cloud Logging client.
 
@@ -11,23 +16,47 @@ class GoogleCloudLogging:
             project_id (str): The Google Cloud project ID.
             credentials_path (str, optional): Path to the JSON file containing service account credentials.
                                               If not provided, it will use the default credentials from the environment.
+            client (optional): An object implementing the ``google.cloud.logging.Client`` methods used here.
+                               Created on first use when not provided.
+            logger_name (str): The log that ``log_text`` and ``log_struct`` write to.
+            labels (dict, optional): Labels added to every entry, e.g. the service or run ID.
+            **shipper_options: Batching, queue and overflow options passed to ``gcputils.log_shipper.LogShipper``.
         """
         self.project_id = project_id
         self.credentials_path = credentials_path
-        self.client = self._create_client()
+        self.logger_name = logger_name
+        self.labels = labels
+        self.shipper_options = shipper_options
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._shipper = None
+        self._shipper_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     def _create_client(self):
         """
         Creates and returns the Google Cloud Logging client.
 
+        The client talks HTTP over the process-wide shared session rather than opening a
+        gRPC channel of its own.
+
         Returns:
             google.cloud.logging.Client: The initialized Google Cloud Logging client.
         """
-        if self.credentials_path:
-            client = cloud_logging.Client.from_service_account_json(self.credentials_path, project=self.project_id)
-        else:
-            client = cloud_logging.Client(project=self.project_id)
-        return client
+        credentials, _ = shared_credentials(self.credentials_path)
+        return cloud_logging.Client(project=self.project_id, credentials=credentials,
+                                    _http=shared_session(self.credentials_path), _use_grpc=False)
 
     def setup_logging(self):
         """
@@ -38,17 +67,59 @@ class GoogleCloudLogging:
         cloud_logger.setLevel(logging.INFO)
         cloud_logger.addHandler(handler)
 
-    def log_text(self, message, severity='INFO'):
+    @property
+    def shipper(self):
+        # One logger and background shipper per instance, started with the first entry
+        if self._shipper is None:
+            with self._shipper_lock:
+                if self._shipper is None:
+                    logger = self.client.logger(self.logger_name)
+                    self._shipper = LogShipper(logger, labels=self.labels, **self.shipper_options)
+        return self._shipper
+
+    def log_text(self, message, severity='INFO', labels=None):
         """
         Logs a message to Google Cloud Logging.
 
+        The entry is queued and written in a batch by a background thread, so this does not wait
+        for the network.
+
         Args:
             message (str): The message to log.
             severity (str, optional): The severity level of the log. Default is 'INFO'.
+            labels (dict, optional): Labels of this entry, e.g. the job ID of a merge.
+
+        Returns:
+            bool: False if the entry was dropped because the queue was full.
+        """
+        return self.shipper.emit(message, severity=severity, labels=labels)
+
+    def log_struct(self, payload, severity='INFO', labels=None):
+        """
+        Logs a structured (JSON) entry to Google Cloud Logging, queued like ``log_text``.
+
+        Args:
+            payload (dict): A JSON-serializable mapping, e.g. a merge job's table, status and row counts.
+            severity (str, optional): The severity level of the log. Default is 'INFO'.
+            labels (dict, optional): Labels of this entry.
+
+        Returns:
+            bool: False if the entry was dropped because the queue was full.
+        """
+        return self.shipper.emit(payload, severity=severity, labels=labels)
+
+    def flush(self, timeout=None):
+        """
+        Waits until every entry logged so far has been written or dropped.
+        """
+        return self._shipper.flush(timeout) if self._shipper is not None else True
+
+    def close(self, timeout=10.0):
+        """
+        Flushes pending entries and stops the background thread. Also runs at interpreter exit.
         """
-        logger = self.client.logger('default_logger')
-        logger.log_text(message, severity=severity)
-        print(f"Logged: {message} with severity {severity}")
+        if self._shipper is not None:
+            self._shipper.close(timeout)
 
 # Example usage:
 
@@ -62,6 +133,7 @@ def test():
 
     # Log a message
     gcl.log_text("This is a test log message.")
+    gcl.flush()
 
 if __name__ == "__main__":
     test()
\ No newline at end of file
@@ -1,35 +1,148 @@
-from google.cloud import secretmanager
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from gcputils.lazy import lazy_import
+from gcputils.session import shared_credentials
+from gcputils.ttl_cache import TTLCache
+
+secretmanager = lazy_import("google.cloud.secretmanager")
+exceptions = lazy_import("google.api_core.exceptions")
+
+# Seconds payloads are cached, payloads kept, and concurrent requests when prefetching
+DEFAULT_CACHE_TTL = 300.0
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_PREFETCH_WORKERS = 8
 
 class GoogleSecretManager:
-    def __init__(self, project_id=None):
+    def __init__(self, project_id=None, credentials_path=None, client=None, cache_ttl=DEFAULT_CACHE_TTL,
+                 cache_size=DEFAULT_CACHE_SIZE, pin_versions=False):
         """
         Initialize the GoogleSecretManager client.
 
+        Payloads are cached in process for ``cache_ttl`` seconds, so reading the same secret in
+        a loop or once per request costs one call per TTL window.
+
         Args:
         project_id (str): Google Cloud Project ID. If not provided, it will be read from the environment variable PROJECT_NAME.
+        credentials_path (str, optional): Path to a service account JSON file. If not provided, the default credentials from the environment are used.
+        client (optional): An object implementing the ``SecretManagerServiceClient`` methods used here, such as
+                           ``gcputils.LocalSecretManager.LocalSecretManagerClient``. Created on first use when not provided.
+        cache_ttl (float): Seconds a payload, and with ``pin_versions`` the version ``latest`` resolves to, is cached; 0 disables the cache.
+        cache_size (int): Maximum number of cached payloads.
+        pin_versions (bool): Resolve ``latest`` to a version number once per TTL window and cache payloads per
+                             version number. Payloads still expire after ``cache_ttl``, so a version that was
+                             disabled or destroyed stops being served; if the pinned version can no longer be
+                             read, the pin is dropped and ``latest`` is resolved again.
         """
-        self.client = secretmanager.SecretManagerServiceClient()
+        self.credentials_path = credentials_path
+        self._client = client
+        self._client_lock = threading.Lock()
         self.project_id = project_id or os.getenv("PROJECT_NAME")
         if not self.project_id:
             raise ValueError("Project ID must be provided or set in the environment variable PROJECT_NAME")
-    
-    def access_secret(self, secret_id, version_id='latest'):
+        self.pin_versions = pin_versions
+        self.cache = TTLCache(ttl=cache_ttl, max_entries=cache_size)
+        self.pinned_versions = TTLCache(ttl=cache_ttl, max_entries=cache_size)
+
+    @property
+    def client(self):
+        # Secret Manager speaks gRPC, so it shares the credentials but not the HTTP session
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    credentials, _ = shared_credentials(self.credentials_path)
+                    self._client = secretmanager.SecretManagerServiceClient(credentials=credentials)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def access_secret(self, secret_id, version_id='latest', refresh=False):
         """
         Access the secret version and return the payload.
 
         Args:
         secret_id (str): The ID of the secret to access.
         version_id (str): The version of the secret to access (default is 'latest').
+        refresh (bool): Skip the cache and fetch the payload again.
 
         Returns:
         str: The secret payload as a string.
         """
+        version_id = str(version_id)
+        pinned = None
+        if self.pin_versions and version_id == "latest" and not refresh:
+            pinned = self.pinned_versions.get(secret_id)
+            version_id = pinned or version_id
+
+        key = f"{secret_id}/{version_id}"
+        payload = None if refresh else self.cache.get(key)
+        if payload is not None:
+            return payload
+
         name = f"projects/{self.project_id}/secrets/{secret_id}/versions/{version_id}"
-        response = self.client.access_secret_version(name=name)
+        try:
+            response = self.client.access_secret_version(name=name)
+        except (exceptions.FailedPrecondition, exceptions.NotFound):
+            if pinned is None:
+                raise
+            # The pinned version was disabled or destroyed: unpin and read what latest is now
+            self.refresh(secret_id)
+            return self.access_secret(secret_id)
         payload = response.payload.data.decode("UTF-8")
+
+        if self.pin_versions:
+            # The response names the version that was read, which is the number "latest" resolved to
+            resolved = response.name.rsplit("/", 1)[-1]
+            if version_id == "latest":
+                self.pinned_versions.put(secret_id, resolved)
+            key = f"{secret_id}/{resolved}"
+        self.cache.put(key, payload)
         return payload
 
+    def resolved_version(self, secret_id):
+        """
+        Returns the version number ``latest`` is pinned to for ``secret_id``, or None if it is not pinned.
+        """
+        return self.pinned_versions.get(secret_id)
+
+    def refresh(self, secret_id=None):
+        """
+        Drops cached payloads and pinned versions, so the next access fetches them again.
+
+        Args:
+        secret_id (str, optional): The secret to refresh; all secrets if not provided.
+        """
+        if secret_id is None:
+            self.cache.clear()
+            self.pinned_versions.clear()
+        else:
+            self.cache.invalidate_prefix(f"{secret_id}/")
+            self.pinned_versions.invalidate(secret_id)
+
+    def prefetch(self, secret_ids, version_id='latest', max_workers=DEFAULT_PREFETCH_WORKERS):
+        """
+        Fetches several secrets concurrently into the cache, e.g. at startup.
+
+        Args:
+        secret_ids (list): The IDs of the secrets to fetch.
+        version_id (str): The version to fetch of each secret (default is 'latest').
+        max_workers (int): Maximum number of concurrent requests.
+
+        Returns:
+        dict: The payload of each secret, by secret ID.
+
+        Raises:
+        google.api_core.exceptions.GoogleAPICallError: The first error of a secret that could not be fetched.
+        """
+        secret_ids = list(secret_ids)
+        if not secret_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(secret_ids))) as executor:
+            payloads = executor.map(lambda secret_id: self.access_secret(secret_id, version_id), secret_ids)
+            return dict(zip(secret_ids, payloads))
+
 # Example usage:
 if __name__ == "__main__":
     gsm = GoogleSecretManager()
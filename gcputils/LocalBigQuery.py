@@ -0,0 +1,597 @@
+import datetime
+import hashlib
+import itertools
+import json
+import logging
+import re
+import sqlite3
+import threading
+from google.api_core.exceptions import BadRequest, NotFound
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Row
+
+
+# BigQuery column types and the SQLite declared types that give them the right affinity
+_SQLITE_TYPES = {
+    "STRING": "TEXT", "BYTES": "BLOB", "INTEGER": "INTEGER", "INT64": "INTEGER",
+    "FLOAT": "REAL", "FLOAT64": "REAL", "NUMERIC": "NUMERIC", "BIGNUMERIC": "NUMERIC",
+    "BOOLEAN": "INTEGER", "BOOL": "INTEGER", "TIMESTAMP": "TEXT", "DATETIME": "TEXT",
+    "DATE": "TEXT", "TIME": "TEXT", "JSON": "TEXT",
+}
+_BIGQUERY_TYPES = {"TEXT": "STRING", "INTEGER": "INTEGER", "INT": "INTEGER", "REAL": "FLOAT", "NUMERIC": "NUMERIC", "BLOB": "BYTES", "": "STRING"}
+
+
+def _farm_fingerprint(value):
+    # Any stable signed 64-bit hash will do: only the distribution matters locally
+    if value is None:
+        return None
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _mod(dividend, divisor):
+    # BigQuery's MOD takes the sign of the dividend, unlike Python's %
+    if dividend is None or divisor is None:
+        return None
+    remainder = abs(dividend) % abs(divisor)
+    return -remainder if dividend < 0 else remainder
+
+
+class _CountIf:
+    def __init__(self):
+        self.count = 0
+
+    def step(self, value):
+        if value:
+            self.count += 1
+
+    def finalize(self):
+        return self.count
+
+
+def _sqlite_value(value):
+    # Nested records and repeated fields are stored as JSON text, times as ISO strings
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _arrow_type(arrow_type):
+    import pyarrow.types as types
+
+    if types.is_integer(arrow_type):
+        return "INTEGER"
+    if types.is_floating(arrow_type):
+        return "FLOAT"
+    if types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if types.is_timestamp(arrow_type):
+        return "TIMESTAMP"
+    if types.is_date(arrow_type):
+        return "DATE"
+    if types.is_decimal(arrow_type):
+        return "NUMERIC"
+    if types.is_binary(arrow_type):
+        return "BYTES"
+    return "STRING"
+
+
+def _quote_columns(columns):
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def _closing_paren(sql, start):
+    # Index of the parenthesis closing the one opened at ``start``
+    depth = 0
+    for index in range(start, len(sql)):
+        if sql[index] == "(":
+            depth += 1
+        elif sql[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError(f"Unbalanced parentheses in: {sql}")
+
+
+def _split_statements(script):
+    # Top-level statements of a script: semicolons inside quotes and comments do not count
+    statements, start, quote, index = [], 0, None, 0
+    while index < len(script):
+        char = script[index]
+        if quote:
+            if char == "\\":
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif script.startswith("--", index):
+            newline = script.find("\n", index)
+            index = len(script) if newline < 0 else newline
+        elif char == ";":
+            statements.append(script[start:index])
+            start = index + 1
+        index += 1
+    statements.append(script[start:])
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+class LocalQueryJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, query, rows=None, schema=None, affected_rows=None, bytes_processed=0, error=None, dry_run=False):
+        """
+        A finished query job with the attributes of ``google.cloud.bigquery.QueryJob`` the repo reads.
+        """
+        self.job_id = f"local_{next(self._ids)}"
+        self.query = query
+        self.state = "DONE"
+        self.dry_run = dry_run
+        self.num_dml_affected_rows = affected_rows
+        self.total_bytes_processed = bytes_processed
+        self.total_bytes_billed = bytes_processed
+        self.slot_millis = 0
+        self.cache_hit = False
+        self.statement_type = (query.split(None, 1) or ["SELECT"])[0].upper() if not dry_run else None
+        self.created = self.started = self.ended = datetime.datetime.now(datetime.timezone.utc)
+        self.error_result = {"reason": "invalidQuery", "message": error} if error else None
+        self.errors = [self.error_result] if error else None
+        self._rows = rows or []
+        self._schema = schema or []
+
+    def done(self, *args, **kwargs):
+        return True
+
+    def reload(self, *args, **kwargs):
+        return None
+
+    def cancel(self, *args, **kwargs):
+        return False
+
+    def result(self, *args, page_size=None, **kwargs):
+        if self.error_result:
+            raise BadRequest(self.error_result["message"])
+        return LocalRowIterator(self._rows, self._schema, page_size)
+
+
+class LocalRowIterator:
+    def __init__(self, rows, columns, page_size=None):
+        """
+        Query results with the iteration and Arrow methods of ``google.cloud.bigquery.table.RowIterator``.
+        """
+        self._rows = rows
+        self._columns = columns
+        self.page_size = page_size or 10_000
+        self.total_rows = len(rows)
+        self._field_to_index = {name: index for index, name in enumerate(columns)}
+
+    def __iter__(self):
+        return (Row(tuple(values), self._field_to_index) for values in self._rows)
+
+    def __len__(self):
+        return self.total_rows
+
+    def to_arrow_iterable(self, bqstorage_client=None, max_queue_size=None):
+        import pyarrow as pa
+
+        for start in range(0, len(self._rows), self.page_size):
+            page = self._rows[start:start + self.page_size]
+            yield pa.RecordBatch.from_pydict({name: [row[i] for row in page] for i, name in enumerate(self._columns)})
+
+    def to_arrow(self, bqstorage_client=None, create_bqstorage_client=True, **kwargs):
+        import pyarrow as pa
+
+        batches = list(self.to_arrow_iterable())
+        if not batches:
+            return pa.table({name: [] for name in self._columns})
+        return pa.Table.from_batches(batches)
+
+    def to_dataframe(self, *args, **kwargs):
+        return self.to_arrow().to_pandas()
+
+
+class LocalTable:
+    def __init__(self, project, dataset_id, table_id, schema, num_rows, modified, clustering_fields=None):
+        """
+        Table metadata with the attributes of ``google.cloud.bigquery.Table`` the repo reads.
+        """
+        self.project = project
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+        self.full_table_id = f"{project}:{dataset_id}.{table_id}"
+        self.schema = schema
+        self.num_rows = num_rows
+        self.num_bytes = num_rows * 8 * max(1, len(schema))
+        self.modified = modified
+        self.created = modified
+        self.clustering_fields = clustering_fields
+        self.time_partitioning = None
+        self.range_partitioning = None
+        self.streaming_buffer = None
+        self.etag = f"{modified.isoformat()}:{num_rows}"
+
+
+class LocalBigQueryClient:
+    def __init__(self, project="local", database=":memory:"):
+        """
+        An in-process stand-in for ``google.cloud.bigquery.Client`` backed by SQLite.
+
+        Pass it to ``BigQueryClient(project_id, client=LocalBigQueryClient())`` to run the merge
+        path without a GCP project. Tables named ``dataset.table`` become SQLite tables of the same
+        name, clustering fields become indexes, and every job completes synchronously.
+
+        Only the subset of BigQuery SQL that loc_prodifier generates is translated: backtick
+        identifiers, ``dataset.INFORMATION_SCHEMA.TABLES``, ``MERGE ... WHEN NOT MATCHED THEN
+        INSERT ROW``, ``QUALIFY ROW_NUMBER()``, ``FARM_FINGERPRINT``, ``MOD``, ``COUNTIF``,
+        ``TO_JSON_STRING(STRUCT(...))``, ``CAST`` to BigQuery types and
+        ``CREATE TABLE ... OPTIONS (...) AS`` and scripts of several statements, optionally in
+        ``BEGIN TRANSACTION ... COMMIT TRANSACTION``. Bytes processed are estimated
+        from the row counts and widths of the tables a statement references.
+
+        Args:
+            project (str): Project ID reported on tables.
+            database (str): SQLite database path, ``:memory:`` by default.
+        """
+        self.project = project
+        self.database = database
+        self._lock = threading.RLock()
+        self._script_children = {}
+        self.connection = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        self.connection.create_function("FARM_FINGERPRINT", 1, _farm_fingerprint, deterministic=True)
+        self.connection.create_function("MOD", 2, _mod, deterministic=True)
+        self.connection.create_aggregate("COUNTIF", 1, _CountIf)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS "__local_tables" (name TEXT PRIMARY KEY, schema TEXT, clustering TEXT, modified TEXT)'
+        )
+
+    # Metadata
+
+    def dataset(self, dataset_id):
+        return bigquery.DatasetReference(self.project, dataset_id)
+
+    def create_dataset(self, dataset, exists_ok=False, **kwargs):
+        # Datasets only exist as table name prefixes locally
+        if isinstance(dataset, str):
+            dataset = bigquery.Dataset(bigquery.DatasetReference(self.project, dataset))
+        return dataset
+
+    def create_table(self, table, exists_ok=False, **kwargs):
+        name = self._table_name(table)
+        with self._lock:
+            if self._exists(name):
+                if exists_ok:
+                    return self.get_table(name)
+                raise ValueError(f"Table {name} already exists")
+            columns = ", ".join(f'"{field.name}" {_SQLITE_TYPES.get(field.field_type, "TEXT")}' for field in table.schema)
+            self.connection.execute(f'CREATE TABLE "{name}" ({columns})')
+            clustering = getattr(table, "clustering_fields", None)
+            if clustering:
+                self.connection.execute(f'CREATE INDEX "{name}__cluster" ON "{name}" ({_quote_columns(clustering)})')
+            self._register(name, [field.to_api_repr() for field in table.schema], clustering)
+        logging.debug(f"Created local table {name}")
+        return self.get_table(name)
+
+    def get_table(self, table):
+        name = self._table_name(table)
+        with self._lock:
+            if not self._exists(name):
+                raise NotFound(f"Not found: Table {name}")
+            meta = self.connection.execute('SELECT schema, clustering, modified FROM "__local_tables" WHERE name = ?', (name,)).fetchone()
+            if meta is None:
+                # Created by a statement (e.g. CREATE TABLE AS SELECT): derive the schema from SQLite
+                columns = self.connection.execute(f'PRAGMA table_info("{name}")').fetchall()
+                schema = [{"name": c[1], "type": _BIGQUERY_TYPES.get(c[2].upper(), "STRING")} for c in columns]
+                self._register(name, schema, None)
+                meta = self.connection.execute('SELECT schema, clustering, modified FROM "__local_tables" WHERE name = ?', (name,)).fetchone()
+            num_rows = self.connection.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+        dataset_id, table_id = name.split(".", 1)
+        schema = [bigquery.SchemaField.from_api_repr(field) for field in json.loads(meta[0])]
+        return LocalTable(self.project, dataset_id, table_id, schema, num_rows,
+                          datetime.datetime.fromisoformat(meta[2]), json.loads(meta[1]) if meta[1] else None)
+
+    def update_table(self, table, fields, **kwargs):
+        # Only schema updates that append columns, the one kind BigQueryClient makes
+        if list(fields) != ["schema"]:
+            raise ValueError(f"Local tables only support schema updates, not {fields}")
+        name = self._table_name(table)
+        with self._lock:
+            meta = self.connection.execute('SELECT schema, clustering FROM "__local_tables" WHERE name = ?', (name,)).fetchone()
+            if meta is None:
+                raise NotFound(f"Not found: Table {name}")
+            existing = {field["name"] for field in json.loads(meta[0])}
+            for field in table.schema:
+                if field.name not in existing:
+                    self.connection.execute(f'ALTER TABLE "{name}" ADD COLUMN "{field.name}" {_SQLITE_TYPES.get(field.field_type, "TEXT")}')
+            self._register(name, [field.to_api_repr() for field in table.schema], json.loads(meta[1]) if meta[1] else None)
+        return self.get_table(name)
+
+    def delete_table(self, table, not_found_ok=False, **kwargs):
+        name = self._table_name(table)
+        with self._lock:
+            if not self._exists(name):
+                if not_found_ok:
+                    return
+                raise NotFound(f"Not found: Table {name}")
+            self.connection.execute(f'DROP TABLE "{name}"')
+            self.connection.execute('DELETE FROM "__local_tables" WHERE name = ?', (name,))
+
+    # Data
+
+    def insert_rows_json(self, table, json_rows, **kwargs):
+        name = self._table_name(table)
+        json_rows = list(json_rows)
+        if not json_rows:
+            return []
+        with self._lock:
+            columns = [c[1] for c in self.connection.execute(f'PRAGMA table_info("{name}")').fetchall()]
+        placeholders = ", ".join("?" for _ in columns)
+        with self._lock:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                f'INSERT INTO "{name}" ({_quote_columns(columns)}) VALUES ({placeholders})',
+                ([_sqlite_value(row.get(column)) for column in columns] for row in json_rows),
+            )
+            self.connection.execute("COMMIT")
+            self._touch(name)
+        return []
+
+    def load_table_from_json(self, json_rows, destination, job_config=None, **kwargs):
+        name = self._prepare_load(destination, job_config)
+        json_rows = list(json_rows)
+        self.insert_rows_json(name, json_rows)
+        return self._load_job(name, len(json_rows))
+
+    def load_table_from_file(self, file_obj, destination, rewind=False, job_config=None, **kwargs):
+        """
+        Loads newline-delimited JSON from a binary file, in batches of rows.
+        """
+        source_format = job_config.source_format if job_config is not None else None
+        if rewind:
+            file_obj.seek(0)
+        if source_format == bigquery.SourceFormat.PARQUET:
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(file_obj)
+            return self._load_batches(destination, job_config, parquet.schema_arrow, parquet.iter_batches(batch_size=10_000))
+        if source_format != bigquery.SourceFormat.NEWLINE_DELIMITED_JSON:
+            raise ValueError("Only NEWLINE_DELIMITED_JSON and PARQUET files can be loaded locally")
+        name = self._prepare_load(destination, job_config)
+        loaded = 0
+        batch = []
+        for line in file_obj:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= 10_000:
+                self.insert_rows_json(name, batch)
+                loaded += len(batch)
+                batch = []
+        if batch:
+            self.insert_rows_json(name, batch)
+            loaded += len(batch)
+        return self._load_job(name, loaded)
+
+    def load_table_from_dataframe(self, dataframe, destination, job_config=None, **kwargs):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        return self._load_batches(destination, job_config, table.schema, table.to_batches(max_chunksize=10_000))
+
+    def _load_batches(self, destination, job_config, arrow_schema, batches):
+        schema = [bigquery.SchemaField(field.name, _arrow_type(field.type)) for field in arrow_schema]
+        name = self._prepare_load(destination, job_config, schema)
+        loaded = 0
+        for batch in batches:
+            rows = batch.to_pylist()
+            self.insert_rows_json(name, rows)
+            loaded += len(rows)
+        return self._load_job(name, loaded)
+
+    def _prepare_load(self, destination, job_config, schema=None):
+        name = self._table_name(destination)
+        if not self._exists(name):
+            reference = bigquery.TableReference.from_string(name, default_project=self.project)
+            self.create_table(bigquery.Table(reference, schema=(job_config.schema if job_config is not None else None) or schema))
+        elif job_config is not None and job_config.write_disposition == bigquery.WriteDisposition.WRITE_TRUNCATE:
+            with self._lock:
+                self.connection.execute(f'DELETE FROM "{name}"')
+        return name
+
+    @staticmethod
+    def _load_job(name, rows):
+        job = LocalQueryJob(f"LOAD {name}", affected_rows=rows)
+        job.output_rows = rows
+        return job
+
+    def query(self, query, job_config=None, **kwargs):
+        """
+        Runs a statement synchronously and returns a finished job.
+
+        Errors are reported on the job (``error_result``), like a BigQuery job that failed.
+        """
+        params = {}
+        if job_config is not None:
+            for parameter in job_config.query_parameters or []:
+                if hasattr(parameter, "values"):
+                    query = self._expand_struct_array(query, parameter, params)
+                else:
+                    params[parameter.name] = getattr(parameter, "value", None)
+        dry_run = bool(job_config is not None and job_config.dry_run)
+        statements = _split_statements(query)
+        if len(statements) > 1 and not dry_run:
+            return self._run_script(query, statements, params)
+
+        try:
+            sql = self.translate(query)
+            bytes_processed = self._estimate_bytes(sql)
+            if dry_run:
+                with self._lock:
+                    self.connection.execute(f"EXPLAIN {sql}", params)
+                return LocalQueryJob(query, bytes_processed=bytes_processed, dry_run=True)
+            with self._lock:
+                rows, schema, affected = self._execute(sql, params)
+        except (sqlite3.Error, ValueError) as e:
+            logging.debug(f"Local query failed: {e}\n{query}")
+            return LocalQueryJob(query, error=str(e), dry_run=dry_run)
+        return LocalQueryJob(query, rows=rows, schema=schema, affected_rows=affected, bytes_processed=bytes_processed)
+
+    def _execute(self, sql, params):
+        cursor = self.connection.execute(sql, params)
+        rows = cursor.fetchall()
+        schema = [d[0] for d in cursor.description] if cursor.description else []
+        affected = cursor.rowcount if cursor.rowcount >= 0 and not schema else None
+        # Like BigQuery, DML that changed no rows leaves the table's last-modified time alone
+        for name in self._written_tables(sql) if affected != 0 else []:
+            self._touch(name)
+        return rows, schema, affected
+
+    def _run_script(self, query, statements, params):
+        """
+        Runs a multi-statement script like a BigQuery script job: one child job per statement,
+        listed by ``list_jobs(parent_job=...)``, stopping at the first failing statement and
+        rolling back an open transaction.
+        """
+        children = []
+        error = None
+        with self._lock:
+            for statement in statements:
+                try:
+                    sql = self.translate(statement)
+                    bytes_processed = self._estimate_bytes(sql)
+                    rows, schema, affected = self._execute(sql, params)
+                except (sqlite3.Error, ValueError) as e:
+                    logging.debug(f"Local script statement failed: {e}\n{statement}")
+                    error = f"Query error: {e} at statement {len(children) + 1}"
+                    children.append(LocalQueryJob(statement, error=str(e)))
+                    if self.connection.in_transaction:
+                        self.connection.execute("ROLLBACK")
+                    break
+                children.append(LocalQueryJob(statement, rows=rows, schema=schema, affected_rows=affected, bytes_processed=bytes_processed))
+        last = children[-1]
+        job = LocalQueryJob(query, rows=last._rows, schema=last._schema, error=error,
+                            bytes_processed=sum(child.total_bytes_processed for child in children))
+        job.statement_type = "SCRIPT"
+        for child in children:
+            child.parent_job_id = job.job_id
+        self._script_children[job.job_id] = children
+        return job
+
+    def list_jobs(self, parent_job=None, **kwargs):
+        # Only the child jobs of scripts are kept; most recent first, as the API lists them
+        parent_id = getattr(parent_job, "job_id", parent_job)
+        return list(reversed(self._script_children.get(parent_id, [])))
+
+    @staticmethod
+    def _expand_struct_array(query, parameter, params):
+        # UNNEST(@rows) over an array of structs becomes a UNION ALL of one SELECT per element,
+        # with every field bound as its own named parameter
+        selects = []
+        for index, struct in enumerate(parameter.values):
+            fields = []
+            for field, value in struct.struct_values.items():
+                name = f"{parameter.name}_{index}_{field}"
+                params[name] = _sqlite_value(value)
+                fields.append(f'@{name} AS "{field}"')
+            selects.append(f"SELECT {', '.join(fields)}")
+        rows = " UNION ALL ".join(selects) or "SELECT NULL WHERE 0"
+        return re.sub(rf"UNNEST\(\s*@{parameter.name}\s*\)", f"({rows})", query)
+
+    # SQL translation
+
+    def translate(self, query):
+        """
+        Rewrites the supported BigQuery SQL subset into SQLite SQL.
+        """
+        sql = re.sub(r"`([^`]+)`", r'"\1"', query)
+        sql = re.sub(r"CURRENT_TIMESTAMP\(\)", "CURRENT_TIMESTAMP", sql)
+        sql = re.sub(r"\bAS\s+(STRING|INT64|INTEGER|FLOAT64|BOOL|TIMESTAMP|DATETIME|DATE)\s*\)",
+                     lambda m: f"AS {_SQLITE_TYPES[m.group(1)]})", sql)
+        sql = re.sub(r'"(?:[\w-]+\.)?([\w-]+)\.INFORMATION_SCHEMA\.TABLES"',
+                     lambda m: f"(SELECT substr(name, {len(m.group(1)) + 2}) AS table_name, 'BASE TABLE' AS table_type "
+                               f"FROM sqlite_master WHERE type = 'table' AND substr(name, 1, {len(m.group(1)) + 1}) = '{m.group(1)}.')", sql)
+        sql = self._translate_struct_keys(sql)
+        sql = self._strip_options(sql)
+        sql = self._translate_qualify(sql)
+        sql = self._translate_merge(sql)
+        sql = re.sub(r"^\s*(BEGIN|COMMIT|ROLLBACK)\s+TRANSACTION\s*$", r"\1", sql, flags=re.I)
+        return sql
+
+    @staticmethod
+    def _translate_struct_keys(sql):
+        # TO_JSON_STRING(STRUCT(a AS a, b AS b)) -> json_array(a, b)
+        marker = "TO_JSON_STRING(STRUCT("
+        while marker in sql:
+            start = sql.index(marker)
+            end = _closing_paren(sql, start + len("TO_JSON_STRING"))
+            inner = sql[start + len(marker):end - 1]
+            fields = [re.sub(r"\s+AS\s+\w+$", "", field.strip()) for field in inner.split(",")]
+            sql = f"{sql[:start]}json_array({', '.join(fields)}){sql[end + 1:]}"
+        return sql
+
+    @staticmethod
+    def _strip_options(sql):
+        match = re.search(r"\bOPTIONS\s*\(", sql)
+        if match is None:
+            return sql
+        end = _closing_paren(sql, match.end() - 1)
+        return sql[:match.start()] + sql[end + 1:]
+
+    @staticmethod
+    def _translate_qualify(sql):
+        # SELECT c FROM x WHERE w QUALIFY ROW_NUMBER() OVER (...) = 1
+        #   -> SELECT c FROM (SELECT *, ROW_NUMBER() OVER (...) AS __rn FROM x WHERE w) WHERE __rn = 1
+        pattern = re.compile(r"SELECT ([^()]*?)\s+FROM (\"[^\"]+\")\s+WHERE (.*?)\s+QUALIFY ROW_NUMBER\(\) OVER \(([^()]*)\) = 1", re.S)
+        return pattern.sub(lambda m: f"SELECT {m.group(1)} FROM (SELECT *, ROW_NUMBER() OVER ({m.group(4)}) AS __rn FROM {m.group(2)} WHERE {m.group(3)}) WHERE __rn = 1", sql)
+
+    def _translate_merge(self, sql):
+        # MERGE t T USING s S ON c WHEN NOT MATCHED THEN INSERT ROW
+        #   -> INSERT INTO t (cols) SELECT S.cols FROM s S WHERE NOT EXISTS (SELECT 1 FROM t T WHERE c)
+        match = re.match(r"\s*MERGE\s+\"([^\"]+)\"\s+T\s+USING\s+(.*?)\s+S\s+ON\s+(.*?)\s+WHEN NOT MATCHED THEN\s+INSERT ROW\s*$", sql, re.S)
+        if match is None:
+            if re.match(r"\s*MERGE\b", sql):
+                raise ValueError("Only MERGE ... WHEN NOT MATCHED THEN INSERT ROW is supported locally")
+            return sql
+        target, source, condition = match.groups()
+        columns = [field.name for field in self.get_table(target).schema]
+        selected = ", ".join(f'S."{column}"' for column in columns)
+        return f'INSERT INTO "{target}" ({_quote_columns(columns)}) SELECT {selected} FROM {source} S WHERE NOT EXISTS (SELECT 1 FROM "{target}" T WHERE {condition})'
+
+    # Helpers
+
+    def _estimate_bytes(self, sql):
+        # Rough stand-in for BigQuery's bytes processed: the size of every table read
+        total = 0
+        with self._lock:
+            for name in set(re.findall(r'"([^"]+\.[^"]+)"', sql)):
+                if self._exists(name):
+                    columns = len(self.connection.execute(f'PRAGMA table_info("{name}")').fetchall())
+                    rows = self.connection.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+                    total += rows * columns * 8
+        return total
+
+    @staticmethod
+    def _written_tables(sql):
+        return re.findall(r'^\s*(?:INSERT INTO|CREATE TABLE|DELETE FROM|UPDATE)\s+"([^"]+)"', sql, re.I)
+
+    def _table_name(self, table):
+        if isinstance(table, str):
+            reference = bigquery.TableReference.from_string(table, default_project=self.project)
+        else:
+            reference = table.reference if hasattr(table, "reference") else table
+        return f"{reference.dataset_id}.{reference.table_id}"
+
+    def _exists(self, name):
+        return self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    def _register(self, name, schema, clustering):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO "__local_tables" (name, schema, clustering, modified) VALUES (?, ?, ?, ?)',
+            (name, json.dumps(schema), json.dumps(clustering) if clustering else None, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+        )
+
+    def _touch(self, name):
+        self.connection.execute(
+            'UPDATE "__local_tables" SET modified = ? WHERE name = ?',
+            (datetime.datetime.now(datetime.timezone.utc).isoformat(), name),
+        )
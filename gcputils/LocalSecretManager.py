@@ -0,0 +1,87 @@
+import threading
+from gcputils.lazy import lazy_import
+
+exceptions = lazy_import("google.api_core.exceptions")
+
+
+class LocalSecretPayload:
+    def __init__(self, data):
+        self.data = data
+
+
+class LocalAccessResponse:
+    def __init__(self, name, data):
+        """
+        The attributes of an ``AccessSecretVersionResponse`` the gcputils code reads.
+        """
+        self.name = name
+        self.payload = LocalSecretPayload(data)
+
+
+class LocalSecretManagerClient:
+    def __init__(self, latency=0.0):
+        """
+        An in-process, in-memory stand-in for ``secretmanager.SecretManagerServiceClient``.
+
+        Pass it to ``GoogleSecretManager(project_id, client=LocalSecretManagerClient())`` to
+        exercise the secret code without the service. Secrets and versions are added with
+        ``add_secret_version``; ``calls`` counts accesses, so a test can check what the cache saved.
+
+        Args:
+            latency (float): Seconds every access sleeps, to stand in for the round trip.
+        """
+        self.latency = latency
+        self.calls = 0
+        self._secrets = {}
+        self._states = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def secret_path(project, secret):
+        return f"projects/{project}/secrets/{secret}"
+
+    @staticmethod
+    def secret_version_path(project, secret, secret_version):
+        return f"projects/{project}/secrets/{secret}/versions/{secret_version}"
+
+    def add_secret_version(self, parent=None, payload=None, request=None):
+        """
+        Adds a version to the secret ``parent`` (``projects/<project>/secrets/<secret>``), creating
+        the secret if needed. ``payload`` is a ``{"data": bytes}`` mapping, as in the real client.
+        """
+        if request is not None:
+            parent, payload = request["parent"], request["payload"]
+        data = payload["data"]
+        if isinstance(data, str):
+            data = data.encode("UTF-8")
+        with self._lock:
+            versions = self._secrets.setdefault(parent, [])
+            versions.append(data)
+            return LocalAccessResponse(f"{parent}/versions/{len(versions)}", data)
+
+    def disable_secret_version(self, name=None, request=None):
+        with self._lock:
+            self._states[name if request is None else request["name"]] = "DISABLED"
+
+    def destroy_secret_version(self, name=None, request=None):
+        with self._lock:
+            self._states[name if request is None else request["name"]] = "DESTROYED"
+
+    def access_secret_version(self, name=None, request=None, **kwargs):
+        if request is not None:
+            name = request["name"]
+        if self.latency:
+            threading.Event().wait(self.latency)
+        parent, _, version = name.rpartition("/versions/")
+        with self._lock:
+            self.calls += 1
+            versions = self._secrets.get(parent)
+            if not versions:
+                raise exceptions.NotFound(f"Secret [{parent}] not found or has no versions.")
+            number = len(versions) if version == "latest" else int(version)
+            if not 1 <= number <= len(versions):
+                raise exceptions.NotFound(f"Secret Version [{name}] not found.")
+            resolved = f"{parent}/versions/{number}"
+            if resolved in self._states:
+                raise exceptions.FailedPrecondition(f"Secret Version [{resolved}] is in {self._states[resolved]} state.")
+            return LocalAccessResponse(resolved, versions[number - 1])
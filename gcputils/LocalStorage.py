@@ -0,0 +1,250 @@
+import datetime
+import io
+import itertools
+import re
+import threading
+from gcputils.lazy import lazy_import
+
+exceptions = lazy_import("google.api_core.exceptions")
+
+
+def _glob_regex(pattern):
+    # Cloud Storage globs: ** crosses "/", * and ? do not, {a,b} is an alternation
+    parts, index = [], 0
+    while index < len(pattern):
+        if pattern.startswith("**", index):
+            parts.append(".*")
+            index += 2
+        elif pattern[index] == "*":
+            parts.append("[^/]*")
+            index += 1
+        elif pattern[index] == "?":
+            parts.append("[^/]")
+            index += 1
+        elif pattern[index] == "{":
+            end = pattern.index("}", index)
+            parts.append("(?:" + "|".join(re.escape(option) for option in pattern[index + 1:end].split(",")) + ")")
+            index = end + 1
+        else:
+            parts.append(re.escape(pattern[index]))
+            index += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+class LocalBlob:
+    def __init__(self, bucket, name):
+        """
+        An object handle with the ``google.cloud.storage.Blob`` methods the gcputils clients use.
+
+        Like a real ``Blob``, it only carries an object's properties after a reload, upload or listing.
+        """
+        self.bucket = bucket
+        self.name = name
+        self.generation = None
+        self.metageneration = None
+        self.size = None
+        self.updated = None
+        self.content_type = None
+        self.content_encoding = None
+        self.metadata = None
+        self.chunk_size = None
+
+    def _load(self, record):
+        self.generation = record["generation"]
+        self.metageneration = 1
+        self.size = len(record["data"])
+        self.updated = record["updated"]
+        self.content_type = record["content_type"]
+        self.content_encoding = record["content_encoding"]
+        self.metadata = dict(record["metadata"]) if record["metadata"] else None
+        return self
+
+    def exists(self, **kwargs):
+        return self.name in self.bucket._objects
+
+    def reload(self, **kwargs):
+        self._load(self.bucket._get(self.name))
+
+    def upload_from_string(self, data, content_type="text/plain", if_generation_match=None, **kwargs):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._load(self.bucket._put(self.name, bytes(data), if_generation_match, content_type,
+                                    self.content_encoding, self.metadata))
+
+    def upload_from_file(self, file_obj, rewind=False, size=None, content_type=None, if_generation_match=None, **kwargs):
+        if rewind:
+            file_obj.seek(0)
+        data = file_obj.read(size) if size is not None else file_obj.read()
+        self.upload_from_string(data, content_type=content_type or "application/octet-stream", if_generation_match=if_generation_match)
+
+    def upload_from_filename(self, filename, content_type=None, if_generation_match=None, **kwargs):
+        with open(filename, "rb") as file_obj:
+            self.upload_from_file(file_obj, content_type=content_type, if_generation_match=if_generation_match)
+
+    def download_as_bytes(self, start=None, end=None, if_generation_match=None, **kwargs):
+        # Like the real client, ``end`` is inclusive
+        record = self.bucket._get(self.name, if_generation_match)
+        self._load(record)
+        data = record["data"]
+        return data[start or 0:None if end is None else end + 1]
+
+    def download_as_string(self, **kwargs):
+        return self.download_as_bytes(**kwargs)
+
+    def download_to_file(self, file_obj, start=None, end=None, **kwargs):
+        file_obj.write(self.download_as_bytes(start=start, end=end, **kwargs))
+
+    def download_to_filename(self, filename, **kwargs):
+        with open(filename, "wb") as file_obj:
+            self.download_to_file(file_obj, **kwargs)
+
+    def open(self, mode="r", chunk_size=None, **kwargs):
+        if "r" in mode:
+            data = io.BytesIO(self.download_as_bytes())
+            return data if "b" in mode else io.TextIOWrapper(data, encoding=kwargs.get("encoding", "utf-8"))
+        return _LocalWriter(self, text="b" not in mode)
+
+    def delete(self, if_generation_match=None, **kwargs):
+        self.bucket._delete(self.name, if_generation_match)
+
+
+class _LocalWriter(io.BytesIO):
+    def __init__(self, blob, text=False):
+        super().__init__()
+        self.blob = blob
+        self.text = text
+
+    def write(self, data):
+        return super().write(data.encode("utf-8") if self.text and isinstance(data, str) else data)
+
+    def close(self):
+        if not self.closed:
+            self.blob.upload_from_string(self.getvalue())
+        super().close()
+
+
+class LocalBucket:
+    def __init__(self, client, name):
+        """
+        An in-memory bucket. Generations increase on every write, so ``if_generation_match``
+        preconditions behave like Cloud Storage's (0 means "must not exist").
+        """
+        self.client = client
+        self.name = name
+        self._objects = {}
+        self._lock = threading.RLock()
+
+    def blob(self, blob_name, chunk_size=None, **kwargs):
+        blob = LocalBlob(self, blob_name)
+        blob.chunk_size = chunk_size
+        return blob
+
+    def get_blob(self, blob_name, **kwargs):
+        with self._lock:
+            record = self._objects.get(blob_name)
+            return LocalBlob(self, blob_name)._load(record) if record is not None else None
+
+    def exists(self, **kwargs):
+        return True
+
+    def create(self, **kwargs):
+        return self
+
+    def list_blobs(self, **kwargs):
+        return self.client.list_blobs(self, **kwargs)
+
+    def copy_blob(self, blob, destination_bucket, new_name=None, if_source_generation_match=None, if_generation_match=None, **kwargs):
+        record = self._get(blob.name, if_source_generation_match)
+        copied = destination_bucket._put(new_name or blob.name, record["data"], if_generation_match,
+                                         record["content_type"], record["content_encoding"], record["metadata"])
+        return LocalBlob(destination_bucket, new_name or blob.name)._load(copied)
+
+    def delete_blob(self, blob_name, if_generation_match=None, **kwargs):
+        self._delete(blob_name, if_generation_match)
+
+    def _get(self, name, if_generation_match=None):
+        with self._lock:
+            record = self._objects.get(name)
+            if record is None:
+                raise exceptions.NotFound(f"No such object: {self.name}/{name}")
+            if if_generation_match is not None and record["generation"] != if_generation_match:
+                raise exceptions.PreconditionFailed(f"Generation of {self.name}/{name} is {record['generation']}, not {if_generation_match}")
+            return record
+
+    def _put(self, name, data, if_generation_match, content_type, content_encoding, metadata):
+        with self._lock:
+            current = self._objects.get(name)
+            current_generation = current["generation"] if current is not None else 0
+            if if_generation_match is not None and current_generation != if_generation_match:
+                raise exceptions.PreconditionFailed(f"Generation of {self.name}/{name} is {current_generation}, not {if_generation_match}")
+            record = {
+                "data": data,
+                "generation": next(self.client._generations),
+                "updated": datetime.datetime.now(datetime.timezone.utc),
+                "content_type": content_type,
+                "content_encoding": content_encoding,
+                "metadata": dict(metadata) if metadata else None,
+            }
+            self._objects[name] = record
+            return record
+
+    def _delete(self, name, if_generation_match):
+        with self._lock:
+            self._get(name, if_generation_match)
+            del self._objects[name]
+
+
+class LocalStorageClient:
+    def __init__(self, project="local"):
+        """
+        An in-process, in-memory stand-in for ``google.cloud.storage.Client``.
+
+        Pass it to ``GCSClient(project_id, client=LocalStorageClient())`` to exercise the
+        gcputils storage code without a bucket. Buckets are created on first use, and
+        listings honour ``prefix``, ``match_glob``, ``start_offset``, ``end_offset`` and
+        ``max_results`` and return blobs in name order.
+
+        Args:
+            project (str): Project ID reported by the client.
+        """
+        self.project = project
+        self._buckets = {}
+        self._generations = itertools.count(1_000_000)
+        self._lock = threading.Lock()
+
+    def bucket(self, bucket_name, user_project=None):
+        with self._lock:
+            if bucket_name not in self._buckets:
+                self._buckets[bucket_name] = LocalBucket(self, bucket_name)
+            return self._buckets[bucket_name]
+
+    def get_bucket(self, bucket_or_name, **kwargs):
+        return self.bucket(getattr(bucket_or_name, "name", bucket_or_name))
+
+    def create_bucket(self, bucket_or_name, **kwargs):
+        return self.get_bucket(bucket_or_name)
+
+    def list_buckets(self, **kwargs):
+        return list(self._buckets.values())
+
+    def list_blobs(self, bucket_or_name, max_results=None, prefix=None, start_offset=None, end_offset=None,
+                   match_glob=None, page_size=None, **kwargs):
+        bucket = self.get_bucket(bucket_or_name)
+        glob = _glob_regex(match_glob) if match_glob else None
+        with bucket._lock:
+            names = sorted(bucket._objects)
+        listed = 0
+        for name in names:
+            if prefix and not name.startswith(prefix):
+                continue
+            if (start_offset and name < start_offset) or (end_offset and name >= end_offset):
+                continue
+            if glob is not None and not glob.match(name):
+                continue
+            blob = bucket.get_blob(name)
+            if blob is None:
+                continue
+            yield blob
+            listed += 1
+            if max_results is not None and listed >= max_results:
+                return
@@ -0,0 +1,25 @@
+import random
+
+
+def backoff_delays(initial=0.5, maximum=30.0, multiplier=2.0, jitter=0.2):
+    """
+    Yields an endless sequence of exponentially growing sleep intervals.
+
+    Each delay is the previous one times ``multiplier``, capped at ``maximum``, and then
+    randomly shortened by up to ``jitter`` (a fraction of the delay) so that many callers
+    started at the same moment do not poll or retry in lockstep.
+
+    Args:
+        initial (float): The first delay in seconds.
+        maximum (float): The largest delay in seconds.
+        multiplier (float): The growth factor applied between delays.
+        jitter (float): Fraction of each delay that may be randomly removed (0 disables jitter).
+
+    Yields:
+        float: The next delay in seconds.
+    """
+    delay = initial
+    while True:
+        capped = min(delay, maximum)
+        yield capped * (1 - jitter * random.random())
+        delay = capped * multiplier
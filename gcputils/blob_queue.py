@@ -0,0 +1,179 @@
+import json
+import logging
+import socket
+import time
+import uuid
+from gcputils.lazy import lazy_import
+
+exceptions = lazy_import("google.api_core.exceptions")
+
+
+DEFAULT_LEASE_PREFIX = "_leases/"
+DEFAULT_LEASE_SECONDS = 600
+
+
+class Lease:
+    def __init__(self, blob, lock, expires_at):
+        """
+        A claimed blob and the lock object that claims it.
+
+        Args:
+            blob (google.cloud.storage.blob.Blob): The claimed blob, including its generation.
+            lock (google.cloud.storage.blob.Blob): The lock object, including its generation.
+            expires_at (float): Epoch seconds after which other workers may reclaim the blob.
+        """
+        self.blob = blob
+        self.lock = lock
+        self.expires_at = expires_at
+
+    @property
+    def name(self):
+        return self.blob.name
+
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at
+
+
+class BlobQueue:
+    def __init__(self, gcs_client, bucket_name, lease_prefix=DEFAULT_LEASE_PREFIX, lease_seconds=DEFAULT_LEASE_SECONDS, worker_id=None):
+        """
+        Treats the blobs of a bucket as a work queue that many workers can consume at once.
+
+        A worker claims a blob by creating the lock object ``<lease_prefix><blob name>`` with
+        ``if_generation_match=0``, which Cloud Storage only lets one writer do. The lock
+        carries an expiry in its metadata; once it has passed, another worker may take the
+        lock over with a precondition on the lock's generation, so the blobs of a crashed
+        worker are picked up again. Completing a lease deletes (or archives) the blob and
+        then its lock.
+
+        Args:
+            gcs_client (GCSClient): The client used for listing and object operations.
+            bucket_name (str): The bucket holding the work items and the locks.
+            lease_prefix (str): Prefix of the lock objects; never handed out as work.
+            lease_seconds (float): How long a claim lasts unless renewed.
+            worker_id (str, optional): Recorded in each lock; defaults to the host name and a random suffix.
+        """
+        self.gcs_client = gcs_client
+        self.bucket = gcs_client.client.bucket(bucket_name)
+        self.lease_prefix = lease_prefix
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+
+    def claim(self, max_items=1, prefix=None, match_glob=None, patterns_file=None, index=None):
+        """
+        Claims up to ``max_items`` unclaimed blobs.
+
+        Active locks are listed once up front so blobs held by other workers cost no claim
+        attempt; a claim lost to a concurrent worker is skipped.
+
+        Args:
+            max_items (int): Maximum number of blobs to claim.
+            prefix, match_glob, patterns_file, index: Select candidate blobs as in ``GCSClient.pop_blob``.
+
+        Returns:
+            list: The new leases, possibly empty.
+        """
+        locks = self._active_locks(prefix)
+        leases = []
+        candidates = self.gcs_client.iter_blobs(self.bucket.name, patterns_file, prefix=prefix, match_glob=match_glob,
+                                                index=index, exclude_prefix=self.lease_prefix)
+        for blob in candidates:
+            if len(leases) >= max_items:
+                break
+            lock = locks.get(blob.name)
+            if lock is not None and not self._expired(lock):
+                continue
+            lease = self._acquire(blob, lock)
+            if lease is not None:
+                leases.append(lease)
+
+        logging.info(f"Worker {self.worker_id} claimed {len(leases)} blob(s) in {self.bucket.name}")
+        return leases
+
+    def renew(self, lease):
+        """
+        Extends a lease by ``lease_seconds`` from now.
+
+        Raises:
+            google.api_core.exceptions.PreconditionFailed: If the lease was lost to another worker.
+        """
+        lock, expires_at = self._write_lock(lease.blob, if_generation_match=lease.lock.generation)
+        lease.lock, lease.expires_at = lock, expires_at
+        return lease
+
+    def release(self, lease):
+        """
+        Gives a blob back to the queue without processing it.
+        """
+        try:
+            lease.lock.delete(if_generation_match=lease.lock.generation)
+        except (exceptions.NotFound, exceptions.PreconditionFailed):
+            logging.warning(f"Lease on {lease.name} was already lost")
+
+    def complete(self, lease, archive_bucket_name=None, archive_blob_name=None):
+        """
+        Removes a processed blob from the queue, optionally copying it elsewhere first.
+
+        The lease is renewed first, which fails if another worker took it over after it
+        expired. The blob is only copied and deleted if it is still the generation that was
+        claimed, so an object overwritten while being processed stays queued.
+
+        Args:
+            lease (Lease): The lease on the processed blob.
+            archive_bucket_name (str, optional): Copy the blob to this bucket before deleting it.
+            archive_blob_name (str, optional): Name of the copy; defaults to the blob's name.
+
+        Returns:
+            bool: False if the lease was lost, or the blob changed or disappeared since it was claimed.
+        """
+        try:
+            self.renew(lease)
+        except (exceptions.NotFound, exceptions.PreconditionFailed):
+            logging.warning(f"Lease on {lease.name} was lost to another worker; not completing it")
+            return False
+
+        generation = lease.blob.generation
+        try:
+            if archive_bucket_name:
+                destination = self.gcs_client.client.bucket(archive_bucket_name)
+                self.bucket.copy_blob(lease.blob, destination, archive_blob_name or lease.name,
+                                      if_source_generation_match=generation)
+            self.bucket.blob(lease.name).delete(if_generation_match=generation)
+            completed = True
+        except (exceptions.NotFound, exceptions.PreconditionFailed) as e:
+            logging.warning(f"{lease.name} changed since it was claimed; leaving it queued: {e}")
+            completed = False
+        self.release(lease)
+        return completed
+
+    def _acquire(self, blob, existing_lock):
+        # Create the lock, or take over an expired one, in a single preconditioned write
+        generation = existing_lock.generation if existing_lock is not None else 0
+        try:
+            lock, expires_at = self._write_lock(blob, if_generation_match=generation)
+        except exceptions.PreconditionFailed:
+            logging.debug(f"{blob.name} was claimed by another worker")
+            return None
+        if existing_lock is not None:
+            logging.info(f"Reclaimed {blob.name} from expired lease of {existing_lock.metadata.get('worker')}")
+        return Lease(blob, lock, expires_at)
+
+    def _write_lock(self, blob, if_generation_match):
+        expires_at = time.time() + self.lease_seconds
+        lock = self.bucket.blob(f"{self.lease_prefix}{blob.name}")
+        lock.metadata = {"worker": self.worker_id, "expires_at": str(expires_at), "generation": str(blob.generation)}
+        lock.upload_from_string(json.dumps(lock.metadata), content_type="application/json",
+                                if_generation_match=if_generation_match)
+        return lock, expires_at
+
+    def _active_locks(self, prefix):
+        lock_prefix = f"{self.lease_prefix}{prefix or ''}"
+        return {
+            lock.name[len(self.lease_prefix):]: lock
+            for lock in self.gcs_client.client.list_blobs(self.bucket.name, prefix=lock_prefix)
+        }
+
+    @staticmethod
+    def _expired(lock):
+        return time.time() >= float((lock.metadata or {}).get("expires_at", 0))
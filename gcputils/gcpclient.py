@@ -1,10 +1,151 @@
-from google.cloud import storage
+from concurrent.futures import ThreadPoolExecutor
+from gcputils.backoff import backoff_delays
+from gcputils.lazy import lazy_import
+from gcputils.session import shared_credentials, shared_session
+import functools
+import gzip
+import io
+import mmap
 import os
 import logging
 import re
+import tempfile
+import threading
+import time
+
+storage = lazy_import("google.cloud.storage")
+exceptions = lazy_import("google.api_core.exceptions")
+auth_exceptions = lazy_import("google.auth.exceptions")
+requests_exceptions = lazy_import("requests.exceptions")
+
+
+# Blobs requested per list call while searching for a blob to pop
+DEFAULT_LIST_PAGE_SIZE = 1000
+
+# Concurrent requests and attempts per item of the bulk operations
+DEFAULT_BULK_WORKERS = 16
+DEFAULT_BULK_ATTEMPTS = 5
+
+# Bytes fetched per request by streaming reads, and per slice by sliced downloads. Chunk
+# sizes must be multiples of 256 KiB.
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_SLICE_SIZE = 64 * 1024 * 1024
+
+# Uploads larger than this are resumable, so a dropped connection only resends one chunk
+DEFAULT_RESUMABLE_THRESHOLD = 8 * 1024 * 1024
+
+@functools.lru_cache(maxsize=None)
+def transient_errors():
+    """
+    Returns the errors worth retrying: throttling, server-side failures and dropped
+    connections. Built on first use, so importing this module does not load google.api_core.
+
+    Dropped connections surface from the HTTP stack as ``requests`` errors (which derive from
+    ``IOError``, not the builtin ``ConnectionError``) and, while refreshing credentials, as
+    ``google.auth`` transport errors.
+    """
+    return (exceptions.TooManyRequests, exceptions.InternalServerError, exceptions.ServiceUnavailable,
+            exceptions.GatewayTimeout, ConnectionError, requests_exceptions.ConnectionError,
+            requests_exceptions.ChunkedEncodingError, auth_exceptions.TransportError)
+
+
+def __getattr__(name):
+    # TRANSIENT_ERRORS is still importable by name, resolved on first access
+    if name == "TRANSIENT_ERRORS":
+        return transient_errors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.lru_cache(maxsize=32)
+def _load_patterns(patterns_file, mtime):
+    # Keyed on the modification time so an edited patterns file is picked up
+    with open(patterns_file, 'r') as file:
+        patterns = [line.strip() for line in file if line.strip()]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+
+def compile_patterns(patterns_file):
+    """
+    Returns the exclusion patterns of a file combined into one compiled regex, or None if
+    there are none. Compiled once per file version; blank lines are ignored.
+    """
+    if not patterns_file:
+        return None
+    return _load_patterns(os.path.abspath(patterns_file), os.path.getmtime(patterns_file))
+
+
+def _remaining_size(file_obj):
+    # Bytes left in a seekable file, or None for streams
+    try:
+        position = file_obj.tell()
+        end = file_obj.seek(0, os.SEEK_END)
+        file_obj.seek(position)
+        return end - position
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+class BlobIndex:
+    def __init__(self, path=None, resume=False):
+        """
+        Names of blobs that were already processed, so that repeated pops skip them without
+        re-matching them.
+
+        With ``resume``, the index also remembers, per listing (bucket, prefix and glob), the
+        last name up to which every listed blob was already processed; later listings start
+        there instead of paging through those blobs again. A blob created afterwards whose
+        name sorts before that position is then never listed, so only enable it when new
+        blob names increase monotonically (e.g. start with a timestamp). The position only
+        lives in memory, so a new index lists from the start once.
+
+        Args:
+            path (str, optional): File persisting the index, one blob name per line. The index
+                                  only lives in memory when not provided.
+            resume (bool): Start later listings after the processed blobs at their start.
+        """
+        self.path = path
+        self.resume = resume
+        self._names = set()
+        self._offsets = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r') as file:
+                self._names = {line.rstrip("\n") for line in file if line.strip()}
+
+    def __contains__(self, blob_name):
+        return blob_name in self._names
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, blob_name):
+        with self._lock:
+            if blob_name in self._names:
+                return
+            self._names.add(blob_name)
+            if self.path:
+                with open(self.path, 'a') as file:
+                    file.write(f"{blob_name}\n")
+
+    def offset(self, listing):
+        """
+        Returns the name a listing can resume from (its last processed blob), or None.
+        """
+        return self._offsets.get(listing) if self.resume else None
+
+    def advance(self, listing, blob_name):
+        if not self.resume:
+            return
+        # Only ever moves forward, whichever order concurrent listings report in
+        with self._lock:
+            if blob_name > self._offsets.get(listing, ""):
+                self._offsets[listing] = blob_name
+
 
 class GCSClient:
-    def __init__(self, project_id, credentials_path=None):
+    def __init__(self, project_id, credentials_path=None, client=None):
         """
         Initializes the Google Cloud Storage client.
 
@@ -12,24 +153,37 @@ class GCSClient:
             project_id (str): The Google Cloud project ID.
             credentials_path (str, optional): Path to the JSON file containing service account credentials.
                                               If not provided, it will use the default credentials from the environment.
+            client (optional): An object implementing the ``google.cloud.storage.Client`` methods used here,
+                               such as ``gcputils.LocalStorage.LocalStorageClient``. Created from the
+                               credentials on first use when not provided.
         """
         self.project_id = project_id
         self.credentials_path = credentials_path
-        self.client = self._create_client()
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     def _create_client(self):
         """
-        Creates and returns the Google Cloud Storage client.
+        Creates and returns the Google Cloud Storage client on the process-wide shared session.
 
         Returns:
             google.cloud.storage.Client: The initialized Google Cloud Storage client.
         """
-        if self.credentials_path:
-            print("trying creds file")
-            client = storage.Client.from_service_account_json(self.credentials_path)
-        else:
-            client = storage.Client(project=self.project_id)
-        return client
+        credentials, _ = shared_credentials(self.credentials_path)
+        return storage.Client(project=self.project_id, credentials=credentials,
+                              _http=shared_session(self.credentials_path))
 
     def list_buckets(self):
         """
@@ -64,40 +218,102 @@ class GCSClient:
         else:
             return f"Bucket '{bucket_name}' already exists."
         
-    def put_blob_from_string(self, bucket, source_string, destination_blob_name, overwrite=False):
-        print(overwrite)
+    def put_blob_from_string(self, bucket, source_string, destination_blob_name, overwrite=False, content_type=None,
+                             gzip_encoding=False, resumable_threshold=DEFAULT_RESUMABLE_THRESHOLD, chunk_size=DEFAULT_CHUNK_SIZE):
         """
         Uploads an object to a blob in a Google Cloud Storage bucket.
 
+        Without ``overwrite`` the upload carries an ``if_generation_match=0`` precondition, so
+        Cloud Storage itself refuses to replace an existing object and no separate existence
+        check is needed. Sources larger than ``resumable_threshold`` are sent as a resumable
+        upload in ``chunk_size`` pieces; streams of unknown size are spooled (in memory up
+        to ``chunk_size``, on disk beyond) and then uploaded the same way.
+
         Args:
             bucket (str or google.cloud.storage.Bucket): The name of the bucket or an already instantiated bucket object.
-            source_string (str): The object to be uploaded.
+            source_string (str, bytes, file-like or iterable of bytes): The object to be uploaded.
             destination_blob_name (str): The name to give to the uploaded file in the bucket.
             overwrite (bool, optional): Whether to overwrite an existing blob if it already exists. Default is False.
+            content_type (str, optional): The object's content type.
+            gzip_encoding (bool): Compress the data and store it with ``Content-Encoding: gzip``.
+            resumable_threshold (int): Size in bytes above which a resumable upload is used.
+            chunk_size (int): Bytes per request of a resumable upload (a multiple of 256 KiB).
 
         Returns:
-            str: The URL of the uploaded object.
+            google.cloud.storage.blob.Blob: The uploaded blob, or None if the blob already existed and was not overwritten.
 
         Source: https://cloud.google.com/storage/docs/uploading-objects-from-memory
         """
         if isinstance(bucket, str):
             bucket = self.client.bucket(bucket)
         blob = bucket.blob(destination_blob_name)
+        if gzip_encoding:
+            blob.content_encoding = "gzip"
+        upload_kwargs = {"if_generation_match": None if overwrite else 0}
+
+        try:
+            if isinstance(source_string, (str, bytes, bytearray)):
+                data = source_string.encode("utf-8") if isinstance(source_string, str) else bytes(source_string)
+                if gzip_encoding:
+                    data = gzip.compress(data)
+                if len(data) > resumable_threshold:
+                    blob.chunk_size = chunk_size
+                default_type = "text/plain" if isinstance(source_string, str) else "application/octet-stream"
+                blob.upload_from_string(data, content_type=content_type or default_type, **upload_kwargs)
+            elif hasattr(source_string, "read") and not gzip_encoding and _remaining_size(source_string) is not None:
+                size = _remaining_size(source_string)
+                if size > resumable_threshold:
+                    blob.chunk_size = chunk_size
+                blob.upload_from_file(source_string, size=size, content_type=content_type, **upload_kwargs)
+            else:
+                self._upload_stream(blob, source_string, content_type, gzip_encoding, resumable_threshold, chunk_size, upload_kwargs)
+        except exceptions.PreconditionFailed:
+            logging.info(f"Blob '{destination_blob_name}' already exists in bucket {bucket.name}; not overwritten")
+            return None
 
-        # Check if the blob exists and overwrite is False
-        if blob.exists() and not overwrite:
-            print(f"Blob '{destination_blob_name}' already exists. To overwrite, set overwrite=True.")
-            return blob
-    
+        logging.info(f"Object uploaded to {destination_blob_name} in bucket {bucket.name}")
+        return blob
 
-        # Upload the blob
-        blob.upload_from_string(source_string)
+    @staticmethod
+    def _upload_stream(blob, source, content_type, gzip_encoding, resumable_threshold, chunk_size, upload_kwargs):
+        # Spool a stream (compressing it on the way if asked) before uploading it, so a source
+        # that fails part way never leaves a truncated object behind
+        chunks = iter(lambda: source.read(chunk_size), b"") if hasattr(source, "read") else source
+        with tempfile.SpooledTemporaryFile(max_size=chunk_size) as spool:
+            sink = gzip.GzipFile(fileobj=spool, mode="wb") if gzip_encoding else spool
+            for chunk in chunks:
+                sink.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if gzip_encoding:
+                sink.close()
+            size = spool.tell()
+            blob.chunk_size = chunk_size if size > resumable_threshold else None
+            blob.upload_from_file(spool, rewind=True, size=size, content_type=content_type, **upload_kwargs)
+
+    def put_blobs(self, bucket_name, items, overwrite=False, content_type=None, gzip_encoding=False,
+                  max_workers=DEFAULT_BULK_WORKERS, attempts=DEFAULT_BULK_ATTEMPTS):
+        """
+        Uploads many small in-memory objects concurrently through :meth:`put_blob_from_string`.
 
-        print(f"Object uploaded to {destination_blob_name} in bucket {bucket.name}")
-        print(blob)
-        return blob
-    
-    def get_blob(self, bucket_name, source_blob_name, destination_file_name):
+        Without ``overwrite``, an item whose blob already exists is left alone and its result
+        has ``skipped`` set.
+
+        Args:
+            bucket_name (str): Name of the destination bucket.
+            items (iterable): ``(source, blob_name)`` tuples; sources as accepted by ``put_blob_from_string``.
+
+        Returns:
+            list: One result dict per item (see :meth:`_run_bulk`), in input order.
+        """
+        bucket = self.client.bucket(bucket_name)
+
+        def put(item):
+            source, blob_name = item
+            return self.put_blob_from_string(bucket, source, blob_name, overwrite=overwrite, content_type=content_type,
+                                             gzip_encoding=gzip_encoding) is not None
+
+        return self._run_bulk("put", put, items, max_workers, attempts)
+
+    def get_blob(self, bucket_name, source_blob_name, destination_file_name, chunk_size=DEFAULT_CHUNK_SIZE):
         """
         Downloads a blob from the specified bucket in Google Cloud Storage.
 
@@ -105,12 +321,13 @@ class GCSClient:
             bucket_name (str): Name of the bucket.
             source_blob_name (str): Name of the blob in the bucket.
             destination_file_name (str): File name to save the blob as locally.
+            chunk_size (int): Bytes fetched per request (a multiple of 256 KiB), or None for one request.
         """
         # Get the bucket
         bucket = self.client.bucket(bucket_name)
 
         # Get the blob
-        blob = bucket.blob(source_blob_name)
+        blob = bucket.blob(source_blob_name, chunk_size=chunk_size)
 
         # Download the blob to a file
         blob.download_to_filename(destination_file_name)
@@ -137,43 +354,76 @@ class GCSClient:
         blob_names = [blob.name for blob in blobs]
         return blob_names
 
-    def pop_blob(self, bucket_name, patterns_file = None):
+    def pop_blob(self, bucket_name, patterns_file = None, prefix=None, match_glob=None, index=None, page_size=DEFAULT_LIST_PAGE_SIZE):
         """
-        Selects and removes the first blob from the specified bucket in Google Cloud Storage,
+        Selects the first blob from the specified bucket in Google Cloud Storage,
         excluding any blobs that match patterns from the provided file.
 
+        Blobs are listed page by page and the search stops at the first valid blob, so only
+        the pages up to it are fetched. ``prefix`` and ``match_glob`` are applied by Cloud
+        Storage before anything is returned.
+
         Args:
             bucket_name (str): Name of the bucket.
             patterns_file (str, optional): Path to the file containing regex patterns to exclude.
+            prefix (str, optional): Only consider blobs whose name starts with this prefix.
+            match_glob (str, optional): Only consider blobs matching this glob, e.g. ``**/*.json``.
+            index (BlobIndex, optional): Blobs already processed, which are skipped.
+            page_size (int): Blobs requested per list call.
 
         Returns:
             google.cloud.storage.blob.Blob: The first blob from the bucket that doesn't match any pattern.
         """
-        # Load regex patterns from file
-        patterns = []
-        if patterns_file:
-            with open(patterns_file, 'r') as file:
-                patterns = [line.strip() for line in file]
+        scanned = []
+        for blob in self.iter_blobs(bucket_name, patterns_file, prefix=prefix, match_glob=match_glob, index=index,
+                                    page_size=page_size, scanned=scanned):
+            logging.info(f"First valid blob selected: {blob.name} (after scanning {scanned[0]} blobs)")
+            return blob
 
-        # Get the bucket
-        bucket = self.client.bucket(bucket_name)
-        
-        # List all blobs in the bucket
-        blobs = list(bucket.list_blobs())
-        
-        if not blobs:
+        if not scanned[0]:
             print(f"No blobs found in bucket '{bucket_name}'.")
             return None
-
-        # Filter blobs based on regex patterns
-        for blob in blobs:
-            if not any(re.search(pattern, blob.name) for pattern in patterns):
-                print(f"First valid blob selected: {blob.name}")
-                return blob
-
         print("No valid blobs found after applying regex patterns.")
         return None
 
+    def iter_blobs(self, bucket_name, patterns_file=None, prefix=None, match_glob=None, index=None,
+                   page_size=DEFAULT_LIST_PAGE_SIZE, exclude_prefix=None, scanned=None):
+        """
+        Lazily yields the blobs :meth:`pop_blob` would consider, in name order.
+
+        With an ``index`` created with ``resume``, the listing starts at the last blob up to
+        which earlier listings found only processed blobs (see :class:`BlobIndex`), so
+        processed blobs are not paged through again.
+
+        Args:
+            exclude_prefix (str, optional): Skip blobs whose name starts with this prefix.
+            scanned (list, optional): Receives the number of blobs listed so far as its only item.
+
+        See :meth:`pop_blob` for the other arguments.
+        """
+        excluded = compile_patterns(patterns_file)
+        if scanned is not None:
+            scanned[:] = [0]
+
+        listing = (bucket_name, prefix, match_glob)
+        start_offset = index.offset(listing) if index is not None else None
+        # Whether every blob listed so far was processed, so the resume point may move past it
+        resumable = index is not None and index.resume
+
+        for blob in self.client.list_blobs(bucket_name, prefix=prefix, match_glob=match_glob, page_size=page_size,
+                                           start_offset=start_offset):
+            if scanned is not None:
+                scanned[0] += 1
+            if exclude_prefix and blob.name.startswith(exclude_prefix):
+                continue
+            if index is not None and blob.name in index:
+                if resumable:
+                    index.advance(listing, blob.name)
+                continue
+            resumable = False
+            if excluded is None or not excluded.search(blob.name):
+                yield blob
+
     def download_blob_to_memory(self, bucket_name, blob_name):
         """
         Downloads a blob from the specified bucket to memory.
@@ -200,6 +450,80 @@ class GCSClient:
         print(f"Blob '{blob_name}' downloaded to memory.")
         return blob_data
     
+    def open_blob(self, bucket_name, blob_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Opens a blob as a binary file-like object that fetches ``chunk_size`` bytes at a time.
+
+        Returns:
+            io.BufferedIOBase: A reader; close it (or use it as a context manager) when done.
+        """
+        blob = self.client.bucket(bucket_name).blob(blob_name)
+        return blob.open("rb", chunk_size=chunk_size)
+
+    def iter_lines(self, bucket_name, blob_name, chunk_size=DEFAULT_CHUNK_SIZE, encoding="utf-8"):
+        """
+        Yields the lines of a text blob (e.g. newline-delimited JSON) without holding more
+        than one chunk in memory. Line endings are stripped.
+        """
+        with self.open_blob(bucket_name, blob_name, chunk_size=chunk_size) as reader:
+            for line in io.TextIOWrapper(reader, encoding=encoding, newline=""):
+                yield line.rstrip("\r\n")
+
+    def read_range(self, bucket_name, blob_name, start, end=None):
+        """
+        Downloads bytes ``start`` to ``end`` (inclusive) of a blob; to the end of the blob if ``end`` is None.
+        """
+        blob = self.client.bucket(bucket_name).blob(blob_name)
+        return blob.download_as_bytes(start=start, end=end)
+
+    def download_sliced(self, bucket_name, blob_name, destination_file_name, slice_size=DEFAULT_SLICE_SIZE,
+                        max_workers=DEFAULT_BULK_WORKERS, attempts=DEFAULT_BULK_ATTEMPTS):
+        """
+        Downloads a large blob as concurrent byte-range requests written straight into a
+        memory-mapped local file.
+
+        Every slice is pinned to the generation seen at the start, so an object replaced
+        mid-download fails instead of mixing versions.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            blob_name (str): Name of the blob to download.
+            destination_file_name (str): File to write; created or truncated to the blob's size.
+            slice_size (int): Bytes per range request.
+            max_workers (int): Maximum number of range requests in flight.
+            attempts (int): Tries per slice, retrying transient errors with backoff.
+
+        Returns:
+            str: ``destination_file_name``, e.g. to ``mmap`` for reading.
+
+        Raises:
+            IOError: If a slice could not be downloaded.
+        """
+        bucket = self.client.bucket(bucket_name)
+        blob = bucket.blob(blob_name)
+        blob.reload()
+        size, generation = blob.size, blob.generation
+
+        with open(destination_file_name, "w+b") as file:
+            file.truncate(size)
+            if size == 0:
+                return destination_file_name
+            with mmap.mmap(file.fileno(), size) as mapped:
+
+                def fetch(start):
+                    end = min(start + slice_size, size) - 1
+                    data = bucket.blob(blob_name).download_as_bytes(start=start, end=end, if_generation_match=generation)
+                    mapped[start:start + len(data)] = data
+
+                results = self._run_bulk("sliced download", fetch, range(0, size, slice_size), max_workers, attempts)
+                mapped.flush()
+
+        failed = [result for result in results if not result["ok"]]
+        if failed:
+            raise IOError(f"{len(failed)} slice(s) of gs://{bucket_name}/{blob_name} failed: {failed[0]['error']}")
+        logging.info(f"Downloaded {size} bytes of gs://{bucket_name}/{blob_name} in {len(results)} slices to {destination_file_name}")
+        return destination_file_name
+
     def copy_blob(self, source_bucket_name, source_blob_name, destination_bucket_name, destination_blob_name):
         """
         Copies a blob from one bucket to another.
@@ -232,6 +556,119 @@ class GCSClient:
         blob.delete()
 
 
+    def copy_blobs(self, items, max_workers=DEFAULT_BULK_WORKERS, attempts=DEFAULT_BULK_ATTEMPTS):
+        """
+        Copies many blobs concurrently.
+
+        Args:
+            items (iterable): ``(source_bucket_name, source_blob_name, destination_bucket_name, destination_blob_name)`` tuples.
+            max_workers (int): Maximum number of requests in flight.
+            attempts (int): Tries per item before it is reported as failed.
+
+        Returns:
+            list: One result dict per item (see :meth:`_run_bulk`), in input order.
+        """
+        def copy(item):
+            source_bucket_name, source_blob_name, destination_bucket_name, destination_blob_name = item
+            source_bucket = self.client.bucket(source_bucket_name)
+            source_bucket.copy_blob(source_bucket.blob(source_blob_name), self.client.bucket(destination_bucket_name), destination_blob_name)
+
+        return self._run_bulk("copy", copy, items, max_workers, attempts)
+
+    def delete_blobs(self, bucket_name, blob_names, max_workers=DEFAULT_BULK_WORKERS, attempts=DEFAULT_BULK_ATTEMPTS):
+        """
+        Deletes many blobs of a bucket concurrently. A blob that is already gone counts as deleted.
+
+        Returns:
+            list: One result dict per blob name, in input order.
+        """
+        bucket = self.client.bucket(bucket_name)
+
+        def delete(blob_name):
+            try:
+                bucket.blob(blob_name).delete()
+            except exceptions.NotFound:
+                pass
+
+        return self._run_bulk("delete", delete, blob_names, max_workers, attempts)
+
+    def download_blobs(self, bucket_name, blob_names, destination_dir, max_workers=DEFAULT_BULK_WORKERS, attempts=DEFAULT_BULK_ATTEMPTS):
+        """
+        Downloads many blobs concurrently to files below ``destination_dir``, keeping their names as relative paths.
+
+        Object names are chosen by whoever writes to the bucket, so a name that would resolve
+        outside ``destination_dir`` (``../`` segments, a leading ``/``, a symlink) is not
+        downloaded and reported as failed.
+
+        Returns:
+            list: One result dict per blob name, in input order.
+        """
+        bucket = self.client.bucket(bucket_name)
+        root = os.path.realpath(destination_dir)
+
+        def download(blob_name):
+            path = os.path.realpath(os.path.join(root, blob_name))
+            if os.path.commonpath([root, path]) != root or path == root:
+                raise OSError(f"Blob name {blob_name!r} resolves outside {destination_dir}")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            bucket.blob(blob_name).download_to_filename(path)
+
+        return self._run_bulk("download", download, blob_names, max_workers, attempts)
+
+    def upload_blobs(self, bucket_name, items, max_workers=DEFAULT_BULK_WORKERS, attempts=DEFAULT_BULK_ATTEMPTS):
+        """
+        Uploads many local files concurrently.
+
+        Args:
+            bucket_name (str): Name of the destination bucket.
+            items (iterable): ``(local_path, blob_name)`` tuples.
+
+        Returns:
+            list: One result dict per item, in input order.
+        """
+        bucket = self.client.bucket(bucket_name)
+
+        def upload(item):
+            local_path, blob_name = item
+            bucket.blob(blob_name).upload_from_filename(local_path)
+
+        return self._run_bulk("upload", upload, items, max_workers, attempts)
+
+    def _run_bulk(self, operation, func, items, max_workers, attempts):
+        """
+        Applies ``func`` to every item from a thread pool, retrying transient errors with backoff.
+        ``func`` returns False for an item it left alone, e.g. an upload that found the blob
+        already there.
+
+        Returns:
+            list: Dicts with the ``item``, ``ok``, whether it was ``skipped``, the number of ``attempts``
+                  made and the last ``error`` (or None).
+        """
+        def run(item):
+            delays = backoff_delays()
+            for attempt in range(1, attempts + 1):
+                try:
+                    skipped = func(item) is False
+                    return {"item": item, "ok": True, "skipped": skipped, "attempts": attempt, "error": None}
+                except transient_errors() as e:
+                    if attempt == attempts:
+                        return {"item": item, "ok": False, "skipped": False, "attempts": attempt, "error": str(e)}
+                    time.sleep(next(delays))
+                except (exceptions.GoogleAPICallError, OSError) as e:
+                    return {"item": item, "ok": False, "skipped": False, "attempts": attempt, "error": str(e)}
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            results = list(pool.map(run, items))
+
+        failed = [result for result in results if not result["ok"]]
+        skipped = sum(result["skipped"] for result in results)
+        logging.info(f"Bulk {operation}: {len(results) - len(failed) - skipped} of {len(results)} succeeded, {skipped} skipped "
+                     f"in {time.monotonic() - started:.1f}s")
+        for result in failed[:10]:
+            logging.error(f"Bulk {operation} of {result['item']} failed after {result['attempts']} attempt(s): {result['error']}")
+        return results
+
 # Example usage:
 
 def test():
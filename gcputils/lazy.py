@@ -0,0 +1,35 @@
+import importlib
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    def __getattr__(self, attr):
+        # Only reached for attributes the proxy itself lacks; the first one triggers the import
+        module = importlib.import_module(self.__name__)
+        return getattr(module, attr)
+
+    def __dir__(self):
+        return dir(importlib.import_module(self.__name__))
+
+
+def lazy_import(name):
+    """
+    Returns a stand-in for module ``name`` that imports it on first attribute access.
+
+    Importing the Google client libraries takes most of a second, so modules that only
+    need them on some code paths bind them through this instead of a top-level import:
+    ``bigquery = lazy_import("google.cloud.bigquery")`` costs nothing until
+    ``bigquery.Client`` is used. The import itself goes through ``importlib``, so it is
+    thread-safe and shares ``sys.modules`` with ordinary imports.
+
+    Args:
+        name (str): Fully qualified module name.
+
+    Returns:
+        module: The module itself if it is already imported, otherwise the stand-in.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return _LazyModule(name)
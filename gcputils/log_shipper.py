@@ -0,0 +1,213 @@
+import atexit
+import datetime
+import json
+import queue
+import sys
+import threading
+import time
+from gcputils.backoff import backoff_delays
+
+
+# Entries and approximate bytes per write, and seconds an entry may wait for a batch to
+# fill. The API accepts up to 10 MB per write; staying well below leaves room for metadata.
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_BYTES = 1024 * 1024
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_MAX_QUEUE_SIZE = 10_000
+DEFAULT_WRITE_ATTEMPTS = 3
+
+# What to do with a new entry when the queue is full
+OVERFLOW_POLICIES = ("drop", "drop_oldest", "block")
+
+# Wakes the shipper thread to write what it has without waiting for the batch to fill
+_FLUSH = object()
+
+
+class LogShipper:
+    def __init__(self, logger, labels=None, max_queue_size=DEFAULT_MAX_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 batch_bytes=DEFAULT_BATCH_BYTES, flush_interval=DEFAULT_FLUSH_INTERVAL, overflow="drop",
+                 block_timeout=None, write_attempts=DEFAULT_WRITE_ATTEMPTS):
+        """
+        Ships log entries to Cloud Logging from a background thread.
+
+        ``emit`` only puts the entry on a bounded queue; the shipper thread groups entries into
+        one ``entries.write`` call per ``batch_size`` entries, ``batch_bytes`` bytes or
+        ``flush_interval`` seconds, whichever comes first. Pending entries are flushed when the
+        interpreter exits.
+
+        Args:
+            logger (google.cloud.logging.Logger): The logger the entries are written to.
+            labels (dict, optional): Labels added to every entry; per-entry labels take precedence.
+            max_queue_size (int): Maximum number of entries waiting to be written.
+            batch_size (int): Maximum entries per write.
+            batch_bytes (int): Approximate maximum payload bytes per write.
+            flush_interval (float): Maximum seconds an entry waits before its batch is written.
+            overflow (str): When the queue is full, "drop" the new entry, "drop_oldest" queued entry,
+                            or "block" the caller for up to ``block_timeout`` seconds and then drop it.
+            block_timeout (float, optional): Seconds to block with the "block" policy; None waits for room.
+            write_attempts (int): Attempts per batch before it is dropped.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}, not {overflow!r}")
+        self.logger = logger
+        self.labels = dict(labels or {})
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.write_attempts = write_attempts
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._pending = 0
+        self._pending_changed = threading.Condition()
+        self._closed = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, payload, severity="INFO", labels=None):
+        """
+        Queues an entry without waiting for it to be written.
+
+        Args:
+            payload (str or dict): Text, or a JSON-serializable mapping written as a structured payload.
+            severity (str): The severity of the entry.
+            labels (dict, optional): Labels of this entry, e.g. the job ID and table of a merge.
+
+        Returns:
+            bool: False if the entry was dropped because the queue was full or the shipper is closed.
+        """
+        if self._closed:
+            self._count_dropped(1)
+            return False
+        entry = {
+            "payload": payload,
+            "severity": severity,
+            "labels": {**self.labels, **labels} if labels else self.labels,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc),
+        }
+        with self._pending_changed:
+            self._pending += 1
+        try:
+            if self.overflow == "block":
+                self._queue.put(entry, timeout=self.block_timeout)
+            elif self.overflow == "drop_oldest":
+                self._put_dropping_oldest(entry)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            self._finish(0, dropped=1)
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Waits until every entry queued so far is written or dropped.
+
+        Returns:
+            bool: False if entries were still pending after ``timeout`` seconds.
+        """
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass  # the shipper is busy with full batches anyway
+        with self._pending_changed:
+            return self._pending_changed.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=10.0):
+        """
+        Flushes the queue and stops the shipper thread. Entries emitted afterwards are dropped.
+
+        Never waits longer than about twice ``timeout``, even when the queue is full because the
+        backend is slow or down; the (daemon) thread then keeps draining until the process exits.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.flush(timeout)
+        self._stop.set()
+        try:
+            self._queue.put_nowait(_FLUSH)  # wake the thread if it is waiting for entries
+        except queue.Full:
+            pass  # it is busy with full batches and checks the stop flag after each one
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self):
+        return {"sent": self.sent, "dropped": self.dropped, "failed": self.failed, "queued": self._queue.qsize()}
+
+    def _put_dropping_oldest(self, entry):
+        while True:
+            try:
+                self._queue.put_nowait(entry)
+                return
+            except queue.Full:
+                try:
+                    oldest = self._queue.get_nowait()
+                except queue.Empty:
+                    continue
+                if oldest is not _FLUSH:
+                    self._finish(0, dropped=1)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch, size = [], 0
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _FLUSH:
+                    break
+                batch.append(item)
+                size += self._entry_size(item)
+                if len(batch) >= self.batch_size or size >= self.batch_bytes:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        delays = backoff_delays()
+        for attempt in range(1, self.write_attempts + 1):
+            try:
+                writer = self.logger.batch()
+                for entry in batch:
+                    log = writer.log_struct if isinstance(entry["payload"], dict) else writer.log_text
+                    log(entry["payload"], severity=entry["severity"], labels=entry["labels"] or None,
+                        timestamp=entry["timestamp"])
+                writer.commit()
+                self._finish(len(batch))
+                return
+            except Exception as e:
+                # Not through ``logging``: its handler may be the one feeding this queue
+                if attempt == self.write_attempts:
+                    print(f"Dropping {len(batch)} log entries after {attempt} attempts: {e}", file=sys.stderr)
+                    self._finish(0, failed=len(batch))
+                    return
+                time.sleep(next(delays))
+
+    def _finish(self, sent, dropped=0, failed=0):
+        with self._pending_changed:
+            self.sent += sent
+            self.dropped += dropped
+            self.failed += failed
+            self._pending -= sent + dropped + failed
+            self._pending_changed.notify_all()
+
+    def _count_dropped(self, count):
+        with self._pending_changed:
+            self.dropped += count
+
+    @staticmethod
+    def _entry_size(entry):
+        payload = entry["payload"]
+        return len(payload) if isinstance(payload, str) else len(json.dumps(payload, default=str))
@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+import time
+from gcputils.lazy import lazy_import
+
+exceptions = lazy_import("google.api_core.exceptions")
+
+
+# How a failed BigQuery request or job is handled: throttling and quota errors are retried
+# and shrink the concurrency limit, conflicting DML and server-side failures are only
+# retried, and anything else fails at once
+RATE_LIMIT = "rate_limit"
+CONFLICT = "conflict"
+BACKEND = "backend"
+PERMANENT = "permanent"
+RETRYABLE = (RATE_LIMIT, CONFLICT, BACKEND)
+
+# Tries per job, and the backoff between them. BigQuery asks for at least a second between
+# retries of rate-limited requests.
+DEFAULT_ATTEMPTS = 5
+DEFAULT_INITIAL_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+_RATE_LIMIT_REASONS = {"rateLimitExceeded", "quotaExceeded"}
+_BACKEND_REASONS = {"backendError", "internalError", "jobBackendError", "jobInternalError"}
+_RATE_LIMIT_MESSAGE = re.compile(r"exceeded rate limits|too many DML statements outstanding|quota exceeded", re.IGNORECASE)
+_CONFLICT_MESSAGE = re.compile(r"concurrent update|could not serialize access", re.IGNORECASE)
+
+
+def classify_error(error):
+    """
+    Classifies a failed request or job as ``RATE_LIMIT``, ``CONFLICT``, ``BACKEND`` or ``PERMANENT``.
+
+    Args:
+        error: An exception raised by the client, or a job's ``error_result`` dict
+               (``{"reason": ..., "message": ...}``).
+
+    Returns:
+        str: The class of the error.
+    """
+    if isinstance(error, dict):
+        reasons, message = {error.get("reason")}, error.get("message") or ""
+    elif isinstance(error, ConnectionError):
+        return BACKEND
+    elif isinstance(error, exceptions.GoogleAPICallError):
+        if isinstance(error, exceptions.TooManyRequests):
+            return RATE_LIMIT
+        if isinstance(error, exceptions.ServerError):
+            return BACKEND
+        reasons = {e.get("reason") for e in error.errors or [] if isinstance(e, dict)}
+        message = error.message or ""
+    else:
+        reasons, message = set(), str(error)
+
+    # The message is checked first: BigQuery reports DML conflicts and too many queued DML
+    # statements with generic reasons such as "invalidQuery" or "resourcesExceeded"
+    if _CONFLICT_MESSAGE.search(message):
+        return CONFLICT
+    if reasons & _RATE_LIMIT_REASONS or _RATE_LIMIT_MESSAGE.search(message):
+        return RATE_LIMIT
+    if reasons & _BACKEND_REASONS:
+        return BACKEND
+    return PERMANENT
+
+
+class AdaptiveLimiter:
+    def __init__(self, maximum, minimum=1, initial=None, decrease=0.5):
+        """
+        An additive-increase, multiplicative-decrease (AIMD) limit on jobs in flight.
+
+        Every successful job raises the limit by ``1 / limit``, so by about one per round of
+        ``limit`` jobs, up to ``maximum``; a rate-limit or quota error multiplies it by
+        ``decrease``. Errors from jobs submitted before the last decrease are ignored, so a
+        burst of failures from one round shrinks the limit once rather than to ``minimum``.
+
+        Args:
+            maximum (int): The largest limit, e.g. the configured ``max_in_flight``.
+            minimum (int): The smallest limit.
+            initial (float, optional): The starting limit; ``maximum`` if not provided.
+            decrease (float): Factor applied to the limit on throttling.
+        """
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.throttled = 0
+        self._limit = float(maximum if initial is None else initial)
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(self._limit))
+
+    def on_success(self):
+        with self._lock:
+            self._limit = min(float(self.maximum), self._limit + 1.0 / max(self._limit, 1.0))
+
+    def on_throttle(self, sent_at=None):
+        """
+        Shrinks the limit after a rate-limit or quota error.
+
+        Args:
+            sent_at (float, optional): ``time.monotonic()`` when the failed job was submitted.
+        """
+        with self._lock:
+            self.throttled += 1
+            if sent_at is not None and sent_at < self._last_decrease:
+                return
+            previous = self.limit
+            self._limit = max(float(self.minimum), self._limit * self.decrease)
+            self._last_decrease = time.monotonic()
+        logging.warning(f"Throttled by BigQuery: in-flight limit {previous} -> {self.limit}")
@@ -0,0 +1,65 @@
+import threading
+from gcputils.lazy import lazy_import
+
+google_auth = lazy_import("google.auth")
+auth_requests = lazy_import("google.auth.transport.requests")
+requests_adapters = lazy_import("requests.adapters")
+service_account = lazy_import("google.oauth2.service_account")
+
+
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+# Connections kept open per host. requests defaults to 10, fewer than the bulk GCS
+# operations and parallel merges run at once, which then reconnect on every request.
+DEFAULT_POOL_SIZE = 32
+
+_lock = threading.Lock()
+_credentials = {}
+_sessions = {}
+
+
+def shared_credentials(credentials_path=None):
+    """
+    Returns the credentials for ``credentials_path``, loading them once per process.
+
+    Args:
+        credentials_path (str, optional): Path to a service account JSON file. If not provided,
+                                          the default credentials from the environment are used.
+
+    Returns:
+        tuple: The credentials and the project they belong to (None if unknown).
+    """
+    with _lock:
+        if credentials_path not in _credentials:
+            if credentials_path:
+                credentials = service_account.Credentials.from_service_account_file(credentials_path, scopes=SCOPES)
+                _credentials[credentials_path] = (credentials, credentials.project_id)
+            else:
+                _credentials[credentials_path] = google_auth.default(scopes=SCOPES)
+        return _credentials[credentials_path]
+
+
+def shared_session(credentials_path=None, pool_size=DEFAULT_POOL_SIZE):
+    """
+    Returns the authorized HTTP session for ``credentials_path``, creating it once per process.
+
+    Every gcputils client built from the same credentials sends its requests through this
+    session, so they share one token refresh and one pool of keep-alive connections
+    instead of each opening its own.
+
+    Args:
+        credentials_path (str, optional): As in ``shared_credentials``.
+        pool_size (int): Maximum connections kept open per host.
+
+    Returns:
+        google.auth.transport.requests.AuthorizedSession: The shared session.
+    """
+    credentials, _ = shared_credentials(credentials_path)
+    key = (credentials_path, pool_size)
+    with _lock:
+        if key not in _sessions:
+            session = auth_requests.AuthorizedSession(credentials)
+            adapter = requests_adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, ttl=300.0, max_entries=1024):
+        """
+        A thread-safe mapping whose entries expire after ``ttl`` seconds and that evicts the least
+        recently used entry once it holds ``max_entries``.
+
+        Args:
+            ttl (float): Seconds an entry stays valid; 0 disables caching.
+            max_entries (int): Maximum number of entries kept.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value, or ``default`` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        """
+        Drops every entry whose (string) key starts with ``prefix``.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,12 +1,45 @@
 import argparse
 import logging
-from google.cloud import bigquery
 from gcputils.BigQueryClient import BigQueryClient
-from google.api_core.exceptions import GoogleAPIError
+from gcputils.lazy import lazy_import
+from gcputils.retry import DEFAULT_ATTEMPTS
+from merge_scheduler import MergeScheduler, DEFAULT_MAX_IN_FLIGHT
+from watermark import WatermarkStore, check_window_type, watermark_literal, window_start
+from merge_planner import MergePlanner, OverBudgetError, and_filters, key_columns, key_expression, partition_layout
+from chunked_merge import CheckpointStore, hash_chunk_filters, new_run_id
+from merge_metrics import MergeMetrics, MetricsHistoryStore
+from merge_packer import MergePacker, DEFAULT_PACK_MAX_BYTES, packable
+from merge_verifier import verify_merge
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import json
 import os
+import threading
+import time
+import uuid
 
+# Imported on first use, so --help and argument errors do not load the Google libraries
+bigquery = lazy_import("google.cloud.bigquery")
+exceptions = lazy_import("google.api_core.exceptions")
 
-def initialize_bq_client(project_id, credentials_path=None):
+
+DEFAULT_STATE_TABLE = "prodifier_watermarks"
+DEFAULT_CHECKPOINT_TABLE = "prodifier_checkpoints"
+DEFAULT_LOOKBACK = 1
+
+# Watermark-store key under which the fingerprint of the last merged staging snapshot is kept
+SNAPSHOT_COLUMN = "_staging_snapshot"
+
+# Watermark-store key under which the staging and production snapshots of the last passing
+# verification are kept; while neither table changes, verifying again would find the same
+VERIFIED_COLUMN = "_verified_snapshot"
+
+
+def initialize_bq_client(project_id, credentials_path=None, local_db=None):
+    if local_db:
+        # Run against a SQLite file instead of BigQuery (see gcputils/LocalBigQuery.py)
+        from gcputils.LocalBigQuery import LocalBigQueryClient
+        return BigQueryClient(project_id, client=LocalBigQueryClient(project_id, local_db))
     return BigQueryClient(project_id, credentials_path=credentials_path)
 
 # Function to check if a table exists
@@ -17,38 +50,656 @@ def table_exists(client, dataset_id, table_id):
     except bigquery.NotFound:
         return False
 
-def merge(bq_client,dataset_id, staging_table_id, prod_table_id,unique_column ="id"):
-    # Initialize BigQuery client
-    # bq_client = bigquery.Client()
-        # Check if the staging and production tables exist
-    if not bq_client.table_exists(dataset_id, staging_table_id):
-        logging.error(f"Staging table: {staging_table_id} does not exist")
-    elif not bq_client.table_exists(dataset_id, prod_table_id):
-        logging.error(f"Production table: {prod_table_id} does not exist")
-    else:
-        # Define the MERGE statement
-        merge_query = f"""
-        MERGE `{dataset_id}.{prod_table_id}` T
-        USING `{dataset_id}.{staging_table_id}` S
-        ON T.{unique_column} = S.{unique_column}
-        WHEN NOT MATCHED THEN
-        INSERT ROW
+def build_merge_query(dataset_id, staging_table_id, prod_table_id, unique_column="id", source_filter=None, target_filter=None, dedup=False, dedup_order_by=None):
+    # Insert staging rows whose key is not yet in production. The optional filters restrict
+    # the staging rows (a predicate over its columns) and the production rows (over T.*).
+    # With dedup, only the first staging row per key (by dedup_order_by) is considered.
+    keys = key_columns(unique_column)
+    source = f"`{dataset_id}.{staging_table_id}`"
+    if dedup:
+        order = f" ORDER BY {dedup_order_by}" if dedup_order_by else ""
+        source = f"(SELECT * FROM {source} WHERE {source_filter or 'TRUE'} QUALIFY ROW_NUMBER() OVER (PARTITION BY {', '.join(keys)}{order}) = 1)"
+    elif source_filter:
+        source = f"(SELECT * FROM {source} WHERE {source_filter})"
+    condition = " AND ".join(f"T.{key} = S.{key}" for key in keys)
+    if target_filter:
+        condition = f"{condition} AND {target_filter}"
+    return f"""
+    MERGE `{dataset_id}.{prod_table_id}` T
+    USING {source} S
+    ON {condition}
+    WHEN NOT MATCHED THEN
+    INSERT ROW
+    """
+
+def build_count_query(dataset_id, staging_table_id, prod_table_id, unique_column="id", source_filter=None, target_filter=None, distinct=False):
+    # Count the staging rows (keys, with distinct) that the MERGE built from the same arguments
+    # would insert. The anti-join reads only the key and filter columns, unlike the MERGE.
+    keys = key_columns(unique_column)
+    condition = " AND ".join(f"T.{key} = S.{key}" for key in keys)
+    if target_filter:
+        condition = f"{condition} AND {target_filter}"
+    count = f"COUNT(DISTINCT {key_expression(unique_column, 'S.')})" if distinct else "COUNT(*)"
+    return f"""
+    SELECT {count} AS new_rows
+    FROM `{dataset_id}.{staging_table_id}` S
+    WHERE {source_filter or "TRUE"}
+    AND NOT EXISTS (SELECT 1 FROM `{dataset_id}.{prod_table_id}` T WHERE {condition})
+    """
+
+def pair_name(pair):
+    return f"{pair['dataset_id']}.{pair['staging_table_id']} -> {pair['prod_table_id']}"
+
+def pair_labels(pair):
+    return {"dataset": pair["dataset_id"], "staging_table": pair["staging_table_id"], "prod_table": pair["prod_table_id"]}
+
+def staging_fingerprint(table):
+    # Changes whenever rows are loaded, inserted, updated or deleted
+    modified = table.modified.isoformat() if table.modified else ""
+    return f"{table.num_rows}:{table.num_bytes}:{modified}"
+
+def _staging_precheck(bq_client, pair, context):
+    """
+    Decides from table metadata alone whether staging can hold anything new: it cannot if it
+    is empty, or if its fingerprint equals the one recorded after the last successful merge.
+
+    Returns:
+        tuple: ``(reason, fingerprint)``: why the merge can be skipped (None if it cannot)
+               and the staging fingerprint to record (None if the metadata is incomplete).
+    """
+    dataset_id = pair["dataset_id"]
+    staging = bq_client.get_table(dataset_id, pair["staging_table_id"])
+    if getattr(staging, "streaming_buffer", None) is not None:
+        # Streamed rows are not reflected in num_rows or modified until they leave the buffer
+        return None, None
+    if not staging.num_rows:
+        return "Staging table is empty", None
+    fingerprint = staging_fingerprint(staging)
+    stored = context.watermark_store(pair).get(f"{dataset_id}.{pair['staging_table_id']}", f"{dataset_id}.{pair['prod_table_id']}", SNAPSHOT_COLUMN)
+    if stored == fingerprint:
+        return f"Staging unchanged since the last merge ({staging.num_rows} rows, modified {staging.modified})", fingerprint
+    return None, fingerprint
+
+def _count_new_rows(bq_client, pair, unique_column, source_filter, target_filter):
+    query = build_count_query(pair["dataset_id"], pair["staging_table_id"], pair["prod_table_id"], unique_column,
+                              source_filter=source_filter, target_filter=target_filter, distinct=bool(pair.get("dedup")))
+    query_job = bq_client.run_query(query)
+    return next(iter(query_job.result()))["new_rows"]
+
+def _column_type(table, column):
+    for field in table.schema:
+        if field.name == column:
+            return field.field_type
+    raise ValueError(f"Column {column} not found in {table.table_id}")
+
+def _incremental_window(bq_client, pair, store):
+    """
+    Works out which staging rows are new since the stored watermark.
+
+    Returns:
+        tuple: ``(source_filter, target_filter, high)``, or None if staging holds nothing
+               newer than the watermark.
+    """
+    dataset_id = pair["dataset_id"]
+    column = pair["watermark_column"]
+    staging = f"{dataset_id}.{pair['staging_table_id']}"
+    field_type = _column_type(bq_client.get_table(dataset_id, pair["staging_table_id"]), column)
+    check_window_type(field_type, column)
+
+    low = store.get(staging, f"{dataset_id}.{pair['prod_table_id']}", column)
+    newer = f"{column} > {watermark_literal(field_type, low)}" if low is not None else "TRUE"
+    high_job = bq_client.run_query(f"SELECT CAST(MAX({column}) AS STRING) AS high FROM `{staging}` WHERE {newer}")
+    high = next(iter(high_job.result()))["high"]
+    if high is None:
+        return None
+
+    upper = f"{column} <= {watermark_literal(field_type, high)}"
+    if low is None:
+        # First run: merge everything up to the new watermark
+        return upper, None, high
+
+    # Re-merge a lookback window below the old watermark on both sides so late arrivals are
+    # still caught, while BigQuery only scans the partitions inside the window.
+    start = window_start(field_type, low, pair.get("lookback", DEFAULT_LOOKBACK))
+    return f"{column} > {start} AND {upper}", f"T.{column} > {start}", high
+
+class MergeContext:
+    def __init__(self, bq_client):
+        """
+        State shared by the pairs of one run: the watermark and checkpoint stores they use and
+        the watermarks waiting to be recorded once their merges succeed.
         """
-    
-    query_job = bq_client.query_and_wait(merge_query)
-    if query_job.result():
+        self.bq_client = bq_client
+        self.watermark_stores = {}
+        self.checkpoint_stores = {}
+        self.pending_watermarks = []
+        self._lock = threading.Lock()
+        self._completed_chunks = {}
+
+    def load(self, table_pairs):
+        # Learn which tables exist with one query per dataset instead of two lookups per pair
+        if len(table_pairs) > 1:
+            datasets = {}
+            for pair in table_pairs:
+                datasets.setdefault(pair["dataset_id"], set()).update((pair["staging_table_id"], pair["prod_table_id"]))
+            for dataset_id, table_ids in datasets.items():
+                try:
+                    self.bq_client.prefetch_tables(dataset_id, table_ids)
+                except exceptions.GoogleAPIError as e:
+                    logging.warning(f"Could not prefetch table metadata of {dataset_id}: {e}")
+        # Read each state table once up front instead of once per pair
+        for pair in table_pairs:
+            if pair.get("watermark_column") or pair.get("skip_unchanged") or pair.get("verify"):
+                self.watermark_store(pair)
+            if pair.get("chunks"):
+                self.completed_chunks(pair)
+
+    def watermark_store(self, pair):
+        state_table = pair.get("state_table") or f"{pair['dataset_id']}.{DEFAULT_STATE_TABLE}"
+        with self._lock:
+            if state_table not in self.watermark_stores:
+                store = WatermarkStore(self.bq_client, state_table)
+                store.load()
+                self.watermark_stores[state_table] = store
+            return self.watermark_stores[state_table]
+
+    def checkpoint_store(self, pair):
+        checkpoint_table = pair.get("checkpoint_table") or f"{pair['dataset_id']}.{DEFAULT_CHECKPOINT_TABLE}"
+        with self._lock:
+            if checkpoint_table not in self.checkpoint_stores:
+                store = CheckpointStore(self.bq_client, checkpoint_table)
+                store.ensure_table()
+                self.checkpoint_stores[checkpoint_table] = store
+            return self.checkpoint_stores[checkpoint_table]
+
+    def completed_chunks(self, pair):
+        store = self.checkpoint_store(pair)
+        key = (store.checkpoint_table, pair["run_id"])
+        with self._lock:
+            if key not in self._completed_chunks:
+                self._completed_chunks[key] = store.completed(pair["run_id"])
+            return self._completed_chunks[key]
+
+    def add_watermark(self, pair, entry):
+        store = self.watermark_store(pair)
+        with self._lock:
+            self.pending_watermarks.append((store, entry))
+
+    def finish(self):
+        """
+        Records the watermarks of successful merges and waits for checkpoint writes.
+        """
+        for store in self.watermark_stores.values():
+            store.record([entry for owner, entry in self.pending_watermarks if owner is store])
+        self.pending_watermarks = []
+        for store in self.checkpoint_stores.values():
+            store.flush()
+
+def _count_duplicates(bq_client, dataset_id, staging_table_id, unique_column, source_filter):
+    query = f"""
+    SELECT COUNT(*) - COUNT(DISTINCT {key_expression(unique_column)}) AS duplicates
+    FROM `{dataset_id}.{staging_table_id}`
+    WHERE {source_filter or "TRUE"}
+    """
+    query_job = bq_client.run_query(query)
+    return next(iter(query_job.result()))["duplicates"]
+
+def _materialize_dedup(bq_client, pair, unique_column, source_filter):
+    """
+    Writes the deduplicated staging rows to a temporary table that expires after a day.
+
+    Returns:
+        str: The ID of the deduplicated table, in the pair's dataset.
+    """
+    dataset_id = pair["dataset_id"]
+    table_id = f"{pair['staging_table_id']}_dedup_{uuid.uuid4().hex[:8]}"
+    order = f" ORDER BY {pair['dedup_order_by']}" if pair.get("dedup_order_by") else ""
+    query = f"""
+    CREATE TABLE `{dataset_id}.{table_id}`
+    OPTIONS (expiration_timestamp = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL 1 DAY))
+    AS SELECT * FROM `{dataset_id}.{pair['staging_table_id']}`
+    WHERE {source_filter or "TRUE"}
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY {', '.join(key_columns(unique_column))}{order}) = 1
+    """
+    bq_client.run_query(query)
+    return table_id
+
+def _merge_statements(bq_client, pair, unique_column, source_filter, target_filter):
+    """
+    Renders the MERGE statements of one pair, chunked and planned as requested.
+
+    Returns:
+        list: Dicts with the ``query`` and a ``label`` identifying the chunk it covers.
+    """
+    dataset_id = pair["dataset_id"]
+    staging_table_id = pair.get("source_table_id") or pair["staging_table_id"]
+    build_query = functools.partial(build_merge_query, dedup=pair.get("dedup") == "inline", dedup_order_by=pair.get("dedup_order_by"))
+    chunks = pair.get("chunks")
+    chunk_by = pair.get("chunk_by") or "hash"
+    if chunks and chunk_by == "partition" and partition_layout(bq_client.get_table(dataset_id, pair["prod_table_id"])) is None:
+        logging.warning(f"{dataset_id}.{pair['prod_table_id']} is not partitioned on a column; chunking by hash instead")
+        chunk_by = "hash"
+    planner = None
+    if pair.get("plan") or pair.get("max_bytes") or (chunks and chunk_by == "partition"):
+        planner = MergePlanner(bq_client, max_bytes=pair.get("max_bytes"), split=pair.get("over_budget") == "split")
+
+    pieces = [(None, None, None)]
+    if chunks and chunk_by == "hash":
+        pieces = hash_chunk_filters(unique_column, chunks)
+
+    statements = []
+    for label, chunk_source, chunk_target in pieces:
+        piece_source = and_filters(source_filter, chunk_source)
+        piece_target = and_filters(target_filter, chunk_target)
+        if planner is None:
+            query = build_query(dataset_id, staging_table_id, pair["prod_table_id"], unique_column,
+                                source_filter=piece_source, target_filter=piece_target)
+            statements.append({"query": query, "label": label or "all"})
+            continue
+        planned = planner.plan(dataset_id, staging_table_id, pair["prod_table_id"], unique_column,
+                               source_filter=piece_source, target_filter=piece_target, build_query=build_query,
+                               chunks=chunks if chunk_by == "partition" else None)
+        for statement in planned:
+            statements.append({"query": statement["query"], "label": f"{label} {statement['label']}" if label else statement["label"]})
+    return statements
+
+def prepare_merge(bq_client, pair, context):
+    """
+    Turns one staging/prod pair into a scheduler task.
+
+    Args:
+        bq_client (BigQueryClient): The client used for metadata lookups.
+        pair (dict): ``dataset_id``, ``staging_table_id``, ``prod_table_id`` and optionally
+                     ``unique_column``, ``watermark_column``, ``lookback``, ``state_table``,
+                     ``plan``, ``max_bytes``, ``over_budget`` (``refuse`` or ``split``),
+                     ``chunks``, ``chunk_by`` (``hash`` or ``partition``), ``parallel_chunks``,
+                     ``run_id``, ``checkpoint_table``, ``dedup`` (``inline`` or ``materialize``),
+                     ``dedup_order_by``, ``skip_unchanged`` and ``verify``. ``unique_column`` may
+                     list several key columns.
+        context (MergeContext): State shared by the pairs of this run.
+
+    Returns:
+        dict: A task with ``name`` and ``queries``, or with ``skip`` set to ``(status, message)``.
+    """
+    name = pair_name(pair)
+    dataset_id = pair["dataset_id"]
+    staging_table = f"{dataset_id}.{pair['staging_table_id']}"
+    prod_table = f"{dataset_id}.{pair['prod_table_id']}"
+    if pair.get("skip_unchanged"):
+        # The pre-check needs current metadata: a cached entry could hide rows loaded since
+        bq_client.invalidate_table(dataset_id, pair["staging_table_id"])
+    missing = [t for t in (pair["staging_table_id"], pair["prod_table_id"]) if not bq_client.table_exists(dataset_id, t)]
+    if missing:
+        return {"name": name, "skip": ("SKIPPED", f"Missing table(s): {', '.join(missing)}")}
+
+    fingerprint = None
+    if pair.get("skip_unchanged"):
+        reason, fingerprint = _staging_precheck(bq_client, pair, context)
+        if reason is not None:
+            return {"name": name, "skip": ("NOOP", reason)}
+
+    unique_column = pair.get("unique_column", "id")
+    source_filter, target_filter, high = None, None, None
+    if pair.get("watermark_column"):
+        window = _incremental_window(bq_client, pair, context.watermark_store(pair))
+        if window is None:
+            return {"name": name, "skip": ("NOOP", f"No staging rows newer than the {pair['watermark_column']} watermark")}
+        source_filter, target_filter, high = window
+    # Verification checks the original staging rows, also when a deduplicated copy is merged
+    verify = {"source_filter": source_filter, "target_filter": target_filter} if pair.get("verify") else None
+
+    metrics = {}
+    finishers = []
+    if fingerprint is not None:
+        metrics["rows_to_insert"] = _count_new_rows(bq_client, pair, unique_column, source_filter, target_filter)
+        logging.info(f"{name}: {metrics['rows_to_insert']} staging rows not yet in production")
+        if not metrics["rows_to_insert"]:
+            # Nothing to insert: remember this snapshot (and watermark) so the next run skips on metadata alone
+            _add_watermark(context, pair, SNAPSHOT_COLUMN, fingerprint, None, [])
+            if high is not None:
+                _add_watermark(context, pair, pair["watermark_column"], high, None, [])
+            return {"name": name, "skip": ("NOOP", "Every staging key is already in production")}
+        finishers.append(lambda jobs: _add_watermark(context, pair, SNAPSHOT_COLUMN, fingerprint, None, jobs))
+    if pair.get("dedup"):
+        metrics["duplicates_dropped"] = _count_duplicates(bq_client, dataset_id, pair["staging_table_id"], unique_column, source_filter)
+        logging.info(f"{name}: dropping {metrics['duplicates_dropped']} duplicate staging rows")
+    if pair.get("dedup") == "materialize":
+        # Deduplicate once up front; every chunk and planner query then reads the smaller table
+        dedup_table_id = _materialize_dedup(bq_client, pair, unique_column, source_filter)
+        pair = dict(pair, source_table_id=dedup_table_id)
+        source_filter = None
+        finishers.append(lambda jobs: bq_client.delete_table(dataset_id, dedup_table_id))
+
+    try:
+        statements = _merge_statements(bq_client, pair, unique_column, source_filter, target_filter)
+    except OverBudgetError as e:
+        return {"name": name, "skip": ("OVER_BUDGET", str(e))}
+    if not statements:
+        return {"name": name, "skip": ("NOOP", "No staging rows to merge")}
+
+    if pair.get("chunks"):
+        completed = context.completed_chunks(pair)
+        remaining = [s for s in statements if (staging_table, prod_table, s["label"]) not in completed]
+        if len(remaining) < len(statements):
+            logging.info(f"{name}: resuming run {pair['run_id']}, {len(statements) - len(remaining)} of {len(statements)} chunks already merged")
+        if not remaining:
+            return {"name": name, "skip": ("NOOP", f"All {len(statements)} chunks already merged in run {pair['run_id']}")}
+        statements = remaining
+
+    task = {"name": name, "queries": [s["query"] for s in statements], "parallel": bool(pair.get("parallel_chunks"))}
+    if metrics:
+        task["metrics"] = metrics
+    if verify is not None:
+        task["verify"] = verify
+    if pair.get("max_bytes"):
+        # Hard stop in case the dry-run estimate was optimistic
+        task["job_config"] = bigquery.QueryJobConfig(maximum_bytes_billed=int(pair["max_bytes"]))
+
+    if pair.get("chunks"):
+        checkpoints = context.checkpoint_store(pair)
+        labels = [s["label"] for s in statements]
+
+        def on_job(job, index):
+            checkpoints.mark_done(pair["run_id"], staging_table, prod_table, labels[index], job.num_dml_affected_rows)
+
+        task["on_job"] = on_job
+
+    if high is not None:
+        full_bytes_estimate = bq_client.dry_run(build_merge_query(dataset_id, pair["staging_table_id"], pair["prod_table_id"], unique_column))
+        finishers.append(lambda jobs: _add_watermark(context, pair, pair["watermark_column"], high, full_bytes_estimate, jobs))
+
+    if finishers:
+        task["on_done"] = lambda jobs: [finish(jobs) for finish in finishers]
+    return task
+
+def _add_watermark(context, pair, column, value, full_bytes_estimate, jobs):
+    dataset_id = pair["dataset_id"]
+    context.add_watermark(pair, {
+        "staging_table": f"{dataset_id}.{pair['staging_table_id']}",
+        "prod_table": f"{dataset_id}.{pair['prod_table_id']}",
+        "watermark_column": column,
+        "watermark": value,
+        "rows_inserted": sum(job.num_dml_affected_rows or 0 for job in jobs),
+        "bytes_processed": sum(job.total_bytes_processed or 0 for job in jobs),
+        "full_bytes_estimate": full_bytes_estimate,
+    })
+
+def _prepare_all(bq_client, table_pairs, workers, context):
+    # Pairs are prepared concurrently since each may cost metadata lookups, a MAX() query
+    # and dry runs before its first MERGE can be submitted.
+    context.load(table_pairs)
+
+    def prepare(pair):
+        try:
+            task = prepare_merge(bq_client, pair, context)
+        except (exceptions.GoogleAPIError, ValueError) as e:
+            logging.error(f"{pair_name(pair)}: failed to prepare merge: {e}")
+            task = {"name": pair_name(pair), "skip": ("FAILED", str(e))}
+        task.setdefault("labels", pair_labels(pair))
+        return task
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(prepare, table_pairs))
+
+def _staging_bytes(bq_client, pair):
+    # From the metadata cache, which prepare_merge already filled; unknown sizes are not packed
+    try:
+        return bq_client.get_table(pair["dataset_id"], pair["staging_table_id"]).num_bytes or 0
+    except exceptions.GoogleAPIError:
+        return float("inf")
+
+def _snapshot(bq_client, pair):
+    # Current metadata of both tables; None while streamed rows make it incomplete
+    tables = []
+    for table_id in (pair["staging_table_id"], pair["prod_table_id"]):
+        bq_client.invalidate_table(pair["dataset_id"], table_id)
+        table = bq_client.get_table(pair["dataset_id"], table_id)
+        if getattr(table, "streaming_buffer", None) is not None:
+            return None
+        tables.append(staging_fingerprint(table))
+    return "|".join(tables)
+
+def verify_pair(bq_client, pair, context, source_filter=None, target_filter=None):
+    """
+    Checks after a merge that every staging key of a pair is in production (see
+    ``merge_verifier.verify_merge``), unless neither table changed since it last passed.
+
+    Returns:
+        dict: The verification, with ``status`` ``OK``, ``MISSING``, ``CACHED`` or ``ERROR``.
+    """
+    name = pair_name(pair)
+    dataset_id = pair["dataset_id"]
+    try:
+        snapshot = _snapshot(bq_client, pair)
+        store = context.watermark_store(pair)
+        stored = store.get(f"{dataset_id}.{pair['staging_table_id']}", f"{dataset_id}.{pair['prod_table_id']}", VERIFIED_COLUMN)
+        if snapshot is not None and stored == snapshot:
+            logging.info(f"{name}: staging and production unchanged since they last verified, skipping the check")
+            return {"status": "CACHED"}
+        verification = verify_merge(bq_client, dataset_id, pair["staging_table_id"], pair["prod_table_id"],
+                                    pair.get("unique_column", "id"), source_filter=source_filter, target_filter=target_filter)
+    except (exceptions.GoogleAPIError, ValueError) as e:
+        logging.error(f"{name}: verification failed: {e}")
+        return {"status": "ERROR", "message": str(e)}
+    if verification["status"] == "OK" and snapshot is not None:
+        _add_watermark(context, pair, VERIFIED_COLUMN, snapshot, None, [])
+    return verification
+
+def _verify_results(bq_client, table_pairs, tasks, results, context, workers):
+    # Verifies the merged (or already up to date) pairs that asked for it, concurrently
+    tasks_by_name = {task["name"]: (pair, task) for pair, task in zip(table_pairs, tasks) if pair.get("verify")}
+    checked = [result for result in results if result["name"] in tasks_by_name and result["status"] in ("DONE", "NOOP")]
+    if not checked:
+        return
+
+    def verify(result):
+        pair, task = tasks_by_name[result["name"]]
+        filters = task.get("verify", {})
+        return verify_pair(bq_client, pair, context, filters.get("source_filter"), filters.get("target_filter"))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        verifications = list(pool.map(verify, checked))
+    for result, verification in zip(checked, verifications):
+        result["verification"] = verification
+        if verification["status"] == "MISSING":
+            result["status"] = "UNVERIFIED"
+            result["message"] = f"{verification['missing_keys']} of {verification['staging_keys']} staging keys are missing from production"
+            logging.error(f"{result['name']}: {result['message']}")
+
+def merge_many(bq_client, table_pairs, max_in_flight=DEFAULT_MAX_IN_FLIGHT, timeout=None, metrics=None,
+               attempts=DEFAULT_ATTEMPTS, limiter=None, pack_size=None, pack_max_bytes=DEFAULT_PACK_MAX_BYTES):
+    """
+    Merges many staging/prod pairs concurrently through one client.
+
+    Args:
+        bq_client (BigQueryClient): The client shared by every merge.
+        table_pairs (list): Pair dicts as accepted by ``prepare_merge``.
+        max_in_flight (int): Maximum number of MERGE jobs running at once.
+        timeout (float, optional): Per-pair limit in seconds.
+        metrics (MergeMetrics, optional): Collects the timing and cost of every job.
+        attempts (int): Submissions of each MERGE before a transient failure is final.
+        limiter (AdaptiveLimiter, optional): Shrinks the jobs in flight when BigQuery throttles.
+        pack_size (int, optional): Run up to this many single-statement merges as one
+                                   transactional script job (see ``MergePacker``).
+        pack_max_bytes (int): Only pack merges whose staging table is at most this large.
+
+    Returns:
+        list: One result dict per pair (see ``MergeScheduler.run``). Pairs with ``verify`` set
+              also get a ``verification`` (see ``verify_pair``); those with staging keys
+              missing from production are reported as ``UNVERIFIED``.
+    """
+    run_id = new_run_id()
+    table_pairs = [dict(pair, run_id=pair.get("run_id") or run_id) if pair.get("chunks") else pair for pair in table_pairs]
+    context = MergeContext(bq_client)
+    tasks = _prepare_all(bq_client, table_pairs, max_in_flight, context)
+
+    scheduler = MergeScheduler(bq_client, max_in_flight=max_in_flight, timeout=timeout, metrics=metrics,
+                               attempts=attempts, limiter=limiter)
+    if pack_size and pack_size > 1:
+        packer = MergePacker(bq_client, pack_size=pack_size, metrics=metrics)
+        small = [packable(task) and _staging_bytes(bq_client, pair) <= pack_max_bytes for pair, task in zip(table_pairs, tasks)]
+        results = packer.unpack(scheduler.run(packer.pack(tasks, eligible=small)), scheduler)
+    else:
+        results = scheduler.run(tasks)
+
+    _verify_results(bq_client, table_pairs, tasks, results, context, max_in_flight)
+    context.finish()
+    return results
+
+def merge(bq_client,dataset_id, staging_table_id, prod_table_id,unique_column ="id", timeout=None, metrics=None, **options):
+    """
+    Merges a single staging/prod pair and waits for it.
+
+    ``options`` are the optional pair settings accepted by ``prepare_merge``. Chunks run one
+    after another here; use ``merge_many`` to run them in parallel. ``metrics`` (a
+    ``MergeMetrics``) collects the timing and cost of every job.
+
+    Returns:
+        google.cloud.bigquery.job.QueryJob: The last merge job, or None if nothing ran or a job failed.
+    """
+    pair = dict(options, dataset_id=dataset_id, staging_table_id=staging_table_id, prod_table_id=prod_table_id, unique_column=unique_column)
+    if pair.get("chunks"):
+        pair.setdefault("run_id", new_run_id())
+    context = MergeContext(bq_client)
+    # query_and_wait polls with exponential backoff, so a long merge costs a handful of polls,
+    # and resubmits jobs that failed on rate limits, DML conflicts or backend errors
+    jobs = []
+    try:
+        (task,) = _prepare_all(bq_client, [pair], 1, context)
+        if "skip" in task:
+            logging.info(f"{task['name']}: {task['skip'][0]}: {task['skip'][1]}")
+            if metrics is not None:
+                metrics.record_skip(task, *task["skip"])
+            return None
+
+        for index, query in enumerate(task["queries"]):
+            started = time.monotonic()
+            query_job = bq_client.query_and_wait(query, timeout=timeout, job_config=task.get("job_config"))
+            if query_job is None:
+                return None
+            if metrics is not None:
+                metrics.record_job(task, query_job, wall_s=time.monotonic() - started)
+            jobs.append(query_job)
+            if "on_job" in task:
+                task["on_job"](query_job, index)
+
         logging.info(f"Inserted records from {staging_table_id} into {prod_table_id} without duplicates")
-    return query_job
+        if "on_done" in task:
+            task["on_done"](jobs)
+        if pair.get("verify"):
+            filters = task.get("verify", {})
+            verification = verify_pair(bq_client, pair, context, filters.get("source_filter"), filters.get("target_filter"))
+            if verification["status"] == "MISSING":
+                logging.error(f"{task['name']}: {verification['missing_keys']} staging keys are missing from production")
+                return None
+    finally:
+        context.finish()
+    return jobs[-1]
+
+def parse_table_pairs(dataset_id, tables):
+    # Each entry is "staging_table:prod_table"
+    pairs = []
+    for entry in tables:
+        staging_table_id, sep, prod_table_id = entry.partition(":")
+        if not sep or not staging_table_id or not prod_table_id:
+            raise ValueError(f"Expected STAGING:PROD, got '{entry}'")
+        pairs.append({"dataset_id": dataset_id, "staging_table_id": staging_table_id, "prod_table_id": prod_table_id})
+    return pairs
+
+def load_manifest(path, dataset_id=None):
+    """
+    Reads a JSON manifest of table pairs.
+
+    The file holds a list of objects with ``staging_table_id``, ``prod_table_id`` and optionally
+    ``dataset_id`` (defaults to ``--dataset_id``) and ``unique_column``.
+    """
+    with open(path, "r") as file:
+        entries = json.load(file)
+    return [normalize_pair(entry, dataset_id) for entry in entries]
+
+def normalize_pair(entry, dataset_id=None):
+    # A manifest or request entry as a pair dict, with dataset_id defaulted and the table IDs checked
+    if not isinstance(entry, dict):
+        raise ValueError(f"Expected an object with staging_table_id and prod_table_id, got: {entry}")
+    pair = dict(entry)
+    pair.setdefault("dataset_id", dataset_id)
+    if not pair.get("dataset_id") or not pair.get("staging_table_id") or not pair.get("prod_table_id"):
+        raise ValueError(f"Entry is missing dataset_id, staging_table_id or prod_table_id: {entry}")
+    return pair
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Insert records from staging table to production table without duplicates.")
-    parser.add_argument("--dataset_id", required=True, help="The dataset ID.")
-    parser.add_argument("--staging_table_id", required=True, help="The staging table ID.")
-    parser.add_argument("--prod_table_id", required=True, help="The production table ID.")
+    parser.add_argument("--dataset_id", help="The dataset ID.")
+    parser.add_argument("--staging_table_id", help="The staging table ID.")
+    parser.add_argument("--prod_table_id", help="The production table ID.")
+    parser.add_argument("--tables", nargs="+", metavar="STAGING:PROD", help="Merge several staging/prod pairs in --dataset_id from one process.")
+    parser.add_argument("--manifest", help="Path to a JSON list of table pairs to merge from one process.")
+    parser.add_argument("--max_in_flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Maximum number of concurrent MERGE jobs; lowered automatically while BigQuery rate-limits.")
+    parser.add_argument("--pack_size", type=int, help="Merge up to this many small tables per job, as one multi-statement transaction; tables of a failed pack are retried one job each.")
+    parser.add_argument("--pack_max_bytes", type=int, default=DEFAULT_PACK_MAX_BYTES, help="Only pack tables whose staging table is at most this many bytes.")
+    parser.add_argument("--attempts", type=int, default=DEFAULT_ATTEMPTS, help="Submissions of each MERGE before a rate-limit, DML conflict or backend error is final.")
+    parser.add_argument("--report", help="Write the per-table results to this JSON file.")
     parser.add_argument('--local', action='store_true', help='Run the script locally with credentials path')
+    parser.add_argument("--local_db", help="Merge tables in this SQLite database instead of BigQuery, for development and benchmarks.")
+    parser.add_argument("--timeout", type=float, default=None, help="Maximum number of seconds to wait for each merge job.")
+    parser.add_argument("--watermark_column", help="Merge incrementally: only staging rows newer than the last recorded value of this ingestion-time or monotonic column.")
+    parser.add_argument("--lookback", type=int, default=DEFAULT_LOOKBACK, help="Window below the watermark re-checked on both sides of an incremental merge (days for date/time columns, units for numeric ones).")
+    parser.add_argument("--unique_column", default="id", help="Merge key column; comma-separated for a composite key.")
+    parser.add_argument("--dedup", choices=["inline", "materialize"], help="Keep one staging row per key, either inside the MERGE's USING subquery or via a temporary deduplicated table.")
+    parser.add_argument("--dedup_order_by", help="Tie-break for --dedup, e.g. 'ingested_at DESC'; the first row in this order is kept.")
+    parser.add_argument("--plan", action="store_true", help="Inspect partitioning/clustering, restrict the production side to the staging partitions and dry-run every MERGE first.")
+    parser.add_argument("--max_bytes", type=int, help="Refuse (or split, see --over_budget) merges estimated to scan more bytes than this. Implies --plan.")
+    parser.add_argument("--over_budget", choices=["refuse", "split"], default="refuse", help="What to do with a merge over --max_bytes.")
+    parser.add_argument("--chunks", type=int, help="Split each merge into this many chunks, each its own job, checkpointed so a failed run can resume.")
+    parser.add_argument("--chunk_by", choices=["hash", "partition"], default="hash", help="Chunk by a fingerprint of the unique column or by contiguous staging partition ranges.")
+    parser.add_argument("--parallel_chunks", action="store_true", help="Run the chunks of a table concurrently (within --max_in_flight) instead of one after another.")
+    parser.add_argument("--run_id", help="Resume the chunked run with this ID, skipping chunks it already completed. A new ID is generated and logged if omitted.")
+    parser.add_argument("--checkpoint_table", help=f"DATASET.TABLE holding chunk checkpoints (default: <dataset_id>.{DEFAULT_CHECKPOINT_TABLE}).")
+    parser.add_argument("--state_table", help=f"DATASET.TABLE holding incremental watermarks (default: <dataset_id>.{DEFAULT_STATE_TABLE}).")
+    parser.add_argument("--skip_unchanged", action="store_true", help="Skip merges whose staging table is empty or unchanged since its last merge (by table metadata), and count the rows to insert with an anti-join first, skipping when there are none.")
+    parser.add_argument("--verify", action="store_true", help="After merging, count the staging keys missing from production with a key-only semi-join; skipped while neither table changed since the last passing check.")
+    parser.add_argument("--metrics_file", help="Write per-table job metrics (time, bytes, slot ms, rows) to this OpenMetrics text file.")
+    parser.add_argument("--metrics_table", help="Append per-job metrics to this DATASET.TABLE for trend analysis.")
 
     args = parser.parse_args()
+    batch_mode = bool(args.tables or args.manifest)
+    if args.tables and not args.dataset_id:
+        parser.error("--tables requires --dataset_id")
+    if not batch_mode and not (args.dataset_id and args.staging_table_id and args.prod_table_id):
+        parser.error("--dataset_id, --staging_table_id and --prod_table_id are required unless --tables or --manifest is given")
+
+    table_pairs = []
+    try:
+        if args.tables:
+            table_pairs.extend(parse_table_pairs(args.dataset_id, args.tables))
+        if args.manifest:
+            table_pairs.extend(load_manifest(args.manifest, args.dataset_id))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not batch_mode:
+        table_pairs.append({"dataset_id": args.dataset_id, "staging_table_id": args.staging_table_id, "prod_table_id": args.prod_table_id})
+
+    run_id = args.run_id or new_run_id()
+
+    # Command line options are defaults; manifest entries may override them per table
+    for pair in table_pairs:
+        pair.setdefault("unique_column", args.unique_column)
+        pair.setdefault("dedup", args.dedup)
+        pair.setdefault("dedup_order_by", args.dedup_order_by)
+        pair.setdefault("watermark_column", args.watermark_column)
+        pair.setdefault("lookback", args.lookback)
+        pair.setdefault("state_table", args.state_table)
+        pair.setdefault("plan", args.plan)
+        pair.setdefault("max_bytes", args.max_bytes)
+        pair.setdefault("over_budget", args.over_budget)
+        pair.setdefault("chunks", args.chunks)
+        pair.setdefault("chunk_by", args.chunk_by)
+        pair.setdefault("parallel_chunks", args.parallel_chunks)
+        pair.setdefault("run_id", run_id)
+        pair.setdefault("checkpoint_table", args.checkpoint_table)
+        pair.setdefault("skip_unchanged", args.skip_unchanged)
+        pair.setdefault("verify", args.verify)
 
     project_id = os.getenv('GCP_PROJECT_ID', 'smart-axis-421517')
     # logging.info(f"I wonder if the ARg parser is killing it...")
@@ -59,10 +710,26 @@ if __name__ == "__main__":
     if args.local:
         credentials_path = os.getenv('GCP_CREDENTIALS_PATH', 'secret.json')
 
-    bq_client = initialize_bq_client(project_id, credentials_path)
+    bq_client = initialize_bq_client(project_id, credentials_path, args.local_db)
 
     logging.info(f"Initalized BQClient")
+    if any(pair.get("chunks") for pair in table_pairs):
+        logging.info(f"Chunked run ID: {run_id} (pass --run_id {run_id} to resume it)")
 
 
-    merge_query_job = merge(bq_client, args.dataset_id, args.staging_table_id, args.prod_table_id)
-    logging.info(f"Merge Query Job ID: {merge_query_job.job_id}")
+    metrics = MergeMetrics(run_id)
+    results = merge_many(bq_client, table_pairs, max_in_flight=args.max_in_flight, timeout=args.timeout, metrics=metrics,
+                         attempts=args.attempts, pack_size=args.pack_size, pack_max_bytes=args.pack_max_bytes)
+    if args.metrics_file:
+        metrics.write_openmetrics(args.metrics_file)
+    if args.metrics_table:
+        try:
+            MetricsHistoryStore(bq_client, args.metrics_table).record(metrics.records)
+        except exceptions.GoogleAPIError as e:
+            logging.error(f"Could not append metrics to {args.metrics_table}: {e}")
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump(results, file, indent=2)
+    failed = [r for r in results if r["status"] not in ("DONE", "NOOP")]
+    logging.info(f"Merged {len(results) - len(failed)} of {len(results)} table pairs")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,237 @@
+import datetime
+import logging
+import os
+import tempfile
+import threading
+from gcputils.lazy import lazy_import
+
+bigquery = lazy_import("google.cloud.bigquery")
+
+
+# Columns of the history table, in the order records are written
+_HISTORY_COLUMNS = [
+    ("run_id", "STRING"),
+    ("pair", "STRING"),
+    ("dataset", "STRING"),
+    ("staging_table", "STRING"),
+    ("prod_table", "STRING"),
+    ("status", "STRING"),
+    ("job_id", "STRING"),
+    ("statement_type", "STRING"),
+    ("submit_s", "FLOAT"),
+    ("queue_s", "FLOAT"),
+    ("run_s", "FLOAT"),
+    ("total_s", "FLOAT"),
+    ("wall_s", "FLOAT"),
+    ("total_bytes_processed", "INTEGER"),
+    ("total_bytes_billed", "INTEGER"),
+    ("total_slot_ms", "INTEGER"),
+    ("num_dml_affected_rows", "INTEGER"),
+    ("cache_hit", "BOOLEAN"),
+    ("message", "STRING"),
+    # Merges run by a packed script job; set on the script's own record, whose statistics
+    # include those of the child jobs recorded per pair
+    ("packed", "INTEGER"),
+    ("recorded_at", "TIMESTAMP"),
+]
+
+# Per-pair counters of the OpenMetrics file: metric name, help text and the record field summed
+_COUNTERS = [
+    ("prodifier_merge_jobs", "Merge jobs run.", None),
+    ("prodifier_merge_bytes_processed", "Bytes processed by merge jobs.", "total_bytes_processed"),
+    ("prodifier_merge_bytes_billed", "Bytes billed for merge jobs.", "total_bytes_billed"),
+    ("prodifier_merge_slot_milliseconds", "Slot milliseconds consumed by merge jobs.", "total_slot_ms"),
+    ("prodifier_merge_rows_inserted", "Rows inserted by merge jobs.", "num_dml_affected_rows"),
+    ("prodifier_merge_cache_hits", "Merge jobs answered from the query cache.", "cache_hit"),
+]
+_PHASES = ["submit", "queue", "run", "total"]
+
+
+def history_schema():
+    return [bigquery.SchemaField(name, field_type) for name, field_type in _HISTORY_COLUMNS]
+
+
+def _seconds(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds(), 3)
+
+
+def job_record(job, submit_s=None, wall_s=None):
+    """
+    Extracts the timing and cost statistics of a finished query job.
+
+    ``queue_s`` is the time between creation and the start of execution, ``run_s`` the
+    execution itself and ``total_s`` both, as reported by BigQuery; ``submit_s`` and
+    ``wall_s`` are measured by the caller around the insert request and the whole job.
+    """
+    return {
+        "job_id": job.job_id,
+        "statement_type": getattr(job, "statement_type", None),
+        "status": "FAILED" if job.error_result else "DONE",
+        "submit_s": None if submit_s is None else round(submit_s, 3),
+        "queue_s": _seconds(job.created, job.started),
+        "run_s": _seconds(job.started, job.ended),
+        "total_s": _seconds(job.created, job.ended),
+        "wall_s": None if wall_s is None else round(wall_s, 3),
+        "total_bytes_processed": job.total_bytes_processed,
+        "total_bytes_billed": job.total_bytes_billed,
+        "total_slot_ms": job.slot_millis,
+        "num_dml_affected_rows": job.num_dml_affected_rows,
+        "cache_hit": job.cache_hit,
+        "message": str(job.errors or job.error_result) if job.error_result else None,
+    }
+
+
+class MergeMetrics:
+    def __init__(self, run_id=None):
+        """
+        Collects per-job statistics of a merge run.
+
+        Each record is logged as it arrives, as a structured entry (``json_fields``, which the
+        Cloud Logging handlers turn into a JSON payload), and the collection can afterwards be
+        written as an OpenMetrics text file or appended to a BigQuery history table.
+
+        Args:
+            run_id (str, optional): Recorded with every entry to group the jobs of one run.
+        """
+        self.run_id = run_id
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record_job(self, task, job, submit_s=None, wall_s=None):
+        """
+        Records a finished job of a scheduler task.
+
+        Returns:
+            dict: The record.
+        """
+        record = self._record(task, **job_record(job, submit_s=submit_s, wall_s=wall_s))
+        logging.info(
+            f"{task['name']}: job {job.job_id} {record['status']} in {record['total_s']}s "
+            f"(queued {record['queue_s']}s), {record['total_bytes_processed']} bytes, "
+            f"{record['total_slot_ms']} slot ms, {record['num_dml_affected_rows']} rows",
+            extra={"json_fields": record},
+        )
+        return record
+
+    def record_skip(self, task, status, message):
+        """
+        Records a task that ran no job, e.g. because there was nothing to merge.
+        """
+        return self._record(task, status=status, message=message)
+
+    def _record(self, task, **fields):
+        record = {name: None for name, _ in _HISTORY_COLUMNS}
+        record.update(task.get("labels", {}))
+        record.update(fields, run_id=self.run_id, pair=task["name"],
+                      recorded_at=datetime.datetime.now(datetime.timezone.utc).isoformat())
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def summary(self):
+        """
+        Totals per pair.
+
+        Returns:
+            dict: ``pair`` to a dict of job and skip counts and summed statistics.
+        """
+        totals = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            labels = {key: record[key] for key in ("dataset", "staging_table", "prod_table")}
+            if record["packed"]:
+                # Script jobs are counted under their own series, apart from the pairs they ran
+                labels.update(pack=record["pair"], packed=record["packed"])
+            pair = totals.setdefault(record["pair"], {
+                "labels": labels,
+                "jobs": {}, "skips": {}, "seconds": dict.fromkeys(_PHASES, 0.0),
+                **{field: 0 for _, _, field in _COUNTERS if field},
+            })
+            if record["job_id"] is None:
+                pair["skips"][record["status"]] = pair["skips"].get(record["status"], 0) + 1
+                continue
+            pair["jobs"][record["status"]] = pair["jobs"].get(record["status"], 0) + 1
+            for _, _, field in _COUNTERS:
+                if field:
+                    pair[field] += int(record[field] or 0)
+            for phase in _PHASES:
+                pair["seconds"][phase] += record[f"{phase}_s"] or 0.0
+        return totals
+
+    def write_openmetrics(self, path):
+        """
+        Writes the per-pair totals as an OpenMetrics text file, e.g. for the node exporter's
+        textfile collector. The file is replaced atomically.
+        """
+        lines = []
+        summary = self.summary()
+        for name, help_text, field in _COUNTERS:
+            lines += [f"# TYPE {name} counter", f"# HELP {name} {help_text}"]
+            for pair in summary.values():
+                if field is None:
+                    for status, count in sorted(pair["jobs"].items()):
+                        lines.append(f"{name}_total{_labels(pair['labels'], status=status)} {count}")
+                else:
+                    lines.append(f"{name}_total{_labels(pair['labels'])} {pair[field]}")
+        lines += ["# TYPE prodifier_merge_seconds counter", "# HELP prodifier_merge_seconds Time spent in each phase of merge jobs."]
+        for pair in summary.values():
+            for phase in _PHASES:
+                lines.append(f"prodifier_merge_seconds_total{_labels(pair['labels'], phase=phase)} {round(pair['seconds'][phase], 3)}")
+        lines += ["# TYPE prodifier_merge_skips counter", "# HELP prodifier_merge_skips Merges that ran no job, by status."]
+        for pair in summary.values():
+            for status, count in sorted(pair["skips"].items()):
+                lines.append(f"prodifier_merge_skips_total{_labels(pair['labels'], status=status)} {count}")
+        lines += ["# TYPE prodifier_merge_last_run_timestamp_seconds gauge",
+                  "# HELP prodifier_merge_last_run_timestamp_seconds When these metrics were written.",
+                  f"prodifier_merge_last_run_timestamp_seconds {datetime.datetime.now(datetime.timezone.utc).timestamp():.3f}",
+                  "# EOF"]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(file.name, path)
+        logging.info(f"Wrote metrics of {len(summary)} pairs to {path}")
+
+
+def _labels(labels, **extra):
+    values = {**{key: value for key, value in labels.items() if value is not None}, **extra}
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in values.items()) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsHistoryStore:
+    def __init__(self, bq_client, history_table):
+        """
+        Appends merge metrics to a BigQuery table for trend analysis.
+
+        Records are written with a load job, which is free and does not count against DML
+        quotas, rather than with an INSERT.
+
+        Args:
+            bq_client (BigQueryClient): The client used to create and load the table.
+            history_table (str): The history table as ``dataset.table``.
+        """
+        self.bq_client = bq_client
+        self.history_table = history_table
+
+    def ensure_table(self):
+        dataset_id, table_id = self.history_table.split(".", 1)
+        if not self.bq_client.table_exists(dataset_id, table_id):
+            self.bq_client.create_table(dataset_id, table_id, history_schema())
+        else:
+            # History tables created by earlier versions lack the newer columns
+            self.bq_client.add_columns(dataset_id, table_id, history_schema())
+
+    def record(self, records):
+        if not records:
+            return
+        self.ensure_table()
+        dataset_id, table_id = self.history_table.split(".", 1)
+        self.bq_client.load_json_stream(dataset_id, table_id, records, history_schema())
+        logging.info(f"Appended {len(records)} metric records to {self.history_table}")
@@ -0,0 +1,157 @@
+import logging
+
+
+# Merges per script job. A script pays the job overhead (submission, queueing, polling) once
+# for all of its statements, but holds its transaction's table locks until it commits.
+DEFAULT_PACK_SIZE = 10
+
+# Staging tables larger than this keep a job of their own: packing only pays off when the
+# per-job overhead dominates, and a big merge would hold up the rest of its script
+DEFAULT_PACK_MAX_BYTES = 1024 ** 3
+
+# Child jobs of the transaction control statements, as BigQuery and the local backend name them
+_CONTROL_STATEMENTS = {"BEGIN", "BEGIN_TRANSACTION", "COMMIT", "COMMIT_TRANSACTION"}
+
+
+def build_script(queries, transaction=True):
+    """
+    Joins statements into one multi-statement script.
+
+    Args:
+        queries (list): The statements, with or without a trailing semicolon.
+        transaction (bool): Wrap them in ``BEGIN TRANSACTION ... COMMIT TRANSACTION``, so the
+                            script applies all of them or, if one fails, none.
+
+    Returns:
+        str: The script.
+    """
+    body = ";\n".join(query.strip().rstrip(";") for query in queries) + ";"
+    if not transaction:
+        return body
+    return f"BEGIN TRANSACTION;\n{body}\nCOMMIT TRANSACTION;"
+
+
+def packable(task):
+    """
+    Whether a scheduler task can share a script job: a single statement without its own
+    job configuration (e.g. a byte cap) or per-job callback (e.g. chunk checkpoints).
+    """
+    if "skip" in task or task.get("job_config") is not None or "on_job" in task:
+        return False
+    return len(task["queries"] if "queries" in task else [task["query"]]) == 1
+
+
+class MergePacker:
+    def __init__(self, bq_client, pack_size=DEFAULT_PACK_SIZE, transaction=True, metrics=None):
+        """
+        Packs single-statement merge tasks into multi-statement script jobs.
+
+        ``pack`` replaces groups of up to ``pack_size`` packable tasks with one script task each;
+        once the scheduler ran them, ``unpack`` turns every script's result back into one
+        result per merge, with the rows affected by its own statement (read from the script's
+        child jobs). The tasks of a script that failed are run again as individual jobs, so
+        one bad table costs its pack a second round rather than failing it. Re-running is
+        safe: in a transaction a failed script changes nothing, and without one the merges
+        that did run only insert keys missing from production, so they insert nothing again.
+
+        Args:
+            bq_client (BigQueryClient): The client used to list the child jobs of scripts.
+            pack_size (int): Maximum number of merges per script.
+            transaction (bool): Run each script as one transaction.
+            metrics (MergeMetrics, optional): Receives the child job of every packed merge. The
+                                              script job itself is recorded by the scheduler,
+                                              labelled ``packed`` with its number of merges.
+        """
+        if pack_size < 2:
+            raise ValueError("pack_size must be at least 2")
+        self.bq_client = bq_client
+        self.pack_size = pack_size
+        self.transaction = transaction
+        self.metrics = metrics
+        self._packs = {}
+
+    def pack(self, tasks, eligible=None):
+        """
+        Returns the tasks to schedule, with the packable ones grouped into script tasks.
+
+        Args:
+            tasks (list): Scheduler tasks.
+            eligible (list, optional): One flag per task; tasks flagged False are never packed.
+        """
+        eligible = eligible or [True] * len(tasks)
+        candidates = [task for task, ok in zip(tasks, eligible) if ok and packable(task)]
+        if len(candidates) < 2:
+            return list(tasks)
+        packed_ids = {id(task) for task in candidates}
+        scheduled = [task for task in tasks if id(task) not in packed_ids]
+        for start in range(0, len(candidates), self.pack_size):
+            members = candidates[start:start + self.pack_size]
+            if len(members) == 1:
+                scheduled.append(members[0])
+                continue
+            scheduled.append(self._pack_task(members))
+        logging.info(f"Packed {len(candidates)} merges into {len(self._packs)} script jobs of up to {self.pack_size}")
+        return scheduled
+
+    def _pack_task(self, members):
+        name = f"pack {len(self._packs) + 1} ({members[0]['name']} and {len(members) - 1} more)"
+        pack = {"members": members, "children": None}
+        self._packs[name] = pack
+        queries = [member["queries"][0] if "queries" in member else member["query"] for member in members]
+        datasets = {member.get("labels", {}).get("dataset") for member in members}
+        return {
+            "name": name,
+            "query": build_script(queries, self.transaction),
+            "on_done": lambda jobs: self._finish(pack, jobs[-1]),
+            # Its statistics include those of the child jobs recorded per member in _finish
+            "labels": {"dataset": datasets.pop() if len(datasets) == 1 else None, "packed": len(members)},
+        }
+
+    def _finish(self, pack, job):
+        children = [child for child in self.bq_client.script_child_jobs(job)
+                    if (child.statement_type or "").upper() not in _CONTROL_STATEMENTS]
+        if len(children) != len(pack["members"]):
+            logging.warning(f"Script job {job.job_id} ran {len(children)} statements for {len(pack['members'])} merges; "
+                            "row counts of its merges are unknown")
+            children = [None] * len(pack["members"])
+        pack["children"] = children
+        for member, child in zip(pack["members"], children):
+            if child is not None and self.metrics is not None:
+                self.metrics.record_job(member, child)
+            if "on_done" in member:
+                member["on_done"]([child] if child is not None else [])
+
+    def unpack(self, results, scheduler):
+        """
+        Expands the results of script tasks into one result per packed merge, running the
+        merges of failed scripts again one job each through ``scheduler``.
+
+        Returns:
+            list: The results, as returned by ``MergeScheduler.run``.
+        """
+        expanded, fallback = [], []
+        for result in results:
+            pack = self._packs.get(result["name"])
+            if pack is None:
+                expanded.append(result)
+            elif result["status"] == "DONE":
+                for member, child in zip(pack["members"], pack["children"]):
+                    expanded.append({
+                        "name": member["name"],
+                        "status": "DONE",
+                        "job_ids": result["job_ids"] + ([child.job_id] if child is not None else []),
+                        "latency_s": result["latency_s"],
+                        "rows_affected": child.num_dml_affected_rows if child is not None else None,
+                        "message": None,
+                        "retries": result["retries"],
+                        "metrics": dict(member.get("metrics", {}), packed_with=len(pack["members"]) - 1),
+                    })
+            elif result["status"] == "FAILED":
+                logging.warning(f"{result['name']} failed, merging its {len(pack['members'])} tables one job each: {result['message']}")
+                fallback.extend(pack["members"])
+            else:
+                for member in pack["members"]:
+                    expanded.append(dict(result, name=member["name"], rows_affected=None, metrics=dict(member.get("metrics", {}))))
+        if fallback:
+            expanded.extend(scheduler.run(fallback))
+        return expanded
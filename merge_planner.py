@@ -0,0 +1,267 @@
+import logging
+from watermark import watermark_literal
+
+
+class OverBudgetError(Exception):
+    """Raised when a merge cannot be planned within the configured byte budget."""
+
+
+def partition_layout(table):
+    """
+    Describes how a table is partitioned.
+
+    Only column-partitioned tables are returned: rows of an ingestion-time partitioned table
+    land in the partition of their load time, which says nothing about where a key lives.
+
+    Args:
+        table (google.cloud.bigquery.Table): The table to inspect.
+
+    Returns:
+        dict: ``field``, ``field_type`` and ``bucket`` (a SQL template grouping a value into its
+              partition, with ``{column}`` as placeholder), or None if the table is not
+              partitioned on a column.
+    """
+    types = {field.name: field.field_type for field in table.schema}
+    if table.time_partitioning is not None and table.time_partitioning.field:
+        field = table.time_partitioning.field
+        field_type = types[field]
+        unit = table.time_partitioning.type_ or "DAY"
+        if field_type == "DATE" and unit == "DAY":
+            bucket = "{column}"
+        else:
+            bucket = f"{field_type}_TRUNC({{column}}, {unit})"
+        return {"field": field, "field_type": field_type, "bucket": bucket}
+    if table.range_partitioning is not None:
+        field = table.range_partitioning.field
+        partition_range = table.range_partitioning.range_
+        bucket = f"DIV({{column}} - {partition_range.start}, {partition_range.interval})"
+        return {"field": field, "field_type": types[field], "bucket": bucket}
+    return None
+
+
+def key_columns(unique_column):
+    """
+    Normalizes a merge key given as a column name, a comma-separated string or a list.
+
+    Returns:
+        list: The key column names.
+    """
+    if isinstance(unique_column, str):
+        unique_column = unique_column.split(",")
+    columns = [column.strip() for column in unique_column if column.strip()]
+    if not columns:
+        raise ValueError("At least one unique column is required")
+    return columns
+
+
+def key_expression(unique_column, alias=""):
+    """
+    Returns a STRING expression identifying a row's key, equal for equal keys on both sides.
+    """
+    columns = key_columns(unique_column)
+    if len(columns) == 1:
+        return f"CAST({alias}{columns[0]} AS STRING)"
+    return f"TO_JSON_STRING(STRUCT({', '.join(f'{alias}{column} AS {column}' for column in columns)}))"
+
+
+def and_filters(*filters):
+    """
+    Joins the given SQL predicates with AND, ignoring empty ones.
+    """
+    filters = [f"({f})" for f in filters if f]
+    return " AND ".join(filters) if filters else None
+
+
+class MergePlanner:
+    def __init__(self, bq_client, max_bytes=None, split=False):
+        """
+        Plans MERGE statements that let BigQuery prune the production table.
+
+        The planner reads both tables' partitioning and clustering, measures which partitions
+        the staging rows fall into, and restricts the production side of the MERGE to the same
+        partition range. When the (leading) key column is the first clustering column of production,
+        the key range of the staging rows is added as well so block pruning applies. Every
+        statement is dry-run to estimate the bytes it will scan.
+
+        Partition pruning assumes a key always carries the same partitioning value in staging
+        and production, which holds when production rows are only ever copied from staging.
+
+        Args:
+            bq_client (BigQueryClient): The client used for metadata lookups and dry runs.
+            max_bytes (int, optional): Maximum estimated bytes a single statement may scan.
+            split (bool): Split a merge over budget into per-partition-range statements instead
+                          of refusing it.
+        """
+        self.bq_client = bq_client
+        self.max_bytes = max_bytes
+        self.split = split
+
+    def plan(self, dataset_id, staging_table_id, prod_table_id, unique_column="id", source_filter=None, target_filter=None, build_query=None, chunks=None):
+        """
+        Builds the statements for one merge.
+
+        Args:
+            dataset_id (str): The dataset of both tables.
+            staging_table_id (str): The staging table ID.
+            prod_table_id (str): The production table ID.
+            unique_column (str or list): The merge key.
+            source_filter (str, optional): Extra predicate on staging rows.
+            target_filter (str, optional): Extra predicate on production rows (over ``T.``).
+            build_query (callable): ``build_merge_query`` compatible function rendering a statement.
+            chunks (int, optional): Split the staging partitions into this many contiguous ranges,
+                                    one statement each. Production must be partitioned on a column.
+
+        Returns:
+            list: Dicts with the ``query``, its ``estimated_bytes`` and a ``label`` naming the
+                  partition range it covers; empty if staging holds no matching rows.
+
+        Raises:
+            OverBudgetError: If a statement exceeds ``max_bytes`` and cannot be split further.
+            ValueError: If ``chunks`` is given but production is not partitioned on a column.
+        """
+        prod = self.bq_client.get_table(dataset_id, prod_table_id)
+        layout = partition_layout(prod)
+        if chunks and layout is None:
+            raise ValueError(f"Cannot chunk by partition: {dataset_id}.{prod_table_id} is not partitioned on a column")
+        # Only the leading key column can narrow a clustered scan
+        lead_key = key_columns(unique_column)[0]
+        key_clustered = bool(prod.clustering_fields) and prod.clustering_fields[0] == lead_key
+
+        if layout is None and not key_clustered:
+            query = build_query(dataset_id, staging_table_id, prod_table_id, unique_column,
+                                source_filter=source_filter, target_filter=target_filter)
+            return self._check([{"query": query, "estimated_bytes": self._estimate(query), "label": "all"}], dataset_id, prod_table_id)
+
+        buckets = self._staging_buckets(dataset_id, staging_table_id, lead_key, layout, source_filter)
+        if not buckets:
+            return []
+
+        key_type = next(field.field_type for field in prod.schema if field.name == lead_key) if key_clustered else None
+
+        def render(piece):
+            piece_source = source_filter
+            if layout is not None:
+                piece_source = and_filters(piece_source, self._range_predicate("", layout, piece))
+            piece_target = and_filters(target_filter, self._target_predicate(layout, lead_key, key_type, piece))
+            query = build_query(dataset_id, staging_table_id, prod_table_id, unique_column,
+                                source_filter=piece_source, target_filter=piece_target)
+            return {"query": query, "estimated_bytes": self._estimate(query), "label": self._label(piece)}
+
+        if layout is None:
+            return self._check([render(self._combine(buckets))], dataset_id, prod_table_id)
+
+        groups = [buckets]
+        if chunks and chunks > 1:
+            size, extra = divmod(len(buckets), min(chunks, len(buckets)))
+            groups, start = [], 0
+            for i in range(min(chunks, len(buckets))):
+                end = start + size + (1 if i < extra else 0)
+                groups.append(buckets[start:end])
+                start = end
+
+        statements = []
+        for group in groups:
+            statements.extend(self._fit(group, render) if self.split else [render(self._combine(group))])
+        return self._check(statements, dataset_id, prod_table_id)
+
+    def target_filter(self, dataset_id, staging_table_id, prod_table_id, unique_column="id", source_filter=None):
+        """
+        Returns a predicate over production rows (``T.``) covering the partitions, and the
+        clustered key range, that hold the staging rows: everything a merge of them can touch.
+
+        Returns:
+            str: The predicate, or None if production is neither partitioned on a column nor
+                 clustered on the key, or staging holds no matching rows.
+        """
+        prod = self.bq_client.get_table(dataset_id, prod_table_id)
+        layout = partition_layout(prod)
+        lead_key = key_columns(unique_column)[0]
+        key_clustered = bool(prod.clustering_fields) and prod.clustering_fields[0] == lead_key
+        if layout is None and not key_clustered:
+            return None
+        buckets = self._staging_buckets(dataset_id, staging_table_id, lead_key, layout, source_filter)
+        if not buckets:
+            return None
+        key_type = next(field.field_type for field in prod.schema if field.name == lead_key) if key_clustered else None
+        return self._target_predicate(layout, lead_key, key_type, self._combine(buckets))
+
+    def _target_predicate(self, layout, lead_key, key_type, piece):
+        # The production side of one piece: its partition range, and its key range when production is clustered on the key
+        parts = []
+        if layout is not None:
+            parts.append(self._range_predicate("T.", layout, piece))
+        if key_type is not None and piece["key_lo"] is not None:
+            parts.append(f"T.{lead_key} BETWEEN {watermark_literal(key_type, piece['key_lo'])} AND {watermark_literal(key_type, piece['key_hi'])}")
+        return and_filters(*parts)
+
+    def _staging_buckets(self, dataset_id, staging_table_id, lead_key, layout, source_filter):
+        # One row per staging partition (or a single row without partitioning), in order
+        if layout is not None:
+            column = layout["field"]
+            select = f"MIN({column}) AS lo, MAX({column}) AS hi, COUNTIF({column} IS NULL) > 0 AS nulls"
+            group = f"GROUP BY {layout['bucket'].format(column=column)} ORDER BY lo"
+        else:
+            select = "NULL AS lo, NULL AS hi, FALSE AS nulls"
+            group = "HAVING COUNT(*) > 0"
+        query = f"""
+        SELECT {select}, MIN({lead_key}) AS key_lo, MAX({lead_key}) AS key_hi
+        FROM `{dataset_id}.{staging_table_id}`
+        WHERE {source_filter or "TRUE"}
+        {group}
+        """
+        query_job = self.bq_client.run_query(query)
+        return [
+            {"lo": row["lo"], "hi": row["hi"], "nulls": row["nulls"], "key_lo": row["key_lo"], "key_hi": row["key_hi"]}
+            for row in query_job.result()
+        ]
+
+    @staticmethod
+    def _combine(buckets):
+        present = lambda values: [v for v in values if v is not None]
+        los, his = present(b["lo"] for b in buckets), present(b["hi"] for b in buckets)
+        key_los, key_his = present(b["key_lo"] for b in buckets), present(b["key_hi"] for b in buckets)
+        return {
+            "lo": min(los) if los else None,
+            "hi": max(his) if his else None,
+            "nulls": any(b["nulls"] for b in buckets),
+            "key_lo": min(key_los) if key_los else None,
+            "key_hi": max(key_his) if key_his else None,
+        }
+
+    @staticmethod
+    def _label(piece):
+        label = f"{piece['lo']}..{piece['hi']}" if piece["lo"] is not None else ""
+        if piece["nulls"]:
+            label = f"{label}+NULL" if label else "NULL"
+        return label or "all"
+
+    @staticmethod
+    def _range_predicate(alias, layout, piece):
+        column = f"{alias}{layout['field']}"
+        parts = []
+        if piece["lo"] is not None:
+            parts.append(f"{column} BETWEEN {watermark_literal(layout['field_type'], piece['lo'])} AND {watermark_literal(layout['field_type'], piece['hi'])}")
+        if piece["nulls"]:
+            parts.append(f"{column} IS NULL")
+        return " OR ".join(parts)
+
+    def _fit(self, buckets, render):
+        # Bisect the partition list until every statement fits the budget
+        statement = render(self._combine(buckets))
+        if self.max_bytes is None or statement["estimated_bytes"] <= self.max_bytes or len(buckets) == 1:
+            return [statement]
+        middle = len(buckets) // 2
+        return self._fit(buckets[:middle], render) + self._fit(buckets[middle:], render)
+
+    def _estimate(self, query):
+        return self.bq_client.dry_run(query)
+
+    def _check(self, statements, dataset_id, prod_table_id):
+        for statement in statements:
+            estimate = statement["estimated_bytes"]
+            logging.info(f"Planned merge into {dataset_id}.{prod_table_id} ({statement['label']}) will scan an estimated {estimate} bytes")
+            if self.max_bytes is not None and estimate > self.max_bytes:
+                raise OverBudgetError(
+                    f"Merge into {dataset_id}.{prod_table_id} would scan {estimate} bytes, over the budget of {self.max_bytes}"
+                )
+        return statements
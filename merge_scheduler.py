@@ -0,0 +1,270 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED
+from gcputils.backoff import backoff_delays
+from gcputils.lazy import lazy_import
+from gcputils.retry import DEFAULT_ATTEMPTS, DEFAULT_INITIAL_DELAY, DEFAULT_MAX_DELAY, RATE_LIMIT, RETRYABLE, AdaptiveLimiter, classify_error
+
+exceptions = lazy_import("google.api_core.exceptions")
+
+
+# BigQuery runs at most a couple of mutating DML statements per table at once and queues
+# the rest, and caps interactive queries per project, so keep the default modest.
+DEFAULT_MAX_IN_FLIGHT = 10
+
+
+class MergeScheduler:
+    def __init__(self, bq_client, max_in_flight=DEFAULT_MAX_IN_FLIGHT, timeout=None, metrics=None,
+                 attempts=DEFAULT_ATTEMPTS, limiter=None):
+        """
+        Runs many query jobs from one process with a bounded number in flight.
+
+        Jobs that fail with a rate-limit, DML-conflict or backend error are resubmitted after
+        a jittered exponential backoff. The number in flight adapts (see ``AdaptiveLimiter``):
+        it halves when BigQuery throttles and grows back by about one job per round of
+        successful jobs, up to ``max_in_flight``.
+
+        Args:
+            bq_client (BigQueryClient): The client used to submit and poll every job.
+            max_in_flight (int): Maximum number of jobs running at the same time.
+            timeout (float, optional): Per-task limit in seconds; jobs running longer are cancelled.
+            metrics (MergeMetrics, optional): Receives the statistics of every finished job and skipped task.
+            attempts (int): Maximum number of submissions of each query.
+            limiter (AdaptiveLimiter, optional): The in-flight limit; one starting at ``max_in_flight``
+                                                 if not provided. Pass ``decrease=1.0`` for a fixed limit.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.bq_client = bq_client
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.metrics = metrics
+        self.attempts = attempts
+        self.limiter = limiter or AdaptiveLimiter(max_in_flight)
+
+    def run(self, tasks):
+        """
+        Submits every task and waits for all of them.
+
+        Args:
+            tasks (iterable): Dicts with a ``name`` and either one ``query`` or a list of
+                              ``queries``. The queries of a task run one after another unless
+                              ``parallel`` is set. A task may also carry a ``job_config``
+                              applied to each of its jobs, ``skip`` as ``(status, message)`` to
+                              be reported without running, an ``on_job(job, index)`` callback
+                              invoked after each successful job, an ``on_done(jobs)``
+                              callback invoked once all its jobs succeeded, ``metrics``
+                              copied into its result and ``labels`` recorded with its job statistics.
+                              A callback that raises fails only its own task.
+
+        Returns:
+            list: One result dict per task, in completion order, with ``name``, ``status``
+                  (``DONE``, ``FAILED``, ``TIMEOUT`` or the status of a skipped task),
+                  ``job_ids``, ``latency_s``, ``rows_affected``, ``message``, ``retries``
+                  (failed attempts resubmitted) and ``metrics``.
+        """
+        queue = list(tasks)
+        queue.reverse()
+        active = []
+        in_flight = {}
+        results = []
+
+        while queue or in_flight or active:
+            while len(in_flight) < self.limiter.limit:
+                now = time.monotonic()
+                state = next((s for s in active if self._can_submit(s, now)), None)
+                if state is None:
+                    if not queue:
+                        break
+                    task = queue.pop()
+                    state = {"task": task, "started": time.monotonic(), "jobs": {}, "submitted": {}, "next": 0, "running": 0, "error": None,
+                             "attempts": {}, "retry_at": {}, "retries": 0, "delays": None}
+                    if "skip" in task:
+                        status, message = task["skip"]
+                        if self.metrics is not None:
+                            self.metrics.record_skip(task, status, message)
+                        self._finish(state, status, message, results)
+                        continue
+                    if not self._queries(task):
+                        self._finish(state, "DONE", None, results)
+                        continue
+                    active.append(state)
+                    continue
+                self._submit_next(state, in_flight)
+                if state["error"] is not None and state["running"] == 0:
+                    active.remove(state)
+                    self._finish(state, "FAILED", state["error"], results)
+
+            if not in_flight:
+                # Only retries waiting out their backoff, or nothing left at all
+                wait = self._next_deadline(active, in_flight)
+                if wait:
+                    time.sleep(wait)
+                self._expire_retries(active, results)
+                continue
+
+            done, _ = self.bq_client.wait_for_jobs(
+                [job for job, _, _ in in_flight.values()],
+                timeout=self._next_deadline(active, in_flight),
+                return_when=FIRST_COMPLETED,
+            )
+            for job in done:
+                job, state, index = in_flight.pop(job.job_id)
+                state["running"] -= 1
+                task = state["task"]
+                if self.metrics is not None:
+                    submitted, submit_s = state["submitted"][index]
+                    self.metrics.record_job(task, job, submit_s=submit_s, wall_s=time.monotonic() - submitted)
+                if job.error_result:
+                    if not self._retry(state, index, job.error_result, job.errors or job.error_result):
+                        state["error"] = state["error"] or str(job.errors or job.error_result)
+                else:
+                    self.limiter.on_success()
+                    if "on_job" in task:
+                        self._callback(state, "on_job", job, index)
+
+                if state["running"] > 0:
+                    continue
+                if state["error"] is not None:
+                    active.remove(state)
+                    self._finish(state, "FAILED", state["error"], results)
+                elif not state["retry_at"] and len(state["jobs"]) == len(self._queries(task)):
+                    active.remove(state)
+                    self._finish(state, "DONE", None, results)
+
+            for job_id, (job, state, _) in list(in_flight.items()):
+                if self.timeout is not None and time.monotonic() - state["started"] >= self.timeout:
+                    job.cancel()
+                    del in_flight[job_id]
+                    state["running"] -= 1
+                    state["error"] = f"Cancelled after {self.timeout} seconds"
+                    if state["running"] == 0:
+                        active.remove(state)
+                        self._finish(state, "TIMEOUT", state["error"], results)
+            self._expire_retries(active, results)
+
+        return results
+
+    @staticmethod
+    def _queries(task):
+        return task["queries"] if "queries" in task else [task["query"]]
+
+    def _can_submit(self, state, now):
+        if state["error"] is not None:
+            return False
+        if any(ready <= now for ready in state["retry_at"].values()):
+            return True
+        if state["next"] >= len(self._queries(state["task"])):
+            return False
+        # A sequential task submits its next query only once the previous one succeeded
+        return state["task"].get("parallel") or (state["running"] == 0 and not state["retry_at"])
+
+    def _submit_next(self, state, in_flight):
+        task = state["task"]
+        now = time.monotonic()
+        index = min((i for i, ready in state["retry_at"].items() if ready <= now), default=None)
+        if index is not None:
+            del state["retry_at"][index]
+        else:
+            index = state["next"]
+            state["next"] += 1
+        state["attempts"][index] = state["attempts"].get(index, 0) + 1
+        submitted = time.monotonic()
+        try:
+            job = self.bq_client.submit_query(self._queries(task)[index], job_config=task.get("job_config"))
+        except (exceptions.GoogleAPIError, ConnectionError) as e:
+            if not self._retry(state, index, e, e, sent_at=submitted):
+                logging.error(f"{task['name']}: failed to submit job: {e}")
+                state["error"] = str(e)
+            return
+        state["submitted"][index] = (submitted, time.monotonic() - submitted)
+        state["jobs"][index] = job
+        state["running"] += 1
+        in_flight[job.job_id] = (job, state, index)
+
+    def _retry(self, state, index, error, description, sent_at=None):
+        """
+        Schedules another submission of a failed query if its error is transient.
+
+        Returns:
+            bool: False if the query failed for good.
+        """
+        kind = classify_error(error)
+        if kind == RATE_LIMIT:
+            self.limiter.on_throttle(sent_at if sent_at is not None else state["submitted"][index][0])
+        attempt = state["attempts"][index]
+        if kind not in RETRYABLE or attempt >= self.attempts:
+            return False
+        if state["delays"] is None:
+            state["delays"] = backoff_delays(initial=DEFAULT_INITIAL_DELAY, maximum=DEFAULT_MAX_DELAY)
+        delay = next(state["delays"])
+        state["retry_at"][index] = time.monotonic() + delay
+        state["retries"] += 1
+        logging.warning(f"{state['task']['name']}: job failed ({kind}), retrying in {delay:.1f}s "
+                        f"(attempt {attempt} of {self.attempts}): {description}")
+        return True
+
+    def _expire_retries(self, active, results):
+        # Tasks whose timeout passed while they waited to retry
+        if self.timeout is None:
+            return
+        now = time.monotonic()
+        for state in [s for s in active if s["running"] == 0 and s["retry_at"] and now - s["started"] >= self.timeout]:
+            active.remove(state)
+            self._finish(state, "TIMEOUT", f"Gave up retrying after {self.timeout} seconds", results)
+
+    def _finish(self, state, status, message, results):
+        jobs = [state["jobs"][index] for index in sorted(state["jobs"])]
+        if status == "DONE" and "on_done" in state["task"] and not self._callback(state, "on_done", jobs):
+            status, message = "FAILED", state["error"]
+        results.append({
+            "name": state["task"]["name"],
+            "status": status,
+            "job_ids": [job.job_id for job in jobs],
+            "latency_s": round(time.monotonic() - state["started"], 3),
+            "rows_affected": sum(job.num_dml_affected_rows or 0 for job in jobs) if status == "DONE" else None,
+            "message": message,
+            "retries": state["retries"],
+            "metrics": dict(state["task"].get("metrics", {})),
+        })
+        self._log(results[-1])
+
+    @staticmethod
+    def _callback(state, name, *args):
+        """
+        Runs a task callback. One that raises fails its own task only: the error is logged and
+        stored on the task, and the scheduler goes on draining the other tasks' jobs.
+
+        Returns:
+            bool: False if the callback raised.
+        """
+        try:
+            state["task"][name](*args)
+        except Exception as e:
+            logging.exception(f"{state['task']['name']}: {name} callback failed")
+            state["error"] = state["error"] or f"{name} callback failed: {e}"
+            return False
+        return True
+
+    def _next_deadline(self, active, in_flight):
+        # Seconds until a task times out or a retry is due, whichever comes first. Due retries
+        # only count while there is room to submit them; at the limit only a finishing job
+        # frees a slot, so waiting on them would return at once and spin.
+        times = []
+        if len(in_flight) < self.limiter.limit:
+            times += [ready for state in active for ready in state["retry_at"].values()]
+        if self.timeout is not None:
+            times += [state["started"] + self.timeout for state in active]
+            times += [state["started"] + self.timeout for _, state, _ in in_flight.values()]
+        if not times:
+            return None
+        return max(0.0, min(times) - time.monotonic())
+
+    @staticmethod
+    def _log(result):
+        if result["status"] == "DONE":
+            logging.info(f"{result['name']}: {result['rows_affected']} rows affected in {result['latency_s']}s (jobs {', '.join(result['job_ids'])})")
+        elif result["status"] in ("FAILED", "TIMEOUT"):
+            logging.error(f"{result['name']}: {result['status']} after {result['latency_s']}s: {result['message']}")
+        else:
+            logging.info(f"{result['name']}: {result['status']}: {result['message']}")
@@ -0,0 +1,290 @@
+"""
+Runs loc_prodifier as a long-lived HTTP service, e.g. as a Cloud Run service.
+
+One process keeps a warm BigQueryClient, and with it the shared HTTP session and the table
+metadata cache, across requests. Merges are accepted asynchronously and polled:
+
+    POST /merges            {"dataset_id": ..., "staging_table_id": ..., "prod_table_id": ..., <pair options>}
+                            or {"pairs": [...], "dataset_id": <default>, "wait": false}
+                            -> 202 {"id": ..., "status": "QUEUED", "status_url": "/merges/<id>"}
+    GET  /merges/<id>       -> the request's status, per-table results and finished job statistics
+    GET  /health            -> running and queued request counts
+
+Pair options are those of ``loc_prodifier.prepare_merge``. With ``"wait": true`` the POST
+answers once the merge finished, with the same body as the status endpoint.
+
+Asynchronous requests run after the 202 is sent and their status lives in this process, so
+on Cloud Run deploy with ``--no-cpu-throttling`` (CPU outside requests) and ``--min-instances``
+of at least 1, or always pass ``"wait": true``.
+
+    python merge_service.py --port 8080 --max_concurrent 4
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import signal
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from loc_prodifier import initialize_bq_client, merge_many, new_run_id, normalize_pair
+from merge_metrics import MergeMetrics
+from merge_scheduler import DEFAULT_MAX_IN_FLIGHT
+
+
+# Merge requests running at once per instance, and waiting beyond those before new ones are
+# refused with 429. Cloud Run does not reroute a 429 to another instance: callers retry it
+# after Retry-After, by which time the service may have scaled out (see workflow.yaml)
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_MAX_QUEUED = 16
+
+# Finished requests whose status is kept for polling
+DEFAULT_HISTORY = 1000
+
+MAX_BODY_BYTES = 1024 * 1024
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+            501: "Not Implemented", 503: "Service Unavailable"}
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class MergeService:
+    def __init__(self, bq_client, max_concurrent=DEFAULT_MAX_CONCURRENT, max_queued=DEFAULT_MAX_QUEUED,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, timeout=None, history=DEFAULT_HISTORY):
+        """
+        Accepts merge requests and runs them on a bounded pool of worker threads.
+
+        Args:
+            bq_client (BigQueryClient): The client shared by every request.
+            max_concurrent (int): Maximum number of requests merging at the same time.
+            max_queued (int): Maximum number of accepted requests waiting for a worker.
+            max_in_flight (int): Maximum number of MERGE jobs in flight per request.
+            timeout (float, optional): Per-pair limit in seconds.
+            history (int): Number of finished requests kept for the status endpoint.
+        """
+        self.bq_client = bq_client
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.history = history
+        self.requests = OrderedDict()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="merge")
+
+    def counts(self):
+        with self._lock:
+            states = [request["status"] for request in self.requests.values()]
+        return {"running": states.count("RUNNING"), "queued": states.count("QUEUED")}
+
+    def submit(self, pairs):
+        """
+        Queues a merge of ``pairs`` and returns its request without waiting for it.
+
+        Returns:
+            dict: The request state, or None if the instance is at its concurrency limit.
+        """
+        counts = self.counts()
+        if counts["running"] + counts["queued"] >= self.max_concurrent + self.max_queued:
+            return None
+        request = {
+            "id": uuid.uuid4().hex[:12],
+            "status": "QUEUED",
+            "submitted_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "pairs": [f"{p['dataset_id']}.{p['staging_table_id']} -> {p['prod_table_id']}" for p in pairs],
+            "results": None,
+            "error": None,
+        }
+        request["metrics"] = MergeMetrics(request["id"])
+        with self._lock:
+            self.requests[request["id"]] = request
+            self._forget_finished()
+        future = self._executor.submit(self._run, request, pairs)
+        self._futures[request["id"]] = future
+        future.add_done_callback(lambda _: self._futures.pop(request["id"], None))
+        logging.info(f"Accepted merge request {request['id']} for {len(pairs)} table pair(s)")
+        return request
+
+    def _run(self, request, pairs):
+        request["status"], request["started_at"] = "RUNNING", _now()
+        run_id = new_run_id()
+        pairs = [dict(pair, run_id=pair.get("run_id") or run_id) for pair in pairs]
+        try:
+            results = merge_many(self.bq_client, pairs, max_in_flight=self.max_in_flight, timeout=self.timeout,
+                                 metrics=request["metrics"])
+            failed = [r for r in results if r["status"] not in ("DONE", "NOOP")]
+            request["results"] = results
+            request["status"] = "FAILED" if failed else "DONE"
+        except Exception as e:
+            logging.exception(f"Merge request {request['id']} failed")
+            request["status"], request["error"] = "FAILED", str(e)
+        request["finished_at"] = _now()
+        return request
+
+    async def wait(self, request_id):
+        future = self._futures.get(request_id)
+        if future is not None:
+            await asyncio.wrap_future(future)
+        return self.status(request_id)
+
+    def status(self, request_id):
+        """
+        Returns a request's state as JSON-serializable dict, or None if it is unknown.
+        """
+        with self._lock:
+            request = self.requests.get(request_id)
+        if request is None:
+            return None
+        body = {key: value for key, value in request.items() if key != "metrics"}
+        body["jobs"] = [record for record in request["metrics"].records if record["job_id"] is not None]
+        return body
+
+    def _forget_finished(self):
+        finished = [key for key, request in self.requests.items() if request["status"] in ("DONE", "FAILED")]
+        for key in finished[:max(0, len(finished) - self.history)]:
+            del self.requests[key]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class MergeServer:
+    def __init__(self, service, host="0.0.0.0", port=8080):
+        """
+        A minimal asyncio HTTP/1.1 server in front of a ``MergeService``, with keep-alive
+        and JSON bodies. Merges run on the service's threads, so the event loop only parses
+        requests and never waits on BigQuery.
+        """
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def serve(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, stopped.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        logging.info(f"Serving merges on {self.host}:{self.port}")
+        async with self._server:
+            await stopped.wait()
+        logging.info("Shutting down: no new requests; waiting for running merges")
+        await loop.run_in_executor(None, self.service.shutdown)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                if "transfer-encoding" in headers:
+                    status, body = 501, {"error": "Chunked request bodies are not supported"}
+                    keep_alive = False
+                else:
+                    length = int(headers.get("content-length") or 0)
+                    if length > MAX_BODY_BYTES:
+                        status, body = 413, {"error": f"Request body is limited to {MAX_BODY_BYTES} bytes"}
+                        keep_alive = False
+                    else:
+                        payload = await reader.readexactly(length) if length else b""
+                        status, body = await self._route(method, target.split("?", 1)[0], payload)
+                        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, payload):
+        try:
+            if path == "/health":
+                return 200, {"status": "ok", **self.service.counts()}
+            if path in ("/", "/merges"):
+                if method != "POST":
+                    return 405, {"error": "Use POST to submit merges"}
+                return await self._submit(payload)
+            if path.startswith("/merges/"):
+                if method != "GET":
+                    return 405, {"error": "Use GET to poll a merge"}
+                body = self.service.status(path[len("/merges/"):])
+                return (200, body) if body is not None else (404, {"error": "Unknown merge request"})
+            return 404, {"error": f"No route for {path}"}
+        except Exception as e:
+            logging.exception(f"Error handling {method} {path}")
+            return 500, {"error": str(e)}
+
+    async def _submit(self, payload):
+        try:
+            body = json.loads(payload or b"{}")
+            if isinstance(body, list):
+                body = {"pairs": body}
+            entries = body.get("pairs") or [{k: v for k, v in body.items() if k != "wait"}]
+            pairs = [normalize_pair(entry, body.get("dataset_id")) for entry in entries]
+        except (ValueError, AttributeError) as e:
+            return 400, {"error": str(e)}
+
+        request = self.service.submit(pairs)
+        if request is None:
+            return 429, {"error": "Too many merges running on this instance", **self.service.counts()}
+        if body.get("wait"):
+            return 200, await self.service.wait(request["id"])
+        return 202, {"id": request["id"], "status": request["status"], "status_url": f"/merges/{request['id']}"}
+
+    @staticmethod
+    async def _respond(writer, status, body, keep_alive):
+        data = json.dumps(body, default=str).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 429:
+            head += "Retry-After: 5\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + data)
+        await writer.drain()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve staging-to-production merges over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")), help="Port to listen on (default: $PORT or 8080).")
+    parser.add_argument("--max_concurrent", type=int, default=DEFAULT_MAX_CONCURRENT, help="Merge requests running at once on this instance.")
+    parser.add_argument("--max_queued", type=int, default=DEFAULT_MAX_QUEUED, help="Accepted requests waiting for a worker before new ones get 429.")
+    parser.add_argument("--max_in_flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Maximum number of concurrent MERGE jobs per request.")
+    parser.add_argument("--timeout", type=float, default=None, help="Maximum number of seconds to wait for each merge.")
+    parser.add_argument('--local', action='store_true', help='Use the credentials file from GCP_CREDENTIALS_PATH.')
+    parser.add_argument("--local_db", help="Merge tables in this SQLite database instead of BigQuery.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    project_id = os.getenv('GCP_PROJECT_ID', 'smart-axis-421517')
+    credentials_path = os.getenv('GCP_CREDENTIALS_PATH', 'secret.json') if args.local else None
+    bq_client = initialize_bq_client(project_id, credentials_path, args.local_db)
+
+    service = MergeService(bq_client, max_concurrent=args.max_concurrent, max_queued=args.max_queued,
+                           max_in_flight=args.max_in_flight, timeout=args.timeout)
+    asyncio.run(MergeServer(service, args.host, args.port).serve())
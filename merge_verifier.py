@@ -0,0 +1,71 @@
+import logging
+from merge_planner import MergePlanner, and_filters, key_expression
+
+
+def build_verify_query(dataset_id, staging_table_id, prod_table_id, unique_column="id", source_filter=None, target_filter=None):
+    """
+    Renders a semi-join key-presence check: how many distinct staging keys have no row in
+    production.
+
+    Both sides are reduced to ``FARM_FINGERPRINT`` of the key, so only the key columns are
+    read and only 8 bytes per key are shuffled. This proves presence, not content: a key
+    whose other columns differ between the tables still counts as merged, and two keys
+    sharing a 64-bit fingerprint would hide one missing key.
+
+    Args:
+        dataset_id (str): The dataset of both tables.
+        staging_table_id (str): The staging table ID.
+        prod_table_id (str): The production table ID.
+        unique_column (str or list): The merge key.
+        source_filter (str, optional): Predicate selecting the staging rows that were merged.
+        target_filter (str, optional): Predicate over production rows (``T.``) that can hold them.
+
+    Returns:
+        str: A query returning one row of ``staging_keys`` and ``missing_keys``.
+    """
+    return f"""
+    WITH staged AS (
+      SELECT DISTINCT FARM_FINGERPRINT({key_expression(unique_column)}) AS fp
+      FROM `{dataset_id}.{staging_table_id}`
+      WHERE {source_filter or "TRUE"}
+    ), merged AS (
+      SELECT DISTINCT FARM_FINGERPRINT({key_expression(unique_column, "T.")}) AS fp
+      FROM `{dataset_id}.{prod_table_id}` T
+      WHERE {target_filter or "TRUE"}
+    )
+    SELECT
+      COUNT(*) AS staging_keys,
+      COUNTIF(merged.fp IS NULL) AS missing_keys
+    FROM staged LEFT JOIN merged ON staged.fp = merged.fp
+    """
+
+
+def verify_merge(bq_client, dataset_id, staging_table_id, prod_table_id, unique_column="id", source_filter=None, target_filter=None):
+    """
+    Checks that every staging key (within ``source_filter``) made it into production.
+
+    When production is partitioned on a column or clustered on the key, its side is
+    restricted to the partitions and key range of the staging rows, as the planner does for
+    the MERGE, so BigQuery prunes the rest.
+
+    Returns:
+        dict: ``status`` (``OK`` or ``MISSING``), ``staging_keys``, ``missing_keys``,
+              ``bytes_processed`` and ``job_id``.
+    """
+    planner = MergePlanner(bq_client)
+    restriction = planner.target_filter(dataset_id, staging_table_id, prod_table_id, unique_column, source_filter=source_filter)
+    query = build_verify_query(dataset_id, staging_table_id, prod_table_id, unique_column,
+                               source_filter=source_filter, target_filter=and_filters(target_filter, restriction))
+    query_job = bq_client.run_query(query)
+    row = next(iter(query_job.result()))
+    missing = row["missing_keys"] or 0
+    verification = {
+        "status": "MISSING" if missing else "OK",
+        "staging_keys": row["staging_keys"],
+        "missing_keys": missing,
+        "bytes_processed": query_job.total_bytes_processed,
+        "job_id": query_job.job_id,
+    }
+    logging.info(f"Verified {dataset_id}.{staging_table_id} -> {prod_table_id}: {verification['staging_keys']} staging keys, "
+                 f"{missing} missing from production ({verification['bytes_processed']} bytes processed)")
+    return verification
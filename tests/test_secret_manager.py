@@ -0,0 +1,179 @@
+import pytest
+from google.api_core import exceptions
+from gcputils import ttl_cache
+from gcputils.GoogleSecretManager import GoogleSecretManager
+from gcputils.LocalSecretManager import LocalSecretManagerClient
+
+PROJECT = "local-project"
+TTL = 60.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def client():
+    return LocalSecretManagerClient()
+
+
+def add_version(client, secret_id, data):
+    return client.add_secret_version(parent=client.secret_path(PROJECT, secret_id), payload={"data": data})
+
+
+def version_name(client, secret_id, version):
+    return client.secret_version_path(PROJECT, secret_id, version)
+
+
+def manager(client, **kwargs):
+    return GoogleSecretManager(PROJECT, client=client, cache_ttl=TTL, **kwargs)
+
+
+def test_payload_is_cached_within_ttl(client, clock):
+    add_version(client, "token", "one")
+    gsm = manager(client)
+
+    assert gsm.access_secret("token") == "one"
+    add_version(client, "token", "two")
+    clock.now += TTL - 1
+    assert gsm.access_secret("token") == "one"
+    assert client.calls == 1
+
+
+def test_payload_expires_after_ttl(client, clock):
+    add_version(client, "token", "one")
+    gsm = manager(client)
+    gsm.access_secret("token")
+
+    add_version(client, "token", "two")
+    clock.now += TTL
+    assert gsm.access_secret("token") == "two"
+    assert client.calls == 2
+
+
+def test_zero_ttl_disables_cache(client, clock):
+    add_version(client, "token", "one")
+    gsm = GoogleSecretManager(PROJECT, client=client, cache_ttl=0)
+
+    gsm.access_secret("token")
+    gsm.access_secret("token")
+    assert client.calls == 2
+
+
+def test_refresh_argument_skips_cache(client, clock):
+    add_version(client, "token", "one")
+    gsm = manager(client)
+    gsm.access_secret("token")
+
+    add_version(client, "token", "two")
+    assert gsm.access_secret("token", refresh=True) == "two"
+    assert gsm.access_secret("token") == "two"
+    assert client.calls == 2
+
+
+def test_refresh_one_secret_keeps_the_others(client, clock):
+    add_version(client, "token", "t1")
+    add_version(client, "password", "p1")
+    gsm = manager(client)
+    gsm.access_secret("token")
+    gsm.access_secret("password")
+
+    add_version(client, "token", "t2")
+    add_version(client, "password", "p2")
+    gsm.refresh("token")
+    assert gsm.access_secret("token") == "t2"
+    assert gsm.access_secret("password") == "p1"
+
+    gsm.refresh()
+    assert gsm.access_secret("password") == "p2"
+    assert client.calls == 4
+
+
+def test_prefetch_fills_cache(client, clock):
+    for secret_id in ("a", "b", "c"):
+        add_version(client, secret_id, f"value-{secret_id}")
+    gsm = manager(client)
+
+    assert gsm.prefetch(["a", "b", "c"]) == {"a": "value-a", "b": "value-b", "c": "value-c"}
+    assert client.calls == 3
+    assert [gsm.access_secret(secret_id) for secret_id in ("a", "b", "c")] == ["value-a", "value-b", "value-c"]
+    assert client.calls == 3
+    assert gsm.prefetch([]) == {}
+
+
+def test_prefetch_raises_for_missing_secret(client, clock):
+    add_version(client, "a", "value-a")
+    gsm = manager(client)
+
+    with pytest.raises(exceptions.NotFound):
+        gsm.prefetch(["a", "missing"])
+
+
+def test_pin_resolves_latest_once_per_ttl(client, clock):
+    add_version(client, "token", "one")
+    gsm = manager(client, pin_versions=True)
+
+    assert gsm.access_secret("token") == "one"
+    assert gsm.resolved_version("token") == "1"
+    add_version(client, "token", "two")
+    assert gsm.access_secret("token") == "one"
+    assert gsm.access_secret("token", version_id=1) == "one"
+    assert client.calls == 1
+
+    clock.now += TTL
+    assert gsm.access_secret("token") == "two"
+    assert gsm.resolved_version("token") == "2"
+
+
+@pytest.mark.parametrize("retire", ["disable_secret_version", "destroy_secret_version"])
+def test_pinned_version_retired_is_unpinned(client, clock, retire):
+    add_version(client, "token", "one")
+    gsm = manager(client, pin_versions=True)
+    gsm.access_secret("token")
+
+    add_version(client, "token", "two")
+    getattr(client, retire)(name=version_name(client, "token", 1))
+    # The pin is still valid but its payload is gone, e.g. evicted from a full cache
+    gsm.cache.clear()
+
+    assert gsm.access_secret("token") == "two"
+    assert gsm.resolved_version("token") == "2"
+
+
+@pytest.mark.parametrize("retire", ["disable_secret_version", "destroy_secret_version"])
+def test_retired_version_is_not_served_after_ttl(client, clock, retire):
+    # Regression: with pin_versions, payloads used to be cached forever, so a version read
+    # before it was disabled or destroyed kept being served
+    add_version(client, "token", "one")
+    add_version(client, "token", "two")
+    gsm = manager(client, pin_versions=True)
+    assert gsm.access_secret("token", version_id=1) == "one"
+
+    getattr(client, retire)(name=version_name(client, "token", 1))
+    assert gsm.access_secret("token", version_id=1) == "one"
+
+    clock.now += TTL
+    with pytest.raises(exceptions.FailedPrecondition):
+        gsm.access_secret("token", version_id=1)
+
+
+def test_explicit_retired_version_raises_without_pinning(client, clock):
+    add_version(client, "token", "one")
+    add_version(client, "token", "two")
+    client.disable_secret_version(name=version_name(client, "token", 1))
+    gsm = manager(client)
+
+    with pytest.raises(exceptions.FailedPrecondition):
+        gsm.access_secret("token", version_id=1)
+    assert gsm.access_secret("token") == "two"
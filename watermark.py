@@ -0,0 +1,156 @@
+import logging
+from gcputils.lazy import lazy_import
+
+bigquery = lazy_import("google.cloud.bigquery")
+
+
+def state_schema():
+    # Built on demand so importing this module does not load google.cloud.bigquery
+    return [
+        bigquery.SchemaField("staging_table", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("prod_table", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("watermark_column", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("watermark", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("rows_inserted", "INTEGER"),
+        bigquery.SchemaField("bytes_processed", "INTEGER"),
+        bigquery.SchemaField("full_bytes_estimate", "INTEGER"),
+        bigquery.SchemaField("updated_at", "TIMESTAMP", mode="REQUIRED"),
+    ]
+
+# How the lookback window is subtracted from a watermark, per column type
+_WINDOW_EXPRESSIONS = {
+    "TIMESTAMP": "TIMESTAMP_SUB({value}, INTERVAL {lookback} DAY)",
+    "DATETIME": "DATETIME_SUB({value}, INTERVAL {lookback} DAY)",
+    "DATE": "DATE_SUB({value}, INTERVAL {lookback} DAY)",
+    "INTEGER": "{value} - {lookback}",
+    "INT64": "{value} - {lookback}",
+    "NUMERIC": "{value} - {lookback}",
+    "BIGNUMERIC": "{value} - {lookback}",
+}
+
+
+# Legacy type names reported by table schemas that standard SQL does not accept in CAST
+_SQL_TYPES = {"INTEGER": "INT64", "FLOAT": "FLOAT64", "BOOLEAN": "BOOL"}
+
+
+def watermark_literal(field_type, value):
+    """
+    Renders a stored watermark as a constant SQL expression of the column's type.
+
+    Constant expressions let BigQuery prune partitions on both sides of the MERGE.
+    """
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"CAST('{escaped}' AS {_SQL_TYPES.get(field_type, field_type)})"
+
+
+def check_window_type(field_type, column):
+    """
+    Raises ValueError unless a lookback window can be computed for a watermark column of
+    ``field_type``. Checked before the first merge, which needs no window, so an unsupported
+    column is refused up front instead of on every run after it.
+    """
+    if field_type not in _WINDOW_EXPRESSIONS:
+        raise ValueError(f"Unsupported watermark column type for {column}: {field_type} "
+                         f"(use one of {', '.join(sorted(_WINDOW_EXPRESSIONS))})")
+
+
+def window_start(field_type, value, lookback):
+    """
+    Returns the lower bound of the merge window: the watermark minus the lookback.
+
+    Args:
+        field_type (str): The BigQuery type of the watermark column.
+        value (str): The stored watermark.
+        lookback (int): Days for date/time columns, units for numeric columns.
+
+    Returns:
+        str: A constant SQL expression.
+    """
+    check_window_type(field_type, "the watermark column")
+    return _WINDOW_EXPRESSIONS[field_type].format(value=watermark_literal(field_type, value), lookback=int(lookback))
+
+
+class WatermarkStore:
+    def __init__(self, bq_client, state_table):
+        """
+        Persists the per-table high-water marks of incremental merges in a small BigQuery table.
+
+        Every successful merge appends a row, so the table doubles as a history of the rows
+        inserted and bytes scanned by each run.
+
+        Args:
+            bq_client (BigQueryClient): The client used to read and write the state table.
+            state_table (str): The state table as ``dataset.table``.
+        """
+        self.bq_client = bq_client
+        self.state_table = state_table
+        self._watermarks = None
+
+    def ensure_table(self):
+        dataset_id, table_id = self.state_table.split(".", 1)
+        if not self.bq_client.table_exists(dataset_id, table_id):
+            self.bq_client.create_table(dataset_id, table_id, state_schema())
+
+    def load(self):
+        """
+        Reads the latest watermark of every table in one query.
+
+        Returns:
+            dict: ``(staging_table, prod_table, watermark_column)`` to watermark string.
+        """
+        self.ensure_table()
+        query = f"""
+        SELECT staging_table, prod_table, watermark_column, watermark
+        FROM `{self.state_table}`
+        WHERE TRUE
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY staging_table, prod_table, watermark_column ORDER BY updated_at DESC) = 1
+        """
+        query_job = self.bq_client.run_query(query)
+        self._watermarks = {
+            (row["staging_table"], row["prod_table"], row["watermark_column"]): row["watermark"]
+            for row in query_job.result()
+        }
+        return self._watermarks
+
+    def get(self, staging_table, prod_table, watermark_column):
+        """
+        Returns the last recorded watermark, or None if the table has never been merged incrementally.
+        """
+        if self._watermarks is None:
+            self.load()
+        return self._watermarks.get((staging_table, prod_table, watermark_column))
+
+    def record(self, entries):
+        """
+        Appends new watermarks in a single INSERT job.
+
+        Args:
+            entries (list): Dicts with ``staging_table``, ``prod_table``, ``watermark_column``,
+                            ``watermark``, ``rows_inserted``, ``bytes_processed`` and ``full_bytes_estimate``.
+        """
+        if not entries:
+            return
+        fields = ["staging_table", "prod_table", "watermark_column", "watermark"]
+        counters = ["rows_inserted", "bytes_processed", "full_bytes_estimate"]
+        rows = [
+            bigquery.StructQueryParameter(
+                None,
+                *[bigquery.ScalarQueryParameter(name, "STRING", entry[name]) for name in fields],
+                *[bigquery.ScalarQueryParameter(name, "INT64", entry.get(name)) for name in counters],
+            )
+            for entry in entries
+        ]
+        query = f"""
+        INSERT INTO `{self.state_table}` ({", ".join(fields + counters)}, updated_at)
+        SELECT {", ".join(fields + counters)}, CURRENT_TIMESTAMP()
+        FROM UNNEST(@rows)
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter("rows", "STRUCT", rows)])
+        self.bq_client.run_query(query, job_config=job_config)
+        for entry in entries:
+            if self._watermarks is not None:
+                self._watermarks[(entry["staging_table"], entry["prod_table"], entry["watermark_column"])] = entry["watermark"]
+            logging.info(
+                f"Watermark of {entry['staging_table']} -> {entry['prod_table']} advanced to {entry['watermark']} "
+                f"({entry.get('bytes_processed')} bytes processed, full merge estimate {entry.get('full_bytes_estimate')})"
+            )